@@ -1,26 +1,50 @@
-import os
 from django.core.files.storage import default_storage
-from django.db.models.signals import pre_save, post_delete
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from core.models import User
+from core.services.images import delete_derivatives
+from core.utils.tracking import NOT_LOADED, track_fields, loaded_value, current_value
 
 
 # Manage user avatar signals
 # ----------------------------------------------------------------------------------------------------------------------
+# Ескі аватар жүктелген кездегі мәннен алынады, сондықтан аватарға тиіспейтін сақтаулар
+# (last_login, профиль атауы) қосымша сұраныс жасамайды. Файл жол сақталған соң, commit-тен кейін өшіріледі
+track_fields(User, 'avatar')
+
+
+def delete_avatar_on_commit(name):
+    def delete():
+        default_storage.delete(name)
+        delete_derivatives(name)
+
+    transaction.on_commit(delete)
+
+
 @receiver(pre_save, sender=User)
-def delete_old_avatar(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old_avatar = User.objects.get(pk=instance.pk).avatar
-            if old_avatar and instance.avatar != old_avatar:
-                if default_storage.exists(old_avatar.name):
-                    default_storage.delete(old_avatar.name)
-        except User.DoesNotExist:
-            pass
+def delete_old_avatar(sender, instance, update_fields=None, **kwargs):
+    if not instance.pk or 'avatar' not in instance.__dict__:
+        return
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+
+    old_avatar = loaded_value(instance, 'avatar')
+    if old_avatar is NOT_LOADED:
+        old_avatar = User.objects.filter(pk=instance.pk).values_list('avatar', flat=True).first()
+
+    if old_avatar and old_avatar != current_value(instance, 'avatar'):
+        instance._replaced_avatar = old_avatar
+
+
+@receiver(post_save, sender=User)
+def delete_replaced_avatar(sender, instance, **kwargs):
+    old_avatar = instance.__dict__.pop('_replaced_avatar', None)
+    if old_avatar:
+        delete_avatar_on_commit(old_avatar)
 
 
 @receiver(post_delete, sender=User)
 def delete_avatar_on_delete(sender, instance, **kwargs):
     if instance.avatar:
-        if default_storage.exists(instance.avatar.name):
-            default_storage.delete(instance.avatar.name)
+        delete_avatar_on_commit(instance.avatar.name)
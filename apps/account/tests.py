@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+from core.models import User
+from core.services.images import DERIVATIVES_DIR
+
+
+# Аватар: ескі файл мен оның өлшемдері commit-тен кейін ғана өшіріледі
+# ----------------------------------------------------------------------------------------------------------------------
+class AvatarCleanupTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('student', password='x')
+        self.user.avatar.save('old.png', ContentFile(b'old'))
+        self.old_avatar = self.user.avatar.name
+        derivative = self.path(DERIVATIVES_DIR, self.old_avatar, '96.webp')
+        os.makedirs(os.path.dirname(derivative))
+        with open(derivative, 'wb') as f:
+            f.write(b'derivative')
+
+    def path(self, *names):
+        return os.path.join(self.media_root, *names)
+
+    def assertOldAvatarExists(self, exists):
+        self.assertEqual(os.path.isfile(self.path(self.old_avatar)), exists)
+        self.assertEqual(os.path.isdir(self.path(DERIVATIVES_DIR, self.old_avatar)), exists)
+
+    def test_old_avatar_is_deleted_on_change(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.avatar.save('new.png', ContentFile(b'new'))
+            self.assertOldAvatarExists(True)
+
+        self.assertOldAvatarExists(False)
+        self.assertTrue(os.path.isfile(self.path(user.avatar.name)))
+
+    def test_avatar_is_kept_when_other_fields_change(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user.first_name = 'Айгүл'
+            user.save()
+            user.save(update_fields=['last_login'])
+
+        self.assertEqual(callbacks, [])
+        self.assertOldAvatarExists(True)
+
+    def test_avatar_is_deleted_with_user(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.user.pk).delete()
+
+        self.assertOldAvatarExists(False)
+
+    def test_avatar_is_kept_on_rollback(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    user.avatar.save('new.png', ContentFile(b'new'))
+                    User.objects.get(pk=self.user.pk).delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertOldAvatarExists(True)
+        self.assertEqual(User.objects.get(pk=self.user.pk).avatar.name, self.old_avatar)
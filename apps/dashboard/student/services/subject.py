@@ -1,5 +1,9 @@
 from django.contrib import messages
-from core.models import Option, TableCell
+from django.db import transaction
+from core.models import UserAnswer, UserMatchingAnswer, UserTextGap, UserVideo
+from core.services.answer_keys import get_answer_key, table_cell_bit, pack_table_cells, unpack_table_cells
+from core.services.item_analysis import register_submission
+from core.services.video_progress import pop_buffered_seconds
 
 
 # user_lesson_task_view
@@ -27,21 +31,24 @@ def get_related_data(user_task):
     elif task_type == 'table':
         rows = user_task.task.table_rows.order_by('order')
         columns = user_task.task.table_columns.order_by('order')
-        answers = user_task.user_table_answers.select_related('row', 'column')
+        table_key = get_answer_key(user_task.task)['table']
+        column_count = len(table_key['columns'])
 
-        # Қолданушы жауаптары
-        answer_matrix = {row.id: {} for row in rows}
-        for ans in answers:
-            answer_matrix[ans.row.id][ans.column.id] = ans
+        # Қолданушы жауаптары (бітмаптан)
+        checked = unpack_table_cells(user_task.table_answer)
+        answer_matrix = {
+            row_id: {column_id: (row_id, column_id) in checked for column_id in table_key['columns']}
+            for row_id in table_key['rows']
+        }
 
         # Дұрыс жауаптар
-        correct_cells = TableCell.objects.filter(
-            row__task=user_task.task,
-            column__task=user_task.task
-        )
-        correct_matrix = {row.id: {} for row in rows}
-        for cell in correct_cells:
-            correct_matrix[cell.row_id][cell.column_id] = cell.correct
+        correct_matrix = {
+            row_id: {
+                column_id: bool(table_key['cells'] & table_cell_bit(i, j, column_count))
+                for j, column_id in enumerate(table_key['columns'])
+            }
+            for i, row_id in enumerate(table_key['rows'])
+        }
 
         data.update({
             'table_rows': rows,
@@ -70,17 +77,23 @@ def handle_post_request(request, user_task):
 
 # ---------------------- VIDEO ----------------------
 def handle_video(request, user_task):
-    videos = user_task.user_videos.all()
+    videos = list(user_task.user_videos.all())
+    # Heartbeat буферінде қалған мәндер де осы жазумен бірге түседі
+    buffered = pop_buffered_seconds([uv.id for uv in videos])
     for uv in videos:
-        uv.watched_seconds = int(request.POST.get(f'watched_{uv.id}', 0))
+        posted = request.POST.get(f'watched_{uv.id}', '0')
+        posted = int(posted) if posted.isdigit() else 0
+        uv.watched_seconds = max(uv.watched_seconds, buffered.get(uv.id, 0), posted)
         uv.is_completed = True
-        uv.save()
 
-    if all(uv.is_completed for uv in videos):
-        user_task.is_completed = True
-        user_task.rating = user_task.task.rating
-        user_task.save()
-        messages.success(request, 'Видеосабақ аяқталды')
+    with transaction.atomic():
+        UserVideo.objects.bulk_update(videos, fields=['watched_seconds', 'is_completed'])
+
+        if all(uv.is_completed for uv in videos):
+            user_task.is_completed = True
+            user_task.rating = user_task.task.rating
+            user_task.save()
+            messages.success(request, 'Видеосабақ аяқталды')
 
 
 # ---------------------- WRITTEN ----------------------
@@ -100,50 +113,40 @@ def handle_written(request, user_task):
 
 
 # ---------------------- TEST ----------------------
+# Бір сұрақтың ұпайы (0..1)
+def score_question(question_type, selected_set, correct_ids):
+    if question_type == 'simple':
+        # Тек 1 дұрыс таңдау болса ғана дұрыс
+        return 1 if len(selected_set) == 1 and next(iter(selected_set)) in correct_ids else 0
+
+    if question_type == 'multiple' and correct_ids:
+        correct_selected = len(selected_set & correct_ids)   # дұрыс таңдалғандар
+        wrong_selected = len(selected_set - correct_ids)    # артық/қате таңдалғандар
+
+        # Дұрыс үлесті есептеу (қате таңдаулар да әсер етеді), минусқа түсіп кетпесін
+        return max((correct_selected - wrong_selected) / len(correct_ids), 0)
+
+    # Егер дұрыс жауаптар мүлдем болмаса
+    return 0
+
+
 def handle_test(request, user_task):
-    questions = [ua.question for ua in user_task.user_options.all()]
-    total_questions = len(questions)
+    answer_key = get_answer_key(user_task.task)['questions']
+    user_answers = list(user_task.user_options.all())
+    total_questions = len(user_answers)
     total_score = 0  # барлық сұрақтан жинайтын ұпай
+    selections = []
 
-    for user_answer in user_task.user_options.select_related('question').prefetch_related('question__options'):
-        question = user_answer.question
-        selected_ids = request.POST.getlist(f'question_{question.id}')
-        selected_ids = list(map(int, selected_ids)) if selected_ids else []
+    # Барлық сұрақты жадта тексеріп, бағалаймыз
+    for user_answer in user_answers:
+        question_type, valid_ids, correct_ids = answer_key.get(user_answer.question_id, ('simple', frozenset(), frozenset()))
+        selected_ids = request.POST.getlist(f'question_{user_answer.question_id}')
 
         # Валидті жауаптарды қалдырамыз
-        valid_ids = set(question.options.values_list('id', flat=True))
-        selected_ids = [opt_id for opt_id in selected_ids if opt_id in valid_ids]
+        selected_set = {int(opt_id) for opt_id in selected_ids if opt_id.isdigit() and int(opt_id) in valid_ids}
+        selections.extend((user_answer.pk, opt_id) for opt_id in selected_set)
 
-        # Қолданушы таңдауларын сақтау
-        selected_options = Option.objects.filter(id__in=selected_ids)
-        user_answer.options.set(selected_options)
-
-        # Дұрыс жауаптар
-        correct_ids = set(question.options.filter(is_correct=True).values_list('id', flat=True))
-        selected_set = set(selected_ids)
-
-        # -------------------------
-        # Бағалау логикасы
-        # -------------------------
-        if question.question_type == 'simple':
-            # Тек 1 дұрыс таңдау болса ғана дұрыс
-            if len(selected_set) == 1 and selected_set.pop() in correct_ids:
-                total_score += 1
-
-        elif question.question_type == 'multiple':
-            if correct_ids:
-                correct_selected = len(selected_set & correct_ids)   # дұрыс таңдалғандар
-                wrong_selected = len(selected_set - correct_ids)    # артық/қате таңдалғандар
-
-                # Дұрыс үлесті есептеу (қате таңдаулар да әсер етеді)
-                partial_score = (correct_selected - wrong_selected) / len(correct_ids)
-                if partial_score < 0:
-                    partial_score = 0  # минусқа түсіп кетпесін
-
-                total_score += partial_score
-            else:
-                # Егер дұрыс жауаптар мүлдем болмаса
-                total_score += 0
+        total_score += score_question(question_type, selected_set, correct_ids)
 
     # Жалпы ұпайды есептеу
     full_rating = user_task.task.rating or 1
@@ -165,23 +168,33 @@ def handle_test(request, user_task):
                 f'Ұпай {score} қойылды ({round(ratio*100)}% дұрыс жауап).'
             )
 
-    # Нәтижені сақтау
-    user_task.rating = score
-    user_task.is_completed = True
-    user_task.save()
+    # Нәтижені сақтау: таңдаулар бір DELETE және бір INSERT арқылы жазылады
+    through = UserAnswer.options.through
+    with transaction.atomic():
+        through.objects.filter(useranswer_id__in=[ua.pk for ua in user_answers]).delete()
+        through.objects.bulk_create([
+            through(useranswer_id=user_answer_id, option_id=option_id) for user_answer_id, option_id in selections
+        ])
+
+        user_task.rating = score
+        user_task.is_completed = True
+        user_task.save()
+
+        register_submission(user_task.task_id)
 
 
 # ---------------------- MATCHING ----------------------
 def handle_matching(request, user_task):
-    for answer in user_task.matching_answers.all():
-        selected_column_id = request.POST.get(f'column_{answer.item.id}')
+    matching_key = get_answer_key(user_task.task)['matching']
+    answers = list(user_task.matching_answers.all())
+    for answer in answers:
+        selected_column_id = request.POST.get(f'column_{answer.item_id}')
         if selected_column_id:
             answer.selected_column_id = int(selected_column_id)
-            answer.check_answer()
+            answer.check_answer(matching_key.get(answer.item_id))
 
-    answers = user_task.matching_answers.all()
-    total = answers.count()
-    correct = answers.filter(is_correct=True).count()
+    total = len(answers)
+    correct = sum(1 for answer in answers if answer.is_correct)
     wrong = total - correct
 
     full_rating = user_task.task.rating
@@ -196,26 +209,30 @@ def handle_matching(request, user_task):
     else:
         score = full_rating / 2 if full_rating > 1 else 0
 
-    user_task.rating = round(score, 2)
-    user_task.is_completed = True
-    user_task.save()
+    with transaction.atomic():
+        UserMatchingAnswer.objects.bulk_update(answers, fields=['selected_column', 'is_correct'])
+
+        user_task.rating = round(score, 2)
+        user_task.is_completed = True
+        user_task.save()
     messages.success(request, 'Сәйкестендіру тапсырмасы аяқталды')
 
 
 # ---------------------- TEXT GAP ----------------------
 def handle_text_gap(request, user_task):
-    total = user_task.user_text_gaps.count()
+    gaps_key = get_answer_key(user_task.task)['gaps']
+    user_text_gaps = list(user_task.user_text_gaps.all())
+    total = len(user_text_gaps)
     correct = 0
 
-    for user_text_gap in user_task.user_text_gaps.all():
+    for user_text_gap in user_text_gaps:
         user_answer = request.POST.get(f'answer_{user_text_gap.id}', '').strip()
-        correct_answer = user_text_gap.text_gap.correct_answer.strip()
+        correct_answer = gaps_key.get(user_text_gap.text_gap_id)
 
-        is_correct = user_answer.lower() == correct_answer.lower()
+        is_correct = user_answer.lower() == correct_answer
 
         user_text_gap.answer = user_answer
         user_text_gap.is_correct = is_correct
-        user_text_gap.save()
 
         if is_correct:
             correct += 1
@@ -246,38 +263,29 @@ def handle_text_gap(request, user_task):
             user_task.rating = int(full_rating / 2)
             messages.warning(request, 'Бірнеше қате бар. Жарты ұпай алдыңыз')
 
-    user_task.is_completed = True
-    user_task.save()
+    with transaction.atomic():
+        UserTextGap.objects.bulk_update(user_text_gaps, fields=['answer', 'is_correct'])
+
+        user_task.is_completed = True
+        user_task.save()
 
 
 # ---------------------- TABLE ----------------------
 def handle_table(request, user_task):
-    total = 0
-    correct = 0
+    # 1. Дұрыс жауаптар бітмапы
+    table_key = get_answer_key(user_task.task)['table']
+    rows, columns = table_key['rows'], table_key['columns']
 
-    # 1. Дұрыс жауаптар картасы
-    correct_map = {
-        (c.row_id, c.column_id): c.correct
-        for c in TableCell.objects.filter(
-            row__task=user_task.task,
-            column__task=user_task.task
-        )
-    }
+    # 2. Қолданушы жауаптарын бітмапқа жинау
+    checked = 0
+    for i, row_id in enumerate(rows):
+        for j, column_id in enumerate(columns):
+            if request.POST.get(f'cell_{row_id}_{column_id}') == 'on':
+                checked |= table_cell_bit(i, j, len(columns))
 
-    # 2. Қолданушы жауаптарын қабылдау және сақтау
-    for answer in user_task.user_table_answers.all():
-        field_name = f'cell_{answer.row_id}_{answer.column_id}'
-        is_checked = request.POST.get(field_name) == 'on'
-
-        answer.checked = is_checked
-        answer.is_submitted = True
-        answer.save()
-
-        # 3. Бағалау үшін салыстыру
-        expected = correct_map.get((answer.row_id, answer.column_id), False)
-        if expected == is_checked:
-            correct += 1
-        total += 1
+    # 3. Бағалау: сәйкес келмеген ұяшықтар = XOR-дың бит саны
+    total = len(rows) * len(columns)
+    correct = total - (checked ^ table_key['cells']).bit_count()
 
     # 4. Ұпай есептеу
     rating = user_task.task.rating or 1
@@ -288,8 +296,9 @@ def handle_table(request, user_task):
     else:
         score = 0
 
+    user_task.table_answer = pack_table_cells(rows, columns, checked)
     user_task.rating = score
     user_task.is_completed = True
-    user_task.save(update_fields=['rating', 'is_completed'])
+    user_task.save(update_fields=['table_answer', 'rating', 'is_completed'])
 
     messages.success(request, 'Кесте толтыру тапсырмасы аяқталды')
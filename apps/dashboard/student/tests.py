@@ -0,0 +1,371 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.dashboard.student.services.subject import handle_test, handle_matching, handle_text_gap
+from core.models import User, Subject, Chapter, Lesson, Task, Question, Option, UserSubject, UserLesson, UserTask, \
+    UserAnswer, MatchingColumn, MatchingItem, UserMatchingAnswer, TextGap, UserTextGap, UserChapter
+
+
+def create_subject(owner, name, chapters=1, lessons=2):
+    subject = Subject.objects.create(name=name, owner=owner)
+    for c in range(chapters):
+        chapter = Chapter.objects.create(subject=subject, name=f'{name} {c}', order=c)
+        for l in range(lessons):
+            lesson = Lesson.objects.create(subject=subject, chapter=chapter, title=f'{name} {c}.{l}', order=l)
+            Task.objects.create(lesson=lesson, task_type='written', rating=5)
+    return subject
+
+
+# Student dashboard: сұраныс саны пәндер мен білім алушылар санына тәуелді емес
+# ----------------------------------------------------------------------------------------------------------------------
+class StudentDashboardQueriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.student = self.create_student('student')
+        self.subject = create_subject(self.teacher, 'Химия')
+        self.enroll(self.student, self.subject)
+
+    def create_student(self, username, user_class='8b'):
+        return User.objects.create_user(username, password='x', user_class=user_class)
+
+    def enroll(self, user, subject):
+        self.client.force_login(user)
+        self.client.post(reverse('enroll_subject', args=[subject.pk]))
+
+    def count_queries(self, url):
+        cache.clear()
+        self.client.force_login(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def grow(self, subjects=4, students=6):
+        new_subjects = [create_subject(self.teacher, f'Пән {i}', chapters=2) for i in range(subjects)]
+        for i in range(students):
+            student = self.create_student(f'other{i}', '8b' if i % 2 else '8v')
+            for subject in [self.subject, *new_subjects]:
+                self.enroll(student, subject)
+        for subject in new_subjects[:2]:
+            self.enroll(self.student, subject)
+
+    def test_dashboard_queries_do_not_grow_with_subjects_and_students(self):
+        url = reverse('student')
+        expected = self.count_queries(url)
+
+        self.grow()
+
+        cache.clear()
+        with self.assertNumQueries(expected):
+            self.client.get(url)
+
+    def test_leaderboard_queries_do_not_grow_with_students(self):
+        for scope in ('class', 'all'):
+            with self.subTest(scope=scope):
+                url = f"{reverse('subject_leaderboard', args=[self.subject.pk])}?scope={scope}"
+                expected = self.count_queries(url)
+                if scope == 'class':
+                    self.grow()
+
+                cache.clear()
+                with self.assertNumQueries(expected):
+                    self.client.get(url)
+
+    def test_dashboard_is_cached_after_first_visit(self):
+        self.grow(subjects=2, students=2)
+        url = reverse('student')
+        cold = self.count_queries(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertLess(len(queries), cold)
+
+
+# Тапсырма жауаптарын жіберу: хабарламаларсыз, тікелей өңдегіш арқылы
+def submit(handler, user_task, data):
+    request = RequestFactory().post('/', data)
+    with mock.patch('apps.dashboard.student.services.subject.messages'):
+        handler(request, user_task)
+    user_task.refresh_from_db()
+
+
+# Submission тапсырмалары үшін ортақ дайындық
+class SubmissionTestCase(TestCase):
+    task_type = None
+
+    def setUp(self):
+        cache.clear()
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        subject = Subject.objects.create(name='Химия', owner=teacher)
+        chapter = Chapter.objects.create(subject=subject, name='Бөлім', order=0)
+        lesson = Lesson.objects.create(subject=subject, chapter=chapter, title='Сабақ')
+        self.task = Task.objects.create(lesson=lesson, task_type=self.task_type, rating=10)
+
+        student = User.objects.create_user('student', password='x')
+        user_subject = UserSubject.objects.create(user=student, subject=subject)
+        user_lesson = UserLesson.objects.create(user=student, user_subject=user_subject, lesson=lesson)
+        self.user_task = UserTask.objects.create(user_lesson=user_lesson, task=self.task)
+
+    # Кэш пен байланысқан объектілер тазартылған күйдегі сұраныстар
+    def reset(self):
+        cache.clear()
+        self.user_task = UserTask.objects.get(pk=self.user_task.pk)
+
+    def count_queries(self, handler, data):
+        self.reset()
+        with CaptureQueriesContext(connection) as queries:
+            submit(handler, self.user_task, data)
+        return queries
+
+
+# Test: бір өтпелі бағалау ескі сұрақтық бағалаумен сәйкес, таңдаулар бір DELETE + бір INSERT арқылы жазылады
+# ----------------------------------------------------------------------------------------------------------------------
+class TestSubmissionTests(SubmissionTestCase):
+    task_type = 'test'
+
+    def setUp(self):
+        super().setUp()
+        self.simple = self.add_question('simple', correct=1, wrong=2)
+        self.multiple = self.add_question('multiple', correct=3, wrong=1)
+        self.single_key = self.add_question('multiple', correct=1, wrong=1)
+
+    def add_question(self, question_type, correct, wrong):
+        question = Question.objects.create(task=self.task, text='Сұрақ', question_type=question_type)
+        options = [
+            Option.objects.create(question=question, text=str(i), is_correct=i < correct)
+            for i in range(correct + wrong)
+        ]
+        UserAnswer.objects.create(user_task=self.user_task, question=question)
+        return options
+
+    # Бұрынғы handle_test бағалауы (әр сұраққа options.set() + тармақталған есеп)
+    def old_rating(self, selections):
+        total_score = 0
+        questions = Question.objects.filter(task=self.task).prefetch_related('options')
+        for question in questions:
+            valid_ids = {option.pk for option in question.options.all()}
+            correct_ids = {option.pk for option in question.options.all() if option.is_correct}
+            selected_set = set(selections.get(question.pk, [])) & valid_ids
+
+            if question.question_type == 'simple':
+                if len(selected_set) == 1 and selected_set.pop() in correct_ids:
+                    total_score += 1
+            elif question.question_type == 'multiple' and correct_ids:
+                partial_score = (len(selected_set & correct_ids) - len(selected_set - correct_ids)) / len(correct_ids)
+                total_score += max(partial_score, 0)
+        return round(self.task.rating * total_score / len(questions))
+
+    def post_data(self, selections):
+        return {f'question_{question_id}': [str(pk) for pk in pks] for question_id, pks in selections.items()}
+
+    def stored_selections(self):
+        stored = {}
+        for question_id, option_id in UserAnswer.options.through.objects.filter(
+            useranswer__user_task=self.user_task
+        ).values_list('useranswer__question_id', 'option_id'):
+            stored.setdefault(question_id, set()).add(option_id)
+        return stored
+
+    def test_scores_match_old_grading(self):
+        simple, multiple, single_key = self.simple, self.multiple, self.single_key
+        question = {'simple': simple[0].question_id, 'multiple': multiple[0].question_id}
+        question['single'] = single_key[0].question_id
+        cases = [
+            {'simple': [simple[0]], 'multiple': multiple[:3], 'single': [single_key[0]]},   # барлығы дұрыс
+            {},                                                                             # бос жауап
+            {'simple': simple[:2], 'multiple': multiple[:2]},                               # simple-да екі таңдау
+            {'simple': [simple[1]], 'multiple': [multiple[0]]},                             # жартылай дұрыс
+            {'multiple': [multiple[0], multiple[1], multiple[3]]},                          # дұрыс + қате
+            {'multiple': [multiple[3]], 'single': single_key},                              # артық таңдау
+            {'simple': [simple[0], single_key[0]], 'single': [multiple[0]]},                # басқа сұрақтың нұсқасы
+        ]
+
+        for case in cases:
+            selections = {question[name]: [option.pk for option in options] for name, options in case.items()}
+            submit(handle_test, self.user_task, self.post_data(selections))
+            self.assertEqual(self.user_task.rating, self.old_rating(selections), case)
+            self.assertTrue(self.user_task.is_completed)
+
+            valid = {
+                question_id: {pk for pk in option_ids if Option.objects.filter(pk=pk, question_id=question_id).exists()}
+                for question_id, option_ids in selections.items()
+            }
+            self.assertEqual(self.stored_selections(), {k: v for k, v in valid.items() if v}, case)
+
+    def test_non_numeric_choices_are_ignored(self):
+        question_id = self.simple[0].question_id
+        submit(handle_test, self.user_task, {f'question_{question_id}': ['x', '', str(self.simple[0].pk)]})
+        self.assertEqual(self.stored_selections(), {question_id: {self.simple[0].pk}})
+
+    def test_selections_are_written_in_bulk(self):
+        multiple_id = self.multiple[0].question_id
+        submit(handle_test, self.user_task, self.post_data({multiple_id: [option.pk for option in self.multiple]}))
+
+        selections = {self.simple[0].question_id: [self.simple[0].pk], multiple_id: [self.multiple[1].pk]}
+        queries = self.count_queries(handle_test, self.post_data(selections))
+
+        # Алдыңғы таңдаулар бір DELETE-пен өшіріліп, жаңалары бір INSERT-пен жазылады
+        table = UserAnswer.options.through._meta.db_table
+        statements = [query['sql'].split()[0] for query in queries if table in query['sql']]
+        self.assertEqual(statements, ['DELETE', 'INSERT'])
+        self.assertEqual(self.stored_selections(), {k: set(v) for k, v in selections.items()})
+
+    def test_queries_do_not_grow_with_questions(self):
+        selections = {options[0].question_id: [options[0].pk] for options in [self.simple, self.multiple]}
+        expected = len(self.count_queries(handle_test, self.post_data(selections)))
+
+        for __ in range(5):
+            options = self.add_question('multiple', correct=2, wrong=2)
+            selections[options[0].question_id] = [option.pk for option in options]
+        self.reset()
+        with self.assertNumQueries(expected):
+            submit(handle_test, self.user_task, self.post_data(selections))
+
+
+# Matching: бағалар бір bulk_update арқылы сақталады, check_answer өзі сақтамайды
+# ----------------------------------------------------------------------------------------------------------------------
+class MatchingSubmissionTests(SubmissionTestCase):
+    task_type = 'matching'
+
+    def setUp(self):
+        super().setUp()
+        self.columns = [MatchingColumn.objects.create(task=self.task, label=f'Баған {i}', order=i) for i in range(2)]
+        for i in range(4):
+            self.add_item(self.columns[i % 2])
+
+    def add_item(self, column):
+        item = MatchingItem.objects.create(correct_column=column, text='Элемент')
+        UserMatchingAnswer.objects.create(user_task=self.user_task, item=item)
+        return item
+
+    def stored(self):
+        answers = UserMatchingAnswer.objects.filter(user_task=self.user_task)
+        return {
+            item_id: (column_id, is_correct)
+            for item_id, column_id, is_correct in answers.values_list('item_id', 'selected_column_id', 'is_correct')
+        }
+
+    def test_grades_are_persisted(self):
+        items = list(MatchingItem.objects.filter(correct_column__task=self.task).order_by('pk'))
+        other = {self.columns[0].pk: self.columns[1].pk, self.columns[1].pk: self.columns[0].pk}
+        data = {f'column_{item.pk}': item.correct_column_id for item in items}
+        data[f'column_{items[0].pk}'] = other[items[0].correct_column_id]
+
+        submit(handle_matching, self.user_task, data)
+
+        expected = {item.pk: (item.correct_column_id, True) for item in items}
+        expected[items[0].pk] = (other[items[0].correct_column_id], False)
+        self.assertEqual(self.stored(), expected)
+        self.assertEqual((self.user_task.rating, self.user_task.is_completed), (5, True))
+
+        # Қайта жіберу: барлығы дұрыс
+        data[f'column_{items[0].pk}'] = items[0].correct_column_id
+        submit(handle_matching, self.user_task, data)
+        self.assertTrue(all(is_correct for __, is_correct in self.stored().values()))
+        self.assertEqual(self.user_task.rating, 10)
+
+    def test_check_answer_does_not_save(self):
+        answer = UserMatchingAnswer.objects.filter(user_task=self.user_task).select_related('item').first()
+        answer.selected_column_id = answer.item.correct_column_id
+
+        with self.assertNumQueries(0):
+            self.assertTrue(answer.check_answer())
+        self.assertFalse(UserMatchingAnswer.objects.get(pk=answer.pk).is_correct)
+
+    def test_queries_do_not_grow_with_items(self):
+        def data():
+            items = MatchingItem.objects.filter(correct_column__task=self.task).values_list('pk', 'correct_column_id')
+            return {f'column_{item_id}': column_id for item_id, column_id in items}
+
+        queries = self.count_queries(handle_matching, data())
+        table = UserMatchingAnswer._meta.db_table
+        self.assertEqual(len([query for query in queries if query['sql'].startswith(f'UPDATE "{table}"')]), 1)
+
+        for i in range(6):
+            self.add_item(self.columns[i % 2])
+        payload = data()
+        self.reset()
+        with self.assertNumQueries(len(queries)):
+            submit(handle_matching, self.user_task, payload)
+        self.assertTrue(all(is_correct for __, is_correct in self.stored().values()))
+
+
+# Text gap: жауаптар мен бағалар бір bulk_update арқылы сақталады
+# ----------------------------------------------------------------------------------------------------------------------
+class TextGapSubmissionTests(SubmissionTestCase):
+    task_type = 'text_gap'
+
+    def setUp(self):
+        super().setUp()
+        self.user_text_gaps = [self.add_gap(answer) for answer in ('Натрий', 'оттек', 'H2O')]
+
+    def add_gap(self, correct_answer):
+        text_gap = TextGap.objects.create(task=self.task, prompt='...', correct_answer=correct_answer)
+        return UserTextGap.objects.create(user_task=self.user_task, text_gap=text_gap)
+
+    def stored(self):
+        user_text_gaps = UserTextGap.objects.filter(user_task=self.user_task).order_by('pk')
+        return list(user_text_gaps.values_list('answer', 'is_correct'))
+
+    def test_grades_are_persisted(self):
+        answers = ['  натрий ', 'Оттек', 'CO2']
+        submit(handle_text_gap, self.user_task, {
+            f'answer_{user_text_gap.pk}': answer for user_text_gap, answer in zip(self.user_text_gaps, answers)
+        })
+
+        self.assertEqual(self.stored(), [('натрий', True), ('Оттек', True), ('CO2', False)])
+        self.assertEqual((self.user_task.rating, self.user_task.is_completed), (5, True))
+
+    def test_queries_do_not_grow_with_gaps(self):
+        queries = self.count_queries(handle_text_gap, {f'answer_{self.user_text_gaps[0].pk}': 'натрий'})
+        table = UserTextGap._meta.db_table
+        self.assertEqual(len([query for query in queries if query['sql'].startswith(f'UPDATE "{table}"')]), 1)
+
+        self.user_text_gaps += [self.add_gap(f'Жауап {i}') for i in range(6)]
+        payload = {f'answer_{gap.pk}': gap.text_gap.correct_answer for gap in self.user_text_gaps}
+        self.reset()
+        with self.assertNumQueries(len(queries)):
+            submit(handle_text_gap, self.user_task, payload)
+        self.assertTrue(all(is_correct for __, is_correct in self.stored()))
+
+
+# Lesson start: қайта бастау жолдарды көбейтпейді, тест таңдауларын тазартады
+# ----------------------------------------------------------------------------------------------------------------------
+class LessonStartTests(SubmissionTestCase):
+    task_type = 'test'
+
+    def setUp(self):
+        super().setUp()
+        # Жолдарды сабақты бастау өзі құрады
+        self.user_task.delete()
+        self.user_lesson = user_lesson = self.user_task.user_lesson
+        self.user_chapter = UserChapter.objects.create(
+            user=user_lesson.user, user_subject=user_lesson.user_subject, chapter=user_lesson.lesson.chapter
+        )
+        question = Question.objects.create(task=self.task, text='Сұрақ')
+        self.option = Option.objects.create(question=question, text='Иә', is_correct=True)
+        self.client.force_login(user_lesson.user)
+
+    def start(self):
+        user_lesson = self.user_lesson
+        url = reverse('lesson_start', args=[user_lesson.user_subject_id, self.user_chapter.pk, user_lesson.pk])
+        self.assertEqual(self.client.post(url).status_code, 302)
+
+    def test_restart_clears_selections_without_duplicating_rows(self):
+        self.start()
+        user_answer = UserAnswer.objects.get()
+        user_answer.options.add(self.option)
+        self.user_lesson.refresh_from_db()
+        started_at = self.user_lesson.started_at
+
+        self.start()
+        self.assertEqual(UserAnswer.objects.get(), user_answer)
+        self.assertFalse(user_answer.options.exists())
+        self.assertEqual(UserTask.objects.filter(user_lesson=self.user_lesson).count(), 1)
+        self.user_lesson.refresh_from_db()
+        self.assertEqual((self.user_lesson.status, self.user_lesson.started_at), ('in-progress', started_at))
@@ -5,6 +5,7 @@ from .views import home, subject
 urlpatterns = [
     path('', home.student_view, name='student'),
     path('subject/<pk>/', home.subject_detail_view, name='subject_detail'),
+    path('subject/<pk>/leaderboard/', home.subject_leaderboard_view, name='subject_leaderboard'),
     path('subject/enroll/<int:subject_id>/', home.enroll_user_to_subject, name='enroll_subject'),
 
     path('user/subject/<subject_id>/chapter/<chapter_id>/lesson/<lesson_id>/', subject.user_lesson_view, name='user_lesson'),
@@ -28,4 +29,5 @@ urlpatterns = [
         subject.feedback_handler,
         name='feedback_handler'
     ),
+    path('user/video/heartbeat/', subject.video_heartbeat_handler, name='video_heartbeat'),
 ]
@@ -1,62 +1,79 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models.aggregates import Avg
+from django.db.models import Count, Q, OuterRef, Subquery
 from django.shortcuts import render, get_object_or_404, redirect
 from django.utils.translation import gettext_lazy as _
-from core.models import Subject, UserSubject, Lesson, UserChapter, UserLesson
+from core.models import Subject, UserSubject, Lesson, UserChapter, UserLesson, SubjectStats, ClassSubjectStats, \
+    StudentSubjectStats
+from core.services.leaderboards import top_students, top_students_many, student_position
+from core.services.progress import recompute_progress
+from core.services.syllabus import get_syllabus
 from core.utils.decorators import role_required
 
 
+# Алғашқы бөлім мен сабақтың id-лері (UserSubject queryset-ке subquery ретінде)
+def with_first_lesson_ids(user_subjects):
+    first_user_chapter = UserChapter.objects.filter(user_subject=OuterRef('pk')).order_by('pk')
+    first_user_lesson = UserLesson.objects.filter(
+        user_subject=OuterRef('pk'),
+        lesson__chapter=Subquery(
+            UserChapter.objects.filter(user_subject=OuterRef(OuterRef('pk'))).order_by('pk').values('chapter_id')[:1]
+        ),
+    ).order_by('pk')
+
+    return user_subjects.annotate(
+        first_chapter_id=Subquery(first_user_chapter.values('pk')[:1]),
+        first_lesson_id=Subquery(first_user_lesson.values('pk')[:1]),
+    )
+
+
 # student dashboard page
 # ----------------------------------------------------------------------------------------------------------------------
 @login_required
 @role_required('student')
 def student_view(request):
     user = request.user
-    subjects = Subject.objects.all()
-    user_subjects_qs = UserSubject.objects.filter(user=user).prefetch_related(
-        'user_chapters__chapter',
-        'user_lessons__lesson__chapter'
+
+    # Пәндер: бөлім мен сабақ саны бір сұраныста
+    subjects = Subject.objects.annotate(
+        chapter_count=Count('chapters', distinct=True),
+        lesson_count=Count('lessons', distinct=True),
+    )
+
+    # Қолданушының пәндері: прогресс және алғашқы бөлім/сабақ бір сұраныста.
+    # Бөлім/сабақ сандары UserSubject есептегіштерінен алынады (core.services.progress)
+    user_subjects_qs = with_first_lesson_ids(UserSubject.objects.filter(user=user)).annotate(
+        completed_chapter_count=Count('user_chapters', filter=Q(user_chapters__is_completed=True)),
     )
     user_subjects = {us.subject_id: us for us in user_subjects_qs}
-    average_percentage = user_subjects_qs.aggregate(avg=Avg('percentage'))['avg'] or 0
+
+    # Әр пәннің рейтингтегі алғашқы 3 білім алушысы (кэштен)
+    subjects = list(subjects)
+    students_by_subject = top_students_many([subject.pk for subject in subjects], limit=3)
 
     subject_list = []
     for subject in subjects:
         user_subject = user_subjects.get(subject.id)
 
-        first_user_chapter = user_subject.user_chapters.first() if user_subject else None
-        first_chapter = first_user_chapter
-
-        first_user_lesson = (
-            user_subject.user_lessons.filter(lesson__chapter=first_chapter.chapter).first()
-            if user_subject and first_chapter else None
-        )
-        first_lesson = first_user_lesson
-
-        completed_chapter_count = 0
-        completed_lesson_count = 0
-
-        if user_subject:
-            completed_chapter_count = user_subject.user_chapters.filter(is_completed=True).count()
-            completed_lesson_count = user_subject.user_lessons.filter(is_completed=True).count()
-
-        subject_students = UserSubject.objects.filter(subject=subject).select_related('user')[:3]
-
         subject_list.append({
             'subject': subject,
             'user_subject': user_subject,
-            'first_chapter': first_chapter,
-            'first_lesson': first_lesson,
-            'completed_chapter_count': completed_chapter_count,
-            'completed_lesson_count': completed_lesson_count,
-            'students': subject_students,
+            'first_chapter_id': user_subject.first_chapter_id if user_subject else None,
+            'first_lesson_id': user_subject.first_lesson_id if user_subject else None,
+            'chapter_count': user_subject.chapter_count if user_subject else 0,
+            'lesson_count': user_subject.lesson_count if user_subject else 0,
+            'completed_chapter_count': user_subject.completed_chapter_count if user_subject else 0,
+            'completed_lesson_count': user_subject.completed_lesson_count if user_subject else 0,
+            'students': students_by_subject.get(subject.id, []),
         })
 
+    percentages = [us.percentage for us in user_subjects.values()]
+    average_percentage = sum(percentages) / len(percentages) if percentages else 0
+
     context = {
         'statistics': {
-            'in_process': user_subjects_qs.filter(is_completed=False).count(),
-            'completed': user_subjects_qs.filter(is_completed=True).count(),
+            'in_process': sum(1 for us in user_subjects.values() if not us.is_completed),
+            'completed': sum(1 for us in user_subjects.values() if us.is_completed),
             'average_percentage': round(average_percentage),
         },
         'subject_list': subject_list,
@@ -71,50 +88,59 @@ def student_view(request):
 def subject_detail_view(request, pk):
     user = request.user
     subject = get_object_or_404(Subject, pk=pk)
-    user_subject = (
+
+    # Бағдарлама ағашы барлық қолданушыға ортақ (кэштен), жеке бөлігі бір сұраныспен
+    syllabus = get_syllabus(subject)
+    user_subject = with_first_lesson_ids(UserSubject.objects.filter(user=user, subject=subject)).first()
+
+    students = (
         UserSubject.objects
-        .filter(user=user, subject=subject)
-        .prefetch_related('user_chapters__chapter', 'user_lessons__lesson__chapter')
-        .first()
+        .filter(subject=subject)
+        .select_related('user')
+        .only('percentage', 'user__first_name', 'user__last_name', 'user__email', 'user__avatar')
+        .order_by('pk')
     )
 
-    first_chapter_id = None
-    first_lesson_id = None
+    context = {
+        'subject': subject,
+        'user_subject': user_subject,
+        'first_chapter_id': user_subject.first_chapter_id if user_subject else None,
+        'first_lesson_id': user_subject.first_lesson_id if user_subject else None,
+        'chapters': syllabus['chapters'],
+        'chapter_count': syllabus['chapter_count'],
+        'lesson_count': syllabus['lesson_count'],
+        'students': students,
+    }
+    return render(request, 'app/dashboard/student/subject/page.html', context)
 
-    if user_subject:
-        first_user_chapter = user_subject.user_chapters.first()
-        if first_user_chapter:
-            first_chapter_id = first_user_chapter.id
 
-            first_user_lesson = user_subject.user_lessons.filter(
-                lesson__chapter=first_user_chapter.chapter
-            ).first()
-            if first_user_lesson:
-                first_lesson_id = first_user_lesson.id
+# Subject leaderboard page
+# ----------------------------------------------------------------------------------------------------------------------
+# ?scope=class (өз тобы, әдепкі) | all (пәннің барлық білім алушылары)
+@login_required
+@role_required('student')
+def subject_leaderboard_view(request, pk):
+    user = request.user
+    subject = get_object_or_404(Subject, pk=pk)
+    scope = 'all' if request.GET.get('scope') == 'all' or user.user_class == 'none' else 'class'
+    user_class = user.user_class if scope == 'class' else None
+
+    if user_class:
+        cohort = ClassSubjectStats.objects.filter(subject=subject, user_class=user_class).first()
+    else:
+        cohort = SubjectStats.objects.filter(subject=subject).first()
 
-    chapters = []
-    for chapter in subject.chapters.all():
-        lessons = []
-        for lesson in chapter.lessons.all():
-            lesson_duration = sum(task.duration for task in lesson.tasks.all())
-            lessons.append({
-                'lesson': lesson,
-                'duration': lesson_duration,
-            })
-
-        chapters.append({
-            'chapter': chapter,
-            'lessons': lessons,
-        })
+    my_stats = StudentSubjectStats.objects.filter(subject=subject, user=user).first()
 
     context = {
         'subject': subject,
-        'user_subject': user_subject,
-        'first_chapter_id': first_chapter_id,
-        'first_lesson_id': first_lesson_id,
-        'chapters': chapters,
+        'scope': scope,
+        'leaders': top_students(subject.pk, user_class),
+        'my_stats': my_stats,
+        'my_position': student_position(my_stats, user_class) if my_stats else None,
+        'cohort_size': cohort.student_count if cohort else 0,
     }
-    return render(request, 'app/dashboard/student/subject/page.html', context)
+    return render(request, 'app/dashboard/student/subject/leaderboard.html', context)
 
 
 # Enroll subject handler
@@ -137,5 +163,7 @@ def enroll_user_to_subject(request, subject_id):
         for lesson in chapter.lessons.all():
             UserLesson.objects.get_or_create(user_subject=user_subject, user=user, lesson=lesson)
 
+    recompute_progress(UserSubject.objects.filter(pk=user_subject.pk))
+
     messages.success(request, _('Пән қосылды!'))
     return redirect('student')
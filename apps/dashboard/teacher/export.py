@@ -0,0 +1,98 @@
+import csv
+import json
+
+from core.models import UserSubject, UserChapter, UserLesson
+
+
+CHUNK_SIZE = 2000
+
+STUDENT_COLUMNS = (
+    ('user_id', 'user_id'),
+    ('last_name', 'user__last_name'),
+    ('first_name', 'user__first_name'),
+    ('username', 'user__username'),
+    ('user_class', 'user__user_class'),
+)
+
+# level -> (model, subject өрісінің жолы, қосымша бағандар, реттеу)
+LEVELS = {
+    'subject': (
+        UserSubject, 'subject',
+        (('subject', 'subject__name'), ('rating', 'rating'), ('percentage', 'percentage'), ('is_completed', 'is_completed')),
+        ('subject_id',),
+    ),
+    'chapter': (
+        UserChapter, 'user_subject__subject',
+        (
+            ('subject', 'user_subject__subject__name'), ('chapter_order', 'chapter__order'), ('chapter', 'chapter__name'),
+            ('rating', 'rating'), ('percentage', 'percentage'), ('is_completed', 'is_completed'),
+        ),
+        ('user_subject__subject_id', 'chapter__order', 'chapter_id'),
+    ),
+    'lesson': (
+        UserLesson, 'user_subject__subject',
+        (
+            ('subject', 'user_subject__subject__name'), ('chapter', 'lesson__chapter__name'),
+            ('lesson_order', 'lesson__order'), ('lesson', 'lesson__title'), ('status', 'status'),
+            ('rating', 'rating'), ('percentage', 'percentage'), ('completed_at', 'completed_at'),
+        ),
+        ('user_subject__subject_id', 'lesson__chapter__order', 'lesson__order', 'lesson_id'),
+    ),
+}
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'tsv': ('text/tab-separated-values; charset=utf-8', 'tsv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+}
+
+
+# csv.writer жолды буферге жазбай, бірден қайтаруы үшін
+class Echo:
+    def write(self, value):
+        return value
+
+
+def gradebook_rows(level, user_class=None, subject_id=None):
+    model, subject_path, columns, ordering = LEVELS[level]
+    columns = STUDENT_COLUMNS + columns
+
+    queryset = model.objects.all()
+    if user_class:
+        queryset = queryset.filter(user__user_class=user_class)
+    if subject_id:
+        queryset = queryset.filter(**{f'{subject_path}_id': subject_id})
+
+    header = [name for name, __ in columns]
+    rows = (
+        queryset
+        .order_by('user__last_name', 'user__first_name', 'user_id', *ordering)
+        .values_list(*[path for __, path in columns])
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    return header, rows
+
+
+# Кестелік редакторда формула ретінде орындалатын мәтіндер (аты-жөні, пән/сабақ атауы және т.б.)
+# алдына ' қойылады. Сандар өзгермейді
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_formula(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+# Жолдарды бір-бірлеп форматтап беретін генератор (жад көлемі тұрақты)
+def stream_gradebook(fmt, header, rows):
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(dict(zip(header, row)), ensure_ascii=False, default=str) + '\n'
+        return
+
+    writer = csv.writer(Echo(), delimiter='\t' if fmt == 'tsv' else ',')
+    # BOM: Excel CSV-дегі кириллицаны дұрыс ашуы үшін
+    yield ('\ufeff' if fmt == 'csv' else '') + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([escape_formula(value) for value in row])
@@ -0,0 +1,24 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+
+SEARCH_FIELDS = ('first_name', 'last_name', 'username')
+# Бұдан қысқа сұраныста trigram мағынасыз: тек басталуы бойынша іздейміз
+MIN_TRIGRAM_LENGTH = 3
+
+
+# Аты-жөні бойынша іздеу: `бағана %> сұраныс` шарты pg_trgm GIN индекстерін (core_user_*_trgm) пайдаланады.
+# Нәтиже ұқсастық бойынша реттеледі; pg_trgm кирилл әріптерін (қазақ әріптерін қоса) регистрсіз салыстырады
+def search_users(queryset, q):
+    lookup = 'istartswith' if len(q) < MIN_TRIGRAM_LENGTH else 'trigram_word_similar'
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{field}__{lookup}': q})
+
+    return (
+        queryset
+        .filter(condition)
+        .annotate(similarity=Greatest(*[TrigramWordSimilarity(q, field) for field in SEARCH_FIELDS]))
+        .order_by('-similarity', 'last_name', 'first_name', 'pk')
+    )
@@ -0,0 +1,378 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Value
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.models import User, Subject, Chapter, Lesson, Task, Question, Option, UserSubject, UserLesson, UserTask, \
+    UserAnswer, StudentSubjectStats
+from apps.dashboard.teacher.search import search_users
+from apps.dashboard.teacher.views import SEARCH_PAGE_SIZE
+from core.services.heatmap import build_heatmap, get_heatmap
+from core.services.item_analysis import REBUILD_INTERVAL, build_item_analysis, get_item_analysis, register_submission
+
+
+def create_subject(owner, name, chapters=1, lessons=2):
+    subject = Subject.objects.create(name=name, owner=owner)
+    for c in range(chapters):
+        chapter = Chapter.objects.create(subject=subject, name=f'{name} {c}', order=c)
+        for l in range(lessons):
+            lesson = Lesson.objects.create(subject=subject, chapter=chapter, title=f'{name} {c}.{l}', order=l)
+            Task.objects.create(lesson=lesson, task_type='written', rating=5)
+    return subject
+
+
+# Teacher dashboard: сұраныс саны пәндер мен білім алушылар санына тәуелді емес
+# ----------------------------------------------------------------------------------------------------------------------
+class TeacherDashboardQueriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.subject = create_subject(self.teacher, 'Химия')
+        self.enroll(User.objects.create_user('student', password='x', user_class='8b'), self.subject)
+
+    def enroll(self, user, subject):
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('enroll_subject', args=[subject.pk]))
+
+    def count_queries(self, url):
+        cache.clear()
+        self.client.force_login(self.teacher)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def grow(self, subjects=4, students=6):
+        new_subjects = [create_subject(self.teacher, f'Пән {i}', chapters=2) for i in range(subjects)]
+        for i in range(students):
+            student = User.objects.create_user(f'other{i}', password='x', user_class='8b' if i % 2 else '8v')
+            for subject in [self.subject, *new_subjects]:
+                self.enroll(student, subject)
+
+    def test_teacher_queries_do_not_grow_with_subjects_and_students(self):
+        # ?q= іздеуі pg_trgm-ге сүйенеді (.search), сондықтан тек PostgreSQL-де тексеріледі
+        variants = ['', '?user_class=8b']
+        if connection.vendor == 'postgresql':
+            variants.append('?q=other')
+
+        for params in variants:
+            with self.subTest(params=params):
+                url = f"{reverse('teacher')}{params}"
+                expected = self.count_queries(url)
+                if not params:
+                    self.grow()
+
+                self.client.force_login(self.teacher)
+                with self.assertNumQueries(expected):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_student_totals_come_from_report_tables(self):
+        self.grow(subjects=2, students=2)
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('teacher'))
+
+        self.assertTrue(StudentSubjectStats.objects.exists())
+        self.assertEqual(response.context['generics']['subjects_count'], 3)
+        self.assertEqual(response.context['generics']['students_count'], 3 + 2 * 2)
+        self.assertEqual(len(response.context['students_data']), 3)
+
+
+# Item analysis: дұрыс жауап үлесі, нұсқалар таралуы, дискриминация индексі
+# ----------------------------------------------------------------------------------------------------------------------
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.subject = Subject.objects.create(name='Химия', owner=self.teacher)
+        chapter = Chapter.objects.create(subject=self.subject, name='Бөлім', order=0)
+        self.lesson = Lesson.objects.create(subject=self.subject, chapter=chapter, title='Сабақ', order=0)
+        self.task = Task.objects.create(lesson=self.lesson, task_type='test', rating=10)
+
+        self.simple = Question.objects.create(task=self.task, text='<p>Сұрақ 1</p>', question_type='simple', order=0)
+        self.a = Option.objects.create(question=self.simple, text='A', is_correct=True)
+        self.b = Option.objects.create(question=self.simple, text='B')
+        self.multiple = Question.objects.create(task=self.task, text='<p>Сұрақ 2</p>', question_type='multiple', order=1)
+        self.c = Option.objects.create(question=self.multiple, text='C', is_correct=True)
+        self.d = Option.objects.create(question=self.multiple, text='D', is_correct=True)
+        self.e = Option.objects.create(question=self.multiple, text='E')
+
+    def submit(self, username, rating, answers, is_completed=True):
+        user = User.objects.create_user(username, password='x')
+        user_subject = UserSubject.objects.create(user=user, subject=self.subject)
+        user_lesson = UserLesson.objects.create(user=user, user_subject=user_subject, lesson=self.lesson)
+        user_task = UserTask.objects.create(
+            user_lesson=user_lesson, task=self.task, rating=rating, is_completed=is_completed,
+        )
+        for question, options in answers.items():
+            UserAnswer.objects.create(user_task=user_task, question=question).options.set(options)
+
+    def submit_class(self):
+        self.submit('s1', 10, {self.simple: [self.a], self.multiple: [self.c, self.d]})
+        self.submit('s2', 8, {self.simple: [self.a], self.multiple: [self.c]})
+        self.submit('s3', 4, {self.simple: [self.b], self.multiple: [self.c, self.d, self.e]})
+        self.submit('s4', 2, {self.simple: [], self.multiple: [self.d]})
+
+    def test_rates_and_discrimination(self):
+        self.submit_class()
+        self.submit('draft', 10, {self.simple: [self.b]}, is_completed=False)
+
+        report = build_item_analysis(self.task)
+        simple, multiple = report['questions']
+
+        self.assertEqual(report['respondents'], 4)
+        self.assertEqual(simple['text'], '<p>Сұрақ 1</p>')
+        self.assertEqual(
+            (simple['answered'], simple['blank'], simple['correct_rate'], simple['discrimination']),
+            (4, 1, 0.5, 1.0),
+        )
+        self.assertEqual([(o['count'], o['rate']) for o in simple['options']], [(2, 0.5), (1, 0.25)])
+
+        # multiple: барлық дұрыс нұсқа және бірде-бір қате нұсқа болмаса ғана дұрыс
+        self.assertEqual((multiple['correct_rate'], multiple['discrimination']), (0.25, 1.0))
+        self.assertEqual([o['count'] for o in multiple['options']], [3, 3, 1])
+
+    def test_option_text_is_sanitized_html(self):
+        self.a.text = '<b>A</b><script>alert(1)</script>'
+        self.a.save()
+
+        option = build_item_analysis(self.task)['questions'][0]['options'][0]
+        self.assertEqual(option['text'], '<b>A</b>')
+
+    def test_discrimination_needs_min_respondents(self):
+        self.submit('s1', 10, {self.simple: [self.a]})
+        self.submit('s2', 2, {self.simple: [self.b]})
+
+        simple = build_item_analysis(self.task)['questions'][0]
+        self.assertEqual(simple['correct_rate'], 0.5)
+        self.assertIsNone(simple['discrimination'])
+
+    def test_queries_do_not_grow_with_answers(self):
+        self.submit_class()
+        with CaptureQueriesContext(connection) as queries:
+            build_item_analysis(self.task)
+
+        for i in range(8):
+            self.submit(f'extra{i}', i, {self.simple: [self.a, self.b][i % 2:], self.multiple: [self.c, self.e]})
+        with self.assertNumQueries(len(queries)):
+            build_item_analysis(self.task)
+
+    def test_report_is_rebuilt_after_rebuild_interval(self):
+        self.submit_class()
+        self.assertEqual(get_item_analysis(self.task)['respondents'], 4)
+
+        self.submit('s5', 10, {self.simple: [self.a], self.multiple: [self.c, self.d]})
+        with self.captureOnCommitCallbacks(execute=True):
+            register_submission(self.task.pk)
+        self.assertEqual(get_item_analysis(self.task)['respondents'], 4)
+
+        later = timezone.now() + timedelta(seconds=REBUILD_INTERVAL + 1)
+        with mock.patch('core.services.item_analysis.timezone.now', return_value=later):
+            self.assertEqual(get_item_analysis(self.task)['respondents'], 5)
+
+    def test_view_renders_reports(self):
+        self.submit_class()
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('item_analysis', args=[self.subject.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['reports']), 1)
+
+
+# Progress heatmap: бағандар бағдарлама ретімен, ұяшық = [статус, баға, секунд]
+# ----------------------------------------------------------------------------------------------------------------------
+class HeatmapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.subject = create_subject(self.teacher, 'Химия', chapters=2, lessons=2)
+        self.lessons = list(Lesson.objects.filter(subject=self.subject).order_by('chapter__order', 'order'))
+
+    def create_student(self, username, user_class='8b', last_name=''):
+        user = User.objects.create_user(username, password='x', user_class=user_class, last_name=last_name)
+        user_subject = UserSubject.objects.create(user=user, subject=self.subject)
+        return user, user_subject
+
+    def add_lesson(self, user, user_subject, lesson, status, rating=0, minutes=None):
+        started_at = timezone.now()
+        UserLesson.objects.create(
+            user=user, user_subject=user_subject, lesson=lesson, status=status, rating=rating,
+            started_at=started_at, completed_at=started_at + timedelta(minutes=minutes) if minutes else None,
+        )
+
+    def test_payload(self):
+        user, user_subject = self.create_student('aigerim', last_name='Ахметова')
+        self.add_lesson(user, user_subject, self.lessons[0], 'finished', rating=8, minutes=5)
+        self.add_lesson(user, user_subject, self.lessons[2], 'in-progress')
+        # Сабақ бастамаған оқушы кестеде жоқ
+        self.create_student('bolat', user_class='8v', last_name='Бекұлы')
+
+        heatmap = build_heatmap(self.subject)
+
+        self.assertEqual([lesson['id'] for lesson in heatmap['lessons']], [lesson.pk for lesson in self.lessons])
+        self.assertEqual(heatmap['lessons'][2]['chapter'], 'Химия 1')
+        self.assertEqual(len(heatmap['students']), 1)
+        self.assertEqual(heatmap['students'][0]['cells'], [[2, 8, 300], None, [1, 0, None], None])
+
+    def test_json_view_filters_by_class(self):
+        for username, user_class in (('a', '8b'), ('b', '8v'), ('c', '8b')):
+            user, user_subject = self.create_student(username, user_class)
+            self.add_lesson(user, user_subject, self.lessons[0], 'in-progress')
+        self.client.force_login(self.teacher)
+
+        url = reverse('heatmap_json', args=[self.subject.pk])
+        payload = self.client.get(url).json()
+        self.assertEqual(set(payload), {'lessons', 'students'})
+        self.assertEqual(len(payload['students']), 3)
+        self.assertEqual(len(self.client.get(f'{url}?user_class=8b').json()['students']), 2)
+
+    def test_cache_follows_content_version(self):
+        user, user_subject = self.create_student('a')
+        self.add_lesson(user, user_subject, self.lessons[0], 'in-progress')
+        self.assertEqual(len(get_heatmap(self.subject)['lessons']), 4)
+
+        Lesson.objects.create(subject=self.subject, chapter=self.lessons[0].chapter, title='Жаңа', order=5)
+        self.subject.refresh_from_db()
+        self.assertEqual(len(get_heatmap(self.subject)['lessons']), 5)
+
+        with self.assertNumQueries(0):
+            get_heatmap(self.subject)
+
+    def test_queries_do_not_grow_with_students(self):
+        user, user_subject = self.create_student('a')
+        self.add_lesson(user, user_subject, self.lessons[0], 'in-progress')
+        with CaptureQueriesContext(connection) as queries:
+            build_heatmap(self.subject)
+
+        for i in range(6):
+            user, user_subject = self.create_student(f'other{i}')
+            for lesson in self.lessons:
+                self.add_lesson(user, user_subject, lesson, 'finished', rating=i, minutes=i + 1)
+        cache.clear()
+        with self.assertNumQueries(len(queries)):
+            build_heatmap(self.subject)
+
+
+# Gradebook export: әр формат, BOM тек CSV-де, формула ретінде ашылатын мәтіндер қорғалады
+# ----------------------------------------------------------------------------------------------------------------------
+class GradebookExportTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.subject = create_subject(self.teacher, '=HYPERLINK("http://x")')
+        names = ('Әлиев', '+77001234567', '-1+2', '@SUM(A1)', '\tТаб')
+        for username, last_name in zip('abcde', names):
+            user = User.objects.create_user(username, password='x', last_name=last_name, user_class='8b')
+            UserSubject.objects.create(user=user, subject=self.subject, rating=7)
+        self.client.force_login(self.teacher)
+
+    def export(self, fmt):
+        response = self.client.get(reverse('gradebook_export'), {'level': 'subject', 'format': fmt})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_and_tsv_escape_formulas(self):
+        for fmt, delimiter in (('csv', ','), ('tsv', '\t')):
+            with self.subTest(fmt=fmt):
+                content = self.export(fmt)
+                self.assertEqual(content.startswith('\ufeff'), fmt == 'csv')
+
+                rows = list(csv.DictReader(io.StringIO(content.lstrip('\ufeff')), delimiter=delimiter))
+                self.assertEqual(
+                    sorted(row['last_name'] for row in rows),
+                    sorted(["'+77001234567", "'-1+2", "'@SUM(A1)", "'\tТаб", 'Әлиев']),
+                )
+                self.assertEqual({row['subject'] for row in rows}, {'\'=HYPERLINK("http://x")'})
+                self.assertEqual({row['rating'] for row in rows}, {'7'})
+
+    def test_jsonl_keeps_raw_values(self):
+        content = self.export('jsonl')
+        self.assertFalse(content.startswith('\ufeff'))
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertIn('@SUM(A1)', {row['last_name'] for row in rows})
+        self.assertEqual({row['rating'] for row in rows}, {7})
+
+    def test_unknown_format_is_404(self):
+        response = self.client.get(reverse('gradebook_export'), {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 404)
+
+
+# Student search: қысқа сұраныс басталуы бойынша, ұзыны trigram бойынша; беттеу COUNT-сыз (LIMIT+1)
+# ----------------------------------------------------------------------------------------------------------------------
+# SQLite-та trigram жоқ, сондықтан көрініс тесттерінде іздеу басталуы бойынша сүзгімен ауыстырылады
+def prefix_search(queryset, q):
+    return queryset.filter(username__startswith=q).annotate(similarity=Value(1.0)).order_by('username')
+
+
+class StudentSearchTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.client.force_login(self.teacher)
+
+    def lookups(self, q):
+        condition = search_users(User.objects.all(), q).query.where.children[0]
+        return {(child.lookup_name, child.lhs.target.name) for child in condition.children}
+
+    def search(self, **params):
+        response = self.client.get(reverse('student_search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_short_queries_fall_back_to_prefix_lookup(self):
+        fields = ('first_name', 'last_name', 'username')
+        for q in ('а', 'ах'):
+            with self.subTest(q=q):
+                self.assertEqual(self.lookups(q), {('istartswith', field) for field in fields})
+        self.assertEqual(self.lookups('ахм'), {('trigram_word_similar', field) for field in fields})
+
+    @mock.patch('apps.dashboard.teacher.views.search_users', prefix_search)
+    def test_pages_are_fetched_with_one_extra_row(self):
+        count = SEARCH_PAGE_SIZE * 2 + 3
+        for i in range(count):
+            User.objects.create_user(f'student{i:02}', password='x', user_class='8b')
+        User.objects.create_user('student-8v', password='x', user_class='8v')
+
+        with CaptureQueriesContext(connection) as queries:
+            first = self.search(q='student', user_class='8b')
+        self.assertEqual((len(first['results']), first['has_next']), (SEARCH_PAGE_SIZE, True))
+        self.assertTrue([query for query in queries if f'LIMIT {SEARCH_PAGE_SIZE + 1}' in query['sql']])
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+
+        last = self.search(q='student', user_class='8b', page=3)
+        self.assertEqual((len(last['results']), last['has_next']), (3, False))
+        self.assertEqual(last['results'][-1]['username'], f'student{count - 1:02}')
+
+        self.assertEqual(self.search(q='student', page=9)['results'], [])
+        self.assertEqual(self.search(q=''), {'results': [], 'page': 1, 'has_next': False})
+
+    @skipUnless(connection.vendor == 'postgresql', 'pg_trgm тек PostgreSQL-де')
+    def test_trigram_search(self):
+        User.objects.create_user('s1', password='x', first_name='Айгерім', last_name='Ахметова')
+        User.objects.create_user('s2', password='x', first_name='Бауыржан', last_name='Сейітов')
+
+        self.assertEqual([row['username'] for row in self.search(q='ахметова')['results']], ['s1'])
+        self.assertEqual([row['username'] for row in self.search(q='Ах')['results']], ['s1'])
+        self.assertEqual([row['username'] for row in self.search(q='сейіт')['results']], ['s2'])
+
+    def test_teacher_view_lists_enrolled_students_once(self):
+        subjects = [create_subject(self.teacher, f'Пән {i}') for i in range(2)]
+        enrolled = User.objects.create_user('enrolled', password='x')
+        for subject in subjects:
+            UserSubject.objects.create(user=enrolled, subject=subject)
+        User.objects.create_user('idle', password='x')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('teacher'))
+        self.assertEqual([row['user'] for row in response.context['students_data']], [enrolled])
+        self.assertFalse([query for query in queries if 'DISTINCT' in query['sql']])
+        self.assertTrue([query for query in queries if 'EXISTS' in query['sql']])
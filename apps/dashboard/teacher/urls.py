@@ -3,5 +3,10 @@ from . import views
 
 
 urlpatterns = [
-    path('', views.teacher_view, name='teacher')
+    path('', views.teacher_view, name='teacher'),
+    path('export/', views.gradebook_export_view, name='gradebook_export'),
+    path('subject/<int:pk>/items/', views.item_analysis_view, name='item_analysis'),
+    path('subject/<int:pk>/heatmap/', views.heatmap_view, name='heatmap'),
+    path('subject/<int:pk>/heatmap.json', views.heatmap_json_view, name='heatmap_json'),
+    path('students/search/', views.student_search_view, name='student_search'),
 ]
\ No newline at end of file
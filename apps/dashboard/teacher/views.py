@@ -1,106 +1,207 @@
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.db.models.aggregates import Avg
-from django.http import HttpResponse
-from django.shortcuts import render
-
-from core.models import Subject, UserSubject, UserChapter, UserLesson, User
+from django.core.paginator import Paginator
+from django.db.models import Exists, OuterRef, Sum
+from django.http import HttpResponse, StreamingHttpResponse, Http404, JsonResponse
+from django.shortcuts import render, get_object_or_404
+
+from core.models import Subject, Task, User, UserSubject, ClassSubjectStats, StudentSubjectStats, stats_averages
+from core.services.heatmap import get_heatmap
+from core.services.item_analysis import get_item_analysis
+from core.services.reports import STATS_FIELDS
 from core.utils.decorators import role_required
+from .export import LEVELS, FORMATS, gradebook_rows, stream_gradebook
+from .search import search_users
+
+
+STUDENTS_PER_PAGE = 25
+SEARCH_PAGE_SIZE = 10
+EMPTY_STATS = dict.fromkeys(STATS_FIELDS, 0)
 
 
+# Статистика есеп кестелерінен оқылады (core.services.reports жаңартады),
+# сондықтан беттің құны жауап кестелерінің көлеміне тәуелді емес
 @login_required
 @role_required('teacher')
 def teacher_view(request):
-    user = request.user
-    subjects_data = []
-
-    for subject in Subject.objects.all():
-        user_subjects = UserSubject.objects.filter(subject=subject)
-
-        student_count = user_subjects.count()
-        subject_avg = user_subjects.aggregate(
-            avg_rating=Avg('rating'),
-            avg_percentage=Avg('percentage')
-        )
-        chapter_stats = UserChapter.objects.filter(user_subject__subject=subject).aggregate(
-            avg_rating=Avg('rating'),
-            avg_percentage=Avg('percentage')
-        )
-        lesson_stats = UserLesson.objects.filter(user_subject__subject=subject).aggregate(
-            avg_rating=Avg('rating'),
-            avg_percentage=Avg('percentage')
-        )
+    q = request.GET.get('q', '').strip()
+    classroom = request.GET.get('user_class', '').strip()
 
-        def safe_round(value, digits=0):
-            return round(value, digits) if value is not None else 0
+    # Пәндер: топ таңдалса, сол топтың статистикасы
+    subjects = list(Subject.objects.select_related('stats'))
+    class_stats = {}
+    if classroom:
+        class_stats = {stats.subject_id: stats for stats in ClassSubjectStats.objects.filter(user_class=classroom)}
 
+    subjects_data = []
+    for subject in subjects:
+        stats = class_stats.get(subject.pk) if classroom else getattr(subject, 'stats', None)
         subjects_data.append({
             'subject': subject,
-            'student_count': student_count,
-
-            # UserSubject
-            'subject_avg_rating': safe_round(subject_avg['avg_rating']),
-            'subject_avg_percentage': safe_round(subject_avg['avg_percentage'], 2),
-
-            'chapter_avg_rating': safe_round(chapter_stats['avg_rating']),
-            'chapter_avg_percentage': safe_round(chapter_stats['avg_percentage'], 2),
-
-            'lesson_avg_rating': safe_round(lesson_stats['avg_rating']),
-            'lesson_avg_percentage': safe_round(lesson_stats['avg_percentage'], 2),
+            'student_count': stats.student_count if stats else 0,
+            **(stats.averages() if stats else stats_averages(EMPTY_STATS)),
         })
 
-    # Барлық оқушылар
-    q = request.GET.get('q', '').strip()
-    classroom = request.GET.get('user_class', '').strip()
-
-    # Бастапқы users queryset
-    users = User.objects.filter(user_subjects__isnull=False).distinct()
+    # Кемінде бір пәнге жазылған оқушылар: JOIN + DISTINCT орнына EXISTS (сұрыптау мен беттеу индекспен)
+    users = (
+        User.objects
+        .filter(Exists(UserSubject.objects.filter(user=OuterRef('pk'))))
+        .order_by('last_name', 'first_name', 'pk')
+    )
 
     if q:
-        users = users.filter(
-            Q(first_name__icontains=q) |
-            Q(last_name__icontains=q) |
-            Q(username__icontains=q)
-        )
+        users = search_users(users, q)
 
     if classroom:
         users = users.filter(user_class=classroom)
 
-    students_data = []
-    for user in users:
-        user_subject_qs = user.user_subjects.all()
-        subject_stats = user_subject_qs.aggregate(
-            avg_rating=Avg('rating'),
-            avg_percentage=Avg('percentage')
-        )
-        chapter_stats = user.user_chapters.all().aggregate(
-            avg_rating=Avg('rating'),
-            avg_percentage=Avg('percentage')
+    page_obj = Paginator(users, STUDENTS_PER_PAGE).get_page(request.GET.get('page'))
+
+    # Беттегі оқушылардың барлық пәндері бойынша қосындылар (бір сұраныс)
+    student_totals = {
+        row['user_id']: row
+        for row in (
+            StudentSubjectStats.objects
+            .filter(user_id__in=[user.pk for user in page_obj])
+            .values('user_id')
+            .annotate(**{field: Sum(field) for field in STATS_FIELDS})
+            .order_by()
         )
-        lesson_stats = user.user_lessons.all().aggregate(
-            avg_rating=Avg('rating'),
-            avg_percentage=Avg('percentage')
-        )
-
-        students_data.append({
-            'user': user,
-            'subject_avg_rating': round(subject_stats['avg_rating']) or 0,
-            'subject_avg_percentage': round(subject_stats['avg_percentage'], 2) or 0,
-
-            'chapter_avg_rating': round(chapter_stats['avg_rating']) or 0,
-            'chapter_avg_percentage': round(chapter_stats['avg_percentage'], 2) or 0,
+    }
 
-            'lesson_avg_rating': round(lesson_stats['avg_rating']) or 0,
-            'lesson_avg_percentage': round(lesson_stats['avg_percentage'], 2) or 0,
-        })
+    students_data = [
+        {'user': user, **stats_averages(student_totals.get(user.pk, EMPTY_STATS))}
+        for user in page_obj
+    ]
 
     context = {
         'generics': {
             'classes_count': 2,
-            'subjects_count': Subject.objects.all().count(),
-            'students_count': UserSubject.objects.all().count()
+            'subjects_count': len(subjects),
+            'students_count': sum(subject.stats.student_count for subject in subjects if hasattr(subject, 'stats')),
         },
         'subjects_data': subjects_data,
         'students_data': students_data,
+        'page_obj': page_obj,
     }
     return render(request, 'app/dashboard/teacher/page.html', context)
+
+
+# Gradebook export
+# ----------------------------------------------------------------------------------------------------------------------
+# ?level=subject|chapter|lesson&format=csv|tsv|jsonl&user_class=8b&subject=<id>
+# Жолдар базадан бөліктермен оқылып, бірден жіберіледі
+@login_required
+@role_required('teacher')
+def gradebook_export_view(request):
+    level = request.GET.get('level', 'lesson')
+    fmt = request.GET.get('format', 'csv')
+    subject_id = request.GET.get('subject', '').strip()
+
+    if level not in LEVELS or fmt not in FORMATS or (subject_id and not subject_id.isdigit()):
+        raise Http404('Бет табылмады')
+
+    header, rows = gradebook_rows(level, request.GET.get('user_class', '').strip(), subject_id)
+    content_type, extension = FORMATS[fmt]
+
+    response = StreamingHttpResponse(stream_gradebook(fmt, header, rows), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="gradebook-{level}.{extension}"'
+    return response
+
+
+# Student search (type-ahead)
+# ----------------------------------------------------------------------------------------------------------------------
+# ?q=<мәтін>&page=<n>&user_class=8b → {"results": [...], "page": n, "has_next": bool}
+@login_required
+@role_required('teacher')
+def student_search_view(request):
+    q = request.GET.get('q', '').strip()
+    classroom = request.GET.get('user_class', '').strip()
+    page = request.GET.get('page', '1')
+    page = max(int(page), 1) if page.isdigit() else 1
+
+    if not q:
+        return JsonResponse({'results': [], 'page': page, 'has_next': False})
+
+    users = User.objects.filter(user_type='student')
+    if classroom:
+        users = users.filter(user_class=classroom)
+
+    # COUNT жасамау үшін бір артық жол аламыз
+    offset = (page - 1) * SEARCH_PAGE_SIZE
+    found = list(
+        search_users(users, q)
+        .only('pk', 'first_name', 'last_name', 'username', 'user_class', 'avatar')[offset:offset + SEARCH_PAGE_SIZE + 1]
+    )
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': user.pk,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'username': user.username,
+                'user_class': user.get_user_class_display(),
+                'avatar': user.avatar.url if user.avatar else None,
+                'similarity': round(user.similarity, 3),
+            }
+            for user in found[:SEARCH_PAGE_SIZE]
+        ],
+        'page': page,
+        'has_next': len(found) > SEARCH_PAGE_SIZE,
+    })
+
+
+# Item analysis
+# ----------------------------------------------------------------------------------------------------------------------
+# Пәннің барлық тест тапсырмалары бойынша сұрақтар талдауы (әр тапсырма бөлек кэштеледі)
+@login_required
+@role_required('teacher')
+def item_analysis_view(request, pk):
+    subject = get_object_or_404(Subject, pk=pk)
+    tasks = (
+        Task.objects
+        .filter(lesson__chapter__subject=subject, task_type='test')
+        .select_related('lesson__chapter')
+        .order_by('lesson__chapter__order', 'lesson__order', 'order', 'pk')
+    )
+
+    context = {
+        'subject': subject,
+        'reports': [{'task': task, **get_item_analysis(task)} for task in tasks],
+    }
+    return render(request, 'app/dashboard/teacher/item_analysis.html', context)
+
+
+# Progress heatmap
+# ----------------------------------------------------------------------------------------------------------------------
+# Кэштелген кестеден топ бойынша сүзу (core.services.heatmap)
+def _subject_heatmap(request, pk):
+    subject = get_object_or_404(Subject, pk=pk)
+    classroom = request.GET.get('user_class', '').strip()
+
+    heatmap = get_heatmap(subject)
+    students = heatmap['students']
+    if classroom:
+        students = [student for student in students if student['user_class'] == classroom]
+
+    return subject, {'lessons': heatmap['lessons'], 'students': students}
+
+
+@login_required
+@role_required('teacher')
+def heatmap_view(request, pk):
+    subject, heatmap = _subject_heatmap(request, pk)
+    context = {
+        'subject': subject,
+        'heatmap': heatmap,
+        'classes': User.USER_CLASS,
+    }
+    return render(request, 'app/dashboard/teacher/heatmap.html', context)
+
+
+# {"lessons": [{id, title, chapter}], "students": [{id, name, user_class, cells: [[статус, баға, секунд] | null]}]}
+@login_required
+@role_required('teacher')
+def heatmap_json_view(request, pk):
+    __, heatmap = _subject_heatmap(request, pk)
+    return JsonResponse(heatmap)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from PIL import Image
+from core.models import User
+from core.services.images import ensure_derivative, parse_derivative_name
+from core.services.media import authorize_media, normalize_media_name
+
+
+CERT = 'core/models/subject/certs/cert.pdf'
+POSTER = 'core/models/subject/posters/poster.txt'
+IMAGE = 'core/models/subject/posters/poster.png'
+
+
+# Media: рұқсат тексерілетін жол мен берілетін файл бірдей, жолдан шығу мүмкін емес
+# ----------------------------------------------------------------------------------------------------------------------
+class MediaTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_DELIVERY='django')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        for name in (CERT, POSTER):
+            path = os.path.join(self.media_root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(name)
+
+
+class MediaTraversalTests(MediaTestCase):
+    def test_normalize_media_name(self):
+        self.assertEqual(normalize_media_name(POSTER), POSTER)
+        for path in (
+            '', '/etc/passwd', '../settings.py', 'core/models/subject/posters/../certs/cert.pdf',
+            'core/models/subject/posters/./poster.txt', 'core/models/subject/posters//poster.txt',
+            'core/models/subject/posters/', 'core/models/subject/posters/..\\certs\\cert.pdf',
+        ):
+            with self.subTest(path=path):
+                self.assertIsNone(normalize_media_name(path))
+
+    def test_public_poster_is_served(self):
+        response = self.client.get(f'/media/{POSTER}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), POSTER.encode())
+
+    def test_traversal_from_public_prefix_is_rejected(self):
+        self.assertIsNone(authorize_media(User(), 'core/models/subject/posters/../certs/cert.pdf'))
+
+        student = User.objects.create_user('student', password='x')
+        self.client.force_login(student)
+        for path in (
+            'core/models/subject/posters/../certs/cert.pdf',
+            'core/models/subject/posters/%2e%2e/certs/cert.pdf',
+            'core/account/users/../../models/subject/certs/cert.pdf',
+            'django-summernote/../core/models/subject/certs/cert.pdf',
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(f'/media/{path}').status_code, 404)
+
+    def test_private_file_still_needs_enrollment(self):
+        self.client.force_login(User.objects.create_user('student', password='x'))
+        self.assertEqual(self.client.get(f'/media/{CERT}').status_code, 404)
+
+
+# Сурет өлшемдері: түпнұсқа тек avatar/poster бумасының ішінен алынады
+# ----------------------------------------------------------------------------------------------------------------------
+class DerivativeTraversalTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        Image.new('RGB', (640, 360), 'red').save(os.path.join(self.media_root, IMAGE))
+
+    def test_derivative_is_rendered(self):
+        response = self.client.get(f'/media/derivatives/{IMAGE}/480.webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(os.path.isfile(os.path.join(self.media_root, 'derivatives', IMAGE, '480.webp')))
+
+    def test_non_normalized_source_is_rejected(self):
+        for name in (
+            'core/models/subject/posters/../certs/cert.pdf',
+            'core/models/subject/posters/./poster.png',
+            'core/account/users/../../models/subject/posters/poster.png',
+        ):
+            with self.subTest(name=name):
+                self.assertIsNone(parse_derivative_name(f'derivatives/{name}/480.webp'))
+                self.assertFalse(ensure_derivative(name, 480, 'webp'))
+                self.assertEqual(self.client.get(f'/media/derivatives/{name}/480.webp').status_code, 404)
+
+    def test_symlink_out_of_poster_dir_is_rejected(self):
+        outside = os.path.join(self.media_root, 'outside.png')
+        Image.new('RGB', (640, 360), 'blue').save(outside)
+        os.symlink(outside, os.path.join(self.media_root, 'core/models/subject/posters/link.png'))
+
+        self.assertFalse(ensure_derivative('core/models/subject/posters/link.png', 480, 'webp'))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'derivatives/core/models/subject/posters/link.png')))
+
+    def test_unreadable_source_returns_404(self):
+        path = os.path.join(self.media_root, IMAGE)
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        for content in (data[:len(data) // 2], b'not an image'):
+            with self.subTest(content=content[:16]):
+                with open(path, 'wb') as f:
+                    f.write(content)
+                self.assertFalse(ensure_derivative(IMAGE, 480, 'webp'))
+                self.assertEqual(self.client.get(f'/media/derivatives/{IMAGE}/480.webp').status_code, 404)
+                self.assertFalse(os.path.exists(os.path.join(self.media_root, 'derivatives', IMAGE)))
+
+    def test_decompression_bomb_returns_404(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            self.assertEqual(self.client.get(f'/media/derivatives/{IMAGE}/480.webp').status_code, 404)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'derivatives', IMAGE)))
@@ -1,8 +1,31 @@
+from django.http import Http404
 from django.shortcuts import render, redirect
+from core.services.images import parse_derivative_name, ensure_derivative
+from core.services.media import authorize_media, media_response, normalize_media_name
 
 
 def main_view(request):
     if request.user.is_authenticated:
         return redirect('student')
 
-    return render(request, 'app/page.html')
\ No newline at end of file
+    return render(request, 'app/page.html')
+
+
+# Медиа файлдар: алдымен рұқсат тексеріледі (мысалы, сабақ құжаты тек пәнге жазылғандарға),
+# сосын байттарды веб-сервер береді (core.services.media). Сурет өлшемдері (derivatives/...)
+# түпнұсқаның рұқсатымен беріледі және алғаш сұралғанда дискіге жасалады.
+# Рұқсат та, жауап та дәл сол қалыпты жол бойынша
+def media_view(request, path):
+    name = normalize_media_name(path)
+    if name is None:
+        raise Http404('Файл табылмады')
+
+    derivative = parse_derivative_name(name)
+    public = authorize_media(request.user, derivative[0] if derivative else name)
+    if public is not None and derivative:
+        ensure_derivative(*derivative)
+
+    response = media_response(request, name, public) if public is not None else None
+    if response is None:
+        raise Http404('Файл табылмады')
+    return response
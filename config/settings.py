@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_summernote',
     'tailwind',
     'django_browser_reload',
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'ui.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,6 +81,19 @@ DATABASES = {
     }
 }
 
+# Cache. Видео heartbeat буфері тек процестер арасында ортақ кэшпен (Redis, Memcached, база) қосылады;
+# LocMem-де heartbeat бірден базаға жазылады (core.services.video_progress)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='biomedia'),
+    }
+}
+
+# Ауыр жұмыстарды (мысалы, жаңа сабақты барлық білім алушыларға тарату) фондық жұмысшыға беру:
+# True болса, python manage.py run_jobs іске қосылуы керек (core.services.jobs)
+BACKGROUND_JOBS = config('BACKGROUND_JOBS', default=False, cast=bool)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -121,10 +136,33 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Медиа файлдарды беру (apps.main.views.media_view рұқсатты тексерген соң):
+# 'nginx' -> X-Accel-Redirect: MEDIA_ACCEL_PREFIX + жол, мысалы
+#     location /protected-media/ { internal; alias /path/to/media/; }
+# 'sendfile' -> X-Sendfile (Apache/lighttpd), 'django' -> FileResponse (Range қолдауымен, әзірлеу үшін)
+MEDIA_DELIVERY = config('MEDIA_DELIVERY', default='django')
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+
 STATICFILES_DIRS = [
     BASE_DIR / 'ui/static'
 ]
 
+# Production: хэшті атаулар + .br/.gz нұсқалары (collectstatic кезінде), оларды
+# ui.middleware.StaticFilesMiddleware ұзақ кэштеумен береді. Әзірлеуде кәдімгі сақтау
+STATIC_MANIFEST = config('STATIC_MANIFEST', default=not DEBUG, cast=bool)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'ui.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+
 
 # Templates settings
 # ----------------------------------------------------------------------------------------------------------------------
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.views.static import serve
+from apps.main.views import media_view
 
 
 urlpatterns = [
@@ -17,5 +18,8 @@ urlpatterns = [
 
 
 urlpatterns += [re_path(r'^i18n/', include('django.conf.urls.i18n'))]
-urlpatterns += [re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT})]
-urlpatterns += [re_path(r'^static/(?P<path>.*)$', serve, {'document_root': settings.STATIC_ROOT})]
+urlpatterns += [re_path(r'^media/(?P<path>.*)$', media_view, name='media')]
+
+# Production-да статиканы ui.middleware.StaticFilesMiddleware береді
+if not settings.STATIC_MANIFEST:
+    urlpatterns += [re_path(r'^static/(?P<path>.*)$', serve, {'document_root': settings.STATIC_ROOT})]
@@ -3,3 +3,4 @@ from .subjects import *
 from .tasks import *
 from .user_subjects import *
 from .user_tasks import *
+from .jobs import *
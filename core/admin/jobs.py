@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from core.models import BackgroundJob
+
+
+# BackgroundJob admin
+# ----------------------------------------------------------------------------------------------------------------------
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'created_at', 'finished_at', )
+    list_filter = ('name', 'status', )
+    readonly_fields = ('attempts', 'error', 'created_at', 'finished_at', )
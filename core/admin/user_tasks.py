@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django.urls import reverse
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django_summernote.admin import SummernoteModelAdminMixin
-from core.models import UserTask, UserVideo, UserWritten, UserTextGap, UserAnswer, UserMatchingAnswer, UserTableAnswer
+from core.models import UserTask, UserVideo, UserWritten, UserTextGap, UserAnswer, UserMatchingAnswer, TableRow, TableColumn
+from core.services.answer_keys import get_answer_key, pack_table_cells, unpack_table_cells
 
 
 # UserTask admin
@@ -32,16 +33,12 @@ class UserMatchingAnswerTab(admin.TabularInline):
     extra = 0
 
 
-class UserTableAnswerTab(admin.TabularInline):
-    model = UserTableAnswer
-    extra = 0
-
-
 @admin.register(UserTask)
 class UserTaskAdmin(admin.ModelAdmin):
     list_display = ('user_lesson', 'task', 'submitted_at', 'rating', 'is_completed', )
     list_filter = ('user_lesson', 'task', 'is_completed', )
-    readonly_fields = ('user_lesson_link', )
+    readonly_fields = ('user_lesson_link', 'table_answer_view', )
+    exclude = ('table_answer', )
 
     def user_lesson_link(self, obj):
         if obj.user_lesson:
@@ -51,6 +48,37 @@ class UserTaskAdmin(admin.ModelAdmin):
 
     user_lesson_link.short_description = 'Қолданушының сабағы'
 
+    # Кесте жауабын бітмаптан оқу: ✓ - белгіленген, жасыл - дұрыс жауап
+    def table_answer_view(self, obj):
+        if not obj.task or obj.task.task_type != 'table' or not obj.table_answer:
+            return '-'
+
+        checked = unpack_table_cells(obj.table_answer)
+        table_key = get_answer_key(obj.task)['table']
+        correct = unpack_table_cells(pack_table_cells(table_key['rows'], table_key['columns'], table_key['cells']))
+
+        rows, columns = obj.table_answer['rows'], obj.table_answer['columns']
+        row_labels = dict(TableRow.objects.filter(pk__in=rows).values_list('pk', 'label'))
+        column_labels = dict(TableColumn.objects.filter(pk__in=columns).values_list('pk', 'label'))
+
+        header = format_html_join('', '<th>{}</th>', ((column_labels.get(c, c), ) for c in columns))
+        body = format_html_join('', '<tr><th>{}</th>{}</tr>', (
+            (
+                row_labels.get(r, r),
+                format_html_join('', '<td style="{}">{}</td>', (
+                    (
+                        'background:#d4edda' if (r, c) in correct else '',
+                        '✓' if (r, c) in checked else '',
+                    )
+                    for c in columns
+                )),
+            )
+            for r in rows
+        ))
+        return format_html('<table><tr><th></th>{}</tr>{}</table>', header, body)
+
+    table_answer_view.short_description = 'Кесте жауаптары'
+
     def get_inline_instances(self, request, obj=None):
         if obj is None or not obj.task:
             return []
@@ -68,7 +96,5 @@ class UserTaskAdmin(admin.ModelAdmin):
                 inlines = [UserAnswerTab]
             case 'matching':
                 inlines = [UserMatchingAnswerTab]
-            case 'table':
-                inlines = [UserTableAnswerTab]
 
         return [inline(self.model, self.admin_site) for inline in inlines]
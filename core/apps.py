@@ -10,3 +10,5 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         import core.signals.subjects
+        import core.signals.tasks
+        import core.signals.content
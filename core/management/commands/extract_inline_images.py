@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.services.inline_images import BATCH_SIZE, INLINE_IMAGE_FIELDS, extract_model_images
+
+
+class Command(BaseCommand):
+    help = 'Summernote өрістеріндегі base64 суреттерді медиа файлдарға шығарып, HTML-ді соларға сілтейтін ету'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', help='Тек осы модель(дер), мысалы: Option')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        models = {model.__name__: model for model in INLINE_IMAGE_FIELDS}
+        names = options['model'] or list(models)
+        unknown = set(names) - set(models)
+        if unknown:
+            raise CommandError(f'Белгісіз модель: {", ".join(sorted(unknown))}')
+
+        total = 0
+        for name in names:
+            count = extract_model_images(models[name], batch_size=options['batch_size'])
+            if count:
+                self.stdout.write(f'{name}: {count}')
+            total += count
+
+        self.stdout.write(self.style.SUCCESS(f'{total} жол жаңартылды'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.services.video_progress import buffering_enabled, flush_video_progress
+
+
+class Command(BaseCommand):
+    help = 'Кэштегі видео heartbeat мәндерін UserVideo.watched_seconds өрісіне жазу'
+
+    def handle(self, *args, **options):
+        if not buffering_enabled():
+            self.stdout.write('Кэш процесс ішінде (LocMem): heartbeat бірден базаға жазылады, буфер жоқ')
+            return
+
+        written = flush_video_progress()
+        self.stdout.write(self.style.SUCCESS(f'{written} видео прогресі жазылды'))
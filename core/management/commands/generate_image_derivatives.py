@@ -0,0 +1,31 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core.models import User, Subject
+from core.services.images import generate_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Бар аватарлар мен постерлердің WebP/JPEG өлшемдерін процестер пулында алдын ала жасау'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=('avatar', 'poster'), help='Тек осы түр')
+        parser.add_argument('--workers', type=int, default=None, help='Процестер саны (әдепкі: CPU саны)')
+
+    def handle(self, *args, **options):
+        names = []
+        if options['kind'] in (None, 'avatar'):
+            names += User.objects.exclude(avatar='').exclude(avatar__isnull=True).values_list('avatar', flat=True)
+        if options['kind'] in (None, 'poster'):
+            names += Subject.objects.exclude(poster='').exclude(poster__isnull=True).values_list('poster', flat=True)
+
+        # Жұмысшы процестер базаны қолданбайды; ашық қосылыстар fork арқылы бөлісілмеуі үшін жабамыз
+        connections.close_all()
+
+        created = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for count in pool.map(generate_derivatives, names, chunksize=16):
+                created += count
+
+        self.stdout.write(self.style.SUCCESS(f'{len(names)} сурет, {created} өлшем дайын'))
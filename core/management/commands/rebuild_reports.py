@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from core.models import Subject, UserSubject
+from core.services.reports import rebuild_reports, rebuild_group_reports
+
+
+class Command(BaseCommand):
+    help = 'Есеп кестелерін (пән, білім алушы, топ статистикасы) UserSubject/UserChapter/UserLesson жолдарынан қайта құру'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', type=int, help='Тек осы пән (Subject id)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        user_subjects = UserSubject.objects.order_by('pk')
+        subjects = Subject.objects.all()
+        if options['subject']:
+            user_subjects = user_subjects.filter(subject_id=options['subject'])
+            subjects = subjects.filter(pk=options['subject'])
+
+        ids = list(user_subjects.values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        total = 0
+
+        for start in range(0, len(ids), chunk_size):
+            total += rebuild_reports(ids[start:start + chunk_size], update_groups=False)
+
+        rebuild_group_reports(subjects.values_list('pk', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'{total} білім алушы жолы қайта құрылды'))
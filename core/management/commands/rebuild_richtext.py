@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.services.richtext import BATCH_SIZE, RICHTEXT_FIELDS, rebuild_model_html
+
+
+class Command(BaseCommand):
+    help = 'Summernote өрістерінің тазаланған HTML серіктерін ағымдағы саясат бойынша қайта есептеу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', help='Тек осы модель(дер), мысалы: Question')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        models = {model.__name__: model for model in RICHTEXT_FIELDS}
+        names = options['model'] or list(models)
+        unknown = set(names) - set(models)
+        if unknown:
+            raise CommandError(f'Белгісіз модель: {", ".join(sorted(unknown))}')
+
+        total = 0
+        for name in names:
+            count = rebuild_model_html(models[name], batch_size=options['batch_size'])
+            if count:
+                self.stdout.write(f'{name}: {count}')
+            total += count
+
+        self.stdout.write(self.style.SUCCESS(f'{total} жол жаңартылды'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from core.models import UserSubject
+from core.services.progress import recompute_progress
+
+
+class Command(BaseCommand):
+    help = 'UserChapter/UserSubject бағалары мен пайыздарын UserLesson жолдарынан қайта есептеу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', type=int, help='Тек осы пәннің (Subject id) қолданушылары')
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        user_subjects = UserSubject.objects.order_by('pk')
+        if options['subject']:
+            user_subjects = user_subjects.filter(subject_id=options['subject'])
+
+        ids = list(user_subjects.values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        total = 0
+
+        for start in range(0, len(ids), chunk_size):
+            total += recompute_progress(UserSubject.objects.filter(pk__in=ids[start:start + chunk_size]))
+
+        self.stdout.write(self.style.SUCCESS(f'{total} қолданушы пәні қайта есептелді'))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.services.jobs import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Фондық тапсырмалар кезегін (BackgroundJob) орындайтын жұмысшы процесс'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Кезекті босатып, шығу')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Кезек бос болса күту уақыты (секунд)')
+
+    def handle(self, *args, **options):
+        done = failed = 0
+
+        while True:
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            if run_job(job):
+                done += 1
+            else:
+                failed += 1
+                self.stderr.write(f'{job}: {job.error.strip().splitlines()[-1]}')
+
+        self.stdout.write(self.style.SUCCESS(f'{done} тапсырма орындалды, {failed} қате'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Lesson
+from core.services.materialize import BATCH_SIZE, sync_lesson_content
+
+
+class Command(BaseCommand):
+    help = 'Басталған сабақтардың жетіспейтін UserTask және жауап жолдарын сабақ мазмұнымен салыстырып толықтыру'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', type=int, help='Пәннің барлық сабақтары (Subject id)')
+        parser.add_argument('--lesson', type=int, help='Тек осы сабақ (Lesson id)')
+        parser.add_argument('--chunk-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not options['subject'] and not options['lesson']:
+            raise CommandError('--subject немесе --lesson көрсетіңіз')
+
+        lessons = Lesson.objects.order_by('pk')
+        if options['subject']:
+            lessons = lessons.filter(chapter__subject_id=options['subject'])
+        if options['lesson']:
+            lessons = lessons.filter(pk=options['lesson'])
+
+        total = 0
+        for lesson_id in lessons.values_list('pk', flat=True):
+            total += sync_lesson_content(lesson_id, chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'{total} жол қосылды'))
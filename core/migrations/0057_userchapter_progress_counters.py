@@ -0,0 +1,89 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:53
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_progress_counters(apps, schema_editor):
+    UserSubject = apps.get_model('core', 'UserSubject')
+    UserChapter = apps.get_model('core', 'UserChapter')
+    UserLesson = apps.get_model('core', 'UserLesson')
+
+    lesson_stats = {
+        (row['user_subject_id'], row['lesson__chapter_id']): row
+        for row in (
+            UserLesson.objects
+            .values('user_subject_id', 'lesson__chapter_id')
+            .annotate(total=Count('pk'), completed=Count('pk', filter=Q(is_completed=True)), rating_total=Sum('rating'))
+            .order_by()
+        )
+    }
+
+    subject_totals = {}
+    for user_chapter in UserChapter.objects.all().iterator():
+        stats = lesson_stats.get((user_chapter.user_subject_id, user_chapter.chapter_id), {})
+        user_chapter.lesson_count = stats.get('total', 0)
+        user_chapter.completed_lesson_count = stats.get('completed', 0)
+        user_chapter.rating_total = stats.get('rating_total') or 0
+        user_chapter.save(update_fields=['lesson_count', 'completed_lesson_count', 'rating_total'])
+
+        totals = subject_totals.setdefault(user_chapter.user_subject_id, [0, 0])
+        totals[0] += 1
+        totals[1] += user_chapter.rating
+
+    lessons_by_subject = {}
+    for (user_subject_id, __), stats in lesson_stats.items():
+        counts = lessons_by_subject.setdefault(user_subject_id, [0, 0])
+        counts[0] += stats['total']
+        counts[1] += stats['completed']
+
+    for user_subject in UserSubject.objects.all().iterator():
+        user_subject.chapter_count, user_subject.rating_total = subject_totals.get(user_subject.pk, (0, 0))
+        user_subject.lesson_count, user_subject.completed_lesson_count = lessons_by_subject.get(user_subject.pk, (0, 0))
+        user_subject.save(update_fields=['chapter_count', 'rating_total', 'lesson_count', 'completed_lesson_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0056_remove_lesson_lesson_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userchapter',
+            name='completed_lesson_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Аяқталған сабақ саны'),
+        ),
+        migrations.AddField(
+            model_name='userchapter',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сабақ саны'),
+        ),
+        migrations.AddField(
+            model_name='userchapter',
+            name='rating_total',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сабақ бағаларының қосындысы'),
+        ),
+        migrations.AddField(
+            model_name='usersubject',
+            name='chapter_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Бөлім саны'),
+        ),
+        migrations.AddField(
+            model_name='usersubject',
+            name='completed_lesson_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Аяқталған сабақ саны'),
+        ),
+        migrations.AddField(
+            model_name='usersubject',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сабақ саны'),
+        ),
+        migrations.AddField(
+            model_name='usersubject',
+            name='rating_total',
+            field=models.PositiveIntegerField(default=0, verbose_name='Бөлім бағаларының қосындысы'),
+        ),
+        migrations.RunPython(fill_progress_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:54
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+UNIQUE_ROWS = (
+    ('UserTask', ('user_lesson', 'task')),
+    ('UserVideo', ('user_task', 'video')),
+    ('UserWritten', ('user_task', 'written')),
+    ('UserTextGap', ('user_task', 'text_gap')),
+    ('UserAnswer', ('user_task', 'question')),
+    ('UserMatchingAnswer', ('user_task', 'item')),
+)
+
+
+# get_or_create жарысынан қалған қайталанған жолдардың ең біріншісін ғана қалдыру.
+# Unique шектеулерінен бөлек миграцияда: PostgreSQL-де DEFERRABLE сыртқы кілттердің триггерлері commit-ке дейін
+# күтеді, ал күтіп тұрған триггер оқиғалары бар кестеге ALTER TABLE жасауға болмайды
+def delete_duplicate_rows(apps, schema_editor):
+    for model_name, fields in UNIQUE_ROWS:
+        model = apps.get_model('core', model_name)
+        duplicates = (
+            model.objects
+            .values(*fields)
+            .annotate(first_id=Min('pk'), count=Count('pk'))
+            .filter(count__gt=1)
+            .order_by()
+        )
+        for row in duplicates:
+            model.objects.filter(**{field: row[field] for field in fields}).exclude(pk=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0057_userchapter_progress_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_rows, migrations.RunPython.noop),
+    ]
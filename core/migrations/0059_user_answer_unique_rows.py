@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:54
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0058_remove_duplicate_answer_rows'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='useranswer',
+            unique_together={('user_task', 'question')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='usermatchinganswer',
+            unique_together={('user_task', 'item')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='usertask',
+            unique_together={('user_lesson', 'task')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='usertextgap',
+            unique_together={('user_task', 'text_gap')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='uservideo',
+            unique_together={('user_task', 'video')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='userwritten',
+            unique_together={('user_task', 'written')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0059_user_answer_unique_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='answer_key_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Жауап кілтінің нұсқасы'),
+        ),
+    ]
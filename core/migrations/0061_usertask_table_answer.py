@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+# UserTableAnswer жолдарын UserTask.table_answer бітмапына көшіру
+def pack_table_answers(apps, schema_editor):
+    UserTask = apps.get_model('core', 'UserTask')
+    TableRow = apps.get_model('core', 'TableRow')
+    TableColumn = apps.get_model('core', 'TableColumn')
+    UserTableAnswer = apps.get_model('core', 'UserTableAnswer')
+
+    layouts = {}
+
+    def get_layout(task_id):
+        if task_id not in layouts:
+            rows = list(TableRow.objects.filter(task_id=task_id).order_by('order', 'pk').values_list('pk', flat=True))
+            columns = list(TableColumn.objects.filter(task_id=task_id).order_by('order', 'pk').values_list('pk', flat=True))
+            layouts[task_id] = (rows, columns, {r: i for i, r in enumerate(rows)}, {c: j for j, c in enumerate(columns)})
+        return layouts[task_id]
+
+    user_tasks = UserTask.objects.filter(user_table_answers__isnull=False).distinct().values_list('pk', 'task_id')
+    for user_task_id, task_id in user_tasks.iterator():
+        rows, columns, row_index, column_index = get_layout(task_id)
+        cells = 0
+        for row_id, column_id in UserTableAnswer.objects.filter(user_task_id=user_task_id, checked=True).values_list(
+            'row_id', 'column_id'
+        ):
+            if row_id in row_index and column_id in column_index:
+                cells |= 1 << (row_index[row_id] * len(columns) + column_index[column_id])
+
+        UserTask.objects.filter(pk=user_task_id).update(
+            table_answer={'rows': rows, 'columns': columns, 'cells': format(cells, 'x')}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0060_task_answer_key_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertask',
+            name='table_answer',
+            field=models.JSONField(blank=True, null=True, verbose_name='Кесте жауаптары (бітмап)'),
+        ),
+        migrations.RunPython(pack_table_answers, migrations.RunPython.noop),
+    ]
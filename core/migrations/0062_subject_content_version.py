@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0061_usertask_table_answer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subject',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Мазмұн нұсқасы'),
+        ),
+    ]
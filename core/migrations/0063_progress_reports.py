@@ -0,0 +1,139 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+STATS_FIELDS = (
+    'student_count', 'subject_rating_total', 'subject_percentage_total',
+    'chapter_count', 'chapter_rating_total', 'chapter_percentage_total',
+    'lesson_count', 'lesson_rating_total', 'lesson_percentage_total',
+)
+
+
+def fill_reports(apps, schema_editor):
+    UserSubject = apps.get_model('core', 'UserSubject')
+    UserChapter = apps.get_model('core', 'UserChapter')
+    UserLesson = apps.get_model('core', 'UserLesson')
+    SubjectStats = apps.get_model('core', 'SubjectStats')
+    StudentSubjectStats = apps.get_model('core', 'StudentSubjectStats')
+    ClassSubjectStats = apps.get_model('core', 'ClassSubjectStats')
+
+    def grouped(model):
+        return {
+            row['user_subject_id']: row
+            for row in (
+                model.objects
+                .values('user_subject_id')
+                .annotate(count=Count('pk'), rating_total=Sum('rating'), percentage_total=Sum('percentage'))
+                .order_by()
+            )
+        }
+
+    chapters, lessons = grouped(UserChapter), grouped(UserLesson)
+    StudentSubjectStats.objects.bulk_create([
+        StudentSubjectStats(
+            user_subject_id=user_subject.pk,
+            user_id=user_subject.user_id,
+            subject_id=user_subject.subject_id,
+            student_count=1,
+            subject_rating_total=user_subject.rating,
+            subject_percentage_total=user_subject.percentage,
+            chapter_count=chapters.get(user_subject.pk, {}).get('count', 0),
+            chapter_rating_total=chapters.get(user_subject.pk, {}).get('rating_total') or 0,
+            chapter_percentage_total=chapters.get(user_subject.pk, {}).get('percentage_total') or 0,
+            lesson_count=lessons.get(user_subject.pk, {}).get('count', 0),
+            lesson_rating_total=lessons.get(user_subject.pk, {}).get('rating_total') or 0,
+            lesson_percentage_total=lessons.get(user_subject.pk, {}).get('percentage_total') or 0,
+        )
+        for user_subject in UserSubject.objects.all().iterator()
+    ], batch_size=500)
+
+    sums = {field: Sum(field) for field in STATS_FIELDS}
+    SubjectStats.objects.bulk_create([
+        SubjectStats(**row) for row in StudentSubjectStats.objects.values('subject_id').annotate(**sums).order_by()
+    ])
+    ClassSubjectStats.objects.bulk_create([
+        ClassSubjectStats(user_class=row.pop('user__user_class'), **row)
+        for row in StudentSubjectStats.objects.values('subject_id', 'user__user_class').annotate(**sums).order_by()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0062_subject_content_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSubjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_count', models.PositiveIntegerField(default=0, verbose_name='Білім алушылар саны')),
+                ('subject_rating_total', models.PositiveIntegerField(default=0, verbose_name='Пән бағаларының қосындысы')),
+                ('subject_percentage_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Пән пайыздарының қосындысы')),
+                ('chapter_count', models.PositiveIntegerField(default=0, verbose_name='Бөлімдер саны')),
+                ('chapter_rating_total', models.PositiveIntegerField(default=0, verbose_name='Бөлім бағаларының қосындысы')),
+                ('chapter_percentage_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Бөлім пайыздарының қосындысы')),
+                ('lesson_count', models.PositiveIntegerField(default=0, verbose_name='Сабақтар саны')),
+                ('lesson_rating_total', models.PositiveIntegerField(default=0, verbose_name='Сабақ бағаларының қосындысы')),
+                ('lesson_percentage_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сабақ пайыздарының қосындысы')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Жаңартылған уақыты')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_stats', to='core.subject', verbose_name='Пән')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subject_stats', to=settings.AUTH_USER_MODEL, verbose_name='Қолданушы')),
+                ('user_subject', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='core.usersubject', verbose_name='Қолданушының пәні')),
+            ],
+            options={
+                'verbose_name': 'Білім алушының пән статистикасы',
+                'verbose_name_plural': 'Білім алушылардың пән статистикасы',
+            },
+        ),
+        migrations.CreateModel(
+            name='SubjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_count', models.PositiveIntegerField(default=0, verbose_name='Білім алушылар саны')),
+                ('subject_rating_total', models.PositiveIntegerField(default=0, verbose_name='Пән бағаларының қосындысы')),
+                ('subject_percentage_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Пән пайыздарының қосындысы')),
+                ('chapter_count', models.PositiveIntegerField(default=0, verbose_name='Бөлімдер саны')),
+                ('chapter_rating_total', models.PositiveIntegerField(default=0, verbose_name='Бөлім бағаларының қосындысы')),
+                ('chapter_percentage_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Бөлім пайыздарының қосындысы')),
+                ('lesson_count', models.PositiveIntegerField(default=0, verbose_name='Сабақтар саны')),
+                ('lesson_rating_total', models.PositiveIntegerField(default=0, verbose_name='Сабақ бағаларының қосындысы')),
+                ('lesson_percentage_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сабақ пайыздарының қосындысы')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Жаңартылған уақыты')),
+                ('subject', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='core.subject', verbose_name='Пән')),
+            ],
+            options={
+                'verbose_name': 'Пән статистикасы',
+                'verbose_name_plural': 'Пәндер статистикасы',
+            },
+        ),
+        migrations.CreateModel(
+            name='ClassSubjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_count', models.PositiveIntegerField(default=0, verbose_name='Білім алушылар саны')),
+                ('subject_rating_total', models.PositiveIntegerField(default=0, verbose_name='Пән бағаларының қосындысы')),
+                ('subject_percentage_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Пән пайыздарының қосындысы')),
+                ('chapter_count', models.PositiveIntegerField(default=0, verbose_name='Бөлімдер саны')),
+                ('chapter_rating_total', models.PositiveIntegerField(default=0, verbose_name='Бөлім бағаларының қосындысы')),
+                ('chapter_percentage_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Бөлім пайыздарының қосындысы')),
+                ('lesson_count', models.PositiveIntegerField(default=0, verbose_name='Сабақтар саны')),
+                ('lesson_rating_total', models.PositiveIntegerField(default=0, verbose_name='Сабақ бағаларының қосындысы')),
+                ('lesson_percentage_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сабақ пайыздарының қосындысы')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Жаңартылған уақыты')),
+                ('user_class', models.CharField(choices=[('none', 'Топты таңдау'), ('8b', '1-топ'), ('8v', '2-топ')], max_length=32, verbose_name='Сыныбы')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='class_stats', to='core.subject', verbose_name='Пән')),
+            ],
+            options={
+                'verbose_name': 'Топ статистикасы',
+                'verbose_name_plural': 'Топтар статистикасы',
+                'unique_together': {('user_class', 'subject')},
+            },
+        ),
+        migrations.RunPython(fill_reports, migrations.RunPython.noop),
+    ]
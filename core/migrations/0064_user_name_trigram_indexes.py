@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:08
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension, AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Индекстер кестені құлыптамай (CONCURRENTLY) құрылады
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0063_progress_reports'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['first_name'], name='core_user_first_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['last_name'], name='core_user_last_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['username'], name='core_user_username_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_user_class(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    StudentSubjectStats = apps.get_model('core', 'StudentSubjectStats')
+    StudentSubjectStats.objects.update(
+        user_class=Subquery(User.objects.filter(pk=OuterRef('user_id')).values('user_class')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0064_user_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsubjectstats',
+            name='user_class',
+            field=models.CharField(choices=[('none', 'Топты таңдау'), ('8b', '1-топ'), ('8v', '2-топ')], default='none', max_length=32, verbose_name='Сыныбы'),
+        ),
+        migrations.AddIndex(
+            model_name='studentsubjectstats',
+            index=models.Index(fields=['subject', '-subject_rating_total', '-subject_percentage_total'], name='core_stats_subject_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentsubjectstats',
+            index=models.Index(fields=['subject', 'user_class', '-subject_rating_total', '-subject_percentage_total'], name='core_stats_class_rank_idx'),
+        ),
+        migrations.RunPython(fill_user_class, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:18
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+def _percentage(completed, total):
+    return Decimal((completed / total) * 100).quantize(Decimal('0.01')) if total else Decimal(0)
+
+
+def _average(total, count):
+    return int(round(total / count)) if count else 0
+
+
+# Өшірілген жолдар есептегіштерде қалмауы үшін UserChapter/UserSubject есептегіштерін UserLesson жолдарынан
+# қайта санау (core.services.progress.recompute_progress-тің осы миграция кезіндегі көшірмесі, тек есептегіштер).
+# Есеп кестелері мен кэштер кейін: manage.py rebuild_reports
+def recount(apps, user_subject_ids):
+    UserSubject = apps.get_model('core', 'UserSubject')
+    UserChapter = apps.get_model('core', 'UserChapter')
+    UserLesson = apps.get_model('core', 'UserLesson')
+
+    lesson_stats = {
+        (row['user_subject_id'], row['lesson__chapter_id']): row
+        for row in (
+            UserLesson.objects
+            .filter(user_subject_id__in=user_subject_ids)
+            .values('user_subject_id', 'lesson__chapter_id')
+            .annotate(total=Count('pk'), completed=Count('pk', filter=Q(is_completed=True)), rating_total=Sum('rating'))
+            .order_by()
+        )
+    }
+
+    user_chapters = list(UserChapter.objects.filter(user_subject_id__in=user_subject_ids))
+    chapters_by_subject = {}
+    for user_chapter in user_chapters:
+        chapters_by_subject.setdefault(user_chapter.user_subject_id, []).append(user_chapter)
+        stats = lesson_stats.get((user_chapter.user_subject_id, user_chapter.chapter_id), {})
+        user_chapter.lesson_count = stats.get('total', 0)
+        user_chapter.completed_lesson_count = stats.get('completed', 0)
+        user_chapter.rating_total = stats.get('rating_total') or 0
+        user_chapter.rating = _average(user_chapter.rating_total, user_chapter.lesson_count)
+        user_chapter.percentage = _percentage(user_chapter.completed_lesson_count, user_chapter.lesson_count)
+        user_chapter.is_completed = 0 < user_chapter.lesson_count == user_chapter.completed_lesson_count
+    UserChapter.objects.bulk_update(user_chapters, [
+        'lesson_count', 'completed_lesson_count', 'rating_total', 'rating', 'percentage', 'is_completed',
+    ], batch_size=500)
+
+    user_subjects = list(UserSubject.objects.filter(pk__in=user_subject_ids))
+    for user_subject in user_subjects:
+        chapters = chapters_by_subject.get(user_subject.pk, [])
+        user_subject.chapter_count = len(chapters)
+        user_subject.lesson_count = sum(uc.lesson_count for uc in chapters)
+        user_subject.completed_lesson_count = sum(uc.completed_lesson_count for uc in chapters)
+        user_subject.rating_total = sum(uc.rating for uc in chapters)
+        user_subject.rating = _average(user_subject.rating_total, user_subject.chapter_count)
+        user_subject.percentage = _percentage(user_subject.completed_lesson_count, user_subject.lesson_count)
+        is_completed = 0 < user_subject.lesson_count == user_subject.completed_lesson_count
+        if not is_completed:
+            user_subject.completed_at = None
+        elif not user_subject.is_completed:
+            user_subject.completed_at = timezone.now()
+        user_subject.is_completed = is_completed
+    UserSubject.objects.bulk_update(user_subjects, [
+        'chapter_count', 'lesson_count', 'completed_lesson_count', 'rating_total',
+        'rating', 'percentage', 'is_completed', 'completed_at',
+    ], batch_size=500)
+
+
+# Бұрынғы get_or_create жарыстарынан қалған қайталанған UserChapter/UserLesson жолдарын өшіру:
+# әр топта аяқталған/ілгері жол қалады. Unique шектеулерінен (0067_lesson_fanout) бөлек миграцияда,
+# себебі 0058_remove_duplicate_answer_rows-тағыдай: өшіруден кейін күтіп тұрған триггерлері бар кестеге
+# сол транзакцияда ALTER TABLE жасалмайды
+def remove_duplicates(apps, schema_editor):
+    affected = set()
+    for model_name, field in (('UserChapter', 'chapter_id'), ('UserLesson', 'lesson_id')):
+        model = apps.get_model('core', model_name)
+        duplicates = (
+            model.objects
+            .values('user_subject_id', field)
+            .annotate(count=Count('pk'))
+            .filter(count__gt=1)
+            .order_by()
+        )
+        for row in duplicates:
+            ids = list(
+                model.objects
+                .filter(user_subject_id=row['user_subject_id'], **{field: row[field]})
+                .order_by('-is_completed', '-rating', 'pk')
+                .values_list('pk', flat=True)
+            )
+            model.objects.filter(pk__in=ids[1:]).delete()
+            affected.add(row['user_subject_id'])
+
+    affected = sorted(affected)
+    for start in range(0, len(affected), 500):
+        recount(apps, affected[start:start + 500])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0065_leaderboard_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0066_remove_duplicate_progress_rows'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='userchapter',
+            unique_together={('user_subject', 'chapter')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='userlesson',
+            unique_together={('user_subject', 'lesson')},
+        ),
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, verbose_name='Атауы')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Параметрлер')),
+                ('status', models.CharField(choices=[('pending', 'Күтуде'), ('running', 'Орындалуда'), ('done', 'Орындалды'), ('failed', 'Қате')], default='pending', max_length=16, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Әрекеттер саны')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Қате мәтіні')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Орындау уақыты')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Жасалған уақыты')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Аяқталған уақыты')),
+            ],
+            options={
+                'verbose_name': 'Фондық тапсырма',
+                'verbose_name_plural': 'Фондық тапсырмалар',
+                'indexes': [models.Index(fields=['status', 'run_after'], name='core_job_queue_idx')],
+            },
+        ),
+    ]
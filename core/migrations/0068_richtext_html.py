@@ -0,0 +1,200 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:29
+
+import re
+from urllib.parse import urlsplit
+
+from bleach.html5lib_shim import Filter, convert_entities
+from bleach.sanitizer import Cleaner
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+
+RICHTEXT_FIELDS = (
+    ('Subject', 'description'), ('Lesson', 'description'), ('Task', 'description'), ('Written', 'instruction'),
+    ('TextGap', 'prompt'), ('Question', 'text'), ('Option', 'text'), ('MatchingColumn', 'label'),
+    ('MatchingItem', 'text'), ('TableColumn', 'label'), ('TableRow', 'label'),
+)
+
+
+# Тазалау саясатының осы миграция кезіндегі көшірмесі (core.services.richtext). Миграция ағымдағы кодқа
+# тәуелді болмауы үшін көшірілген; саясат кейін өзгерсе: manage.py rebuild_richtext.
+# base64 суреттер (data:image/png|jpeg|gif|webp) сақталады: олар manage.py extract_inline_images
+# іске қосылғанша беттен жоғалмайды
+# ----------------------------------------------------------------------------------------------------------------------
+ALLOWED_TAGS = {
+    'p', 'br', 'div', 'span', 'hr', 'pre', 'blockquote', 'code',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'b', 'strong', 'i', 'em', 'u', 's', 'strike', 'sub', 'sup', 'font',
+    'ul', 'ol', 'li', 'a', 'img', 'iframe',
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'colgroup', 'col',
+}
+ALLOWED_PROTOCOLS = {'http', 'https', 'mailto', 'data'}
+INLINE_IMAGE_SRC_RE = re.compile(r'^data:image/(png|jpe?g|gif|webp);base64,[a-z0-9+/=]+$')
+URI_NOISE_RE = re.compile(r'[`\000-\040\177-\240\s]+')
+EMBED_HOSTS = {'www.youtube.com', 'youtube.com', 'www.youtube-nocookie.com', 'player.vimeo.com'}
+STYLE_PROPERTIES = {
+    'text-align', 'vertical-align', 'color', 'background-color', 'font-weight', 'font-style', 'font-size',
+    'text-decoration', 'line-height', 'width', 'height', 'max-width', 'float', 'margin', 'margin-left',
+    'margin-right', 'padding', 'border', 'border-collapse',
+}
+STYLE_VALUE_RE = re.compile(r'^[#\w\s.,%()-]+$')
+STYLE_FORBIDDEN_RE = re.compile(r'url\s*\(|expression\s*\(|\\|/\*', re.IGNORECASE)
+HIDDEN_CONTENT_RE = re.compile(r'<(script|style)\b.*?(</\1\s*>|$)', re.IGNORECASE | re.DOTALL)
+ATTRIBUTES = {
+    'a': {'href', 'title', 'target'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'iframe': {'src', 'width', 'height', 'frameborder', 'allowfullscreen'},
+    'font': {'color'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+    'col': {'span'},
+}
+
+
+class StyleSanitizer:
+    def sanitize_css(self, style):
+        declarations = []
+        for declaration in style.split(';'):
+            name, _, value = declaration.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name in STYLE_PROPERTIES and STYLE_VALUE_RE.match(value) and not STYLE_FORBIDDEN_RE.search(value):
+                declarations.append(f'{name}: {value}')
+        return '; '.join(declarations)
+
+
+def _data_uri_allowed(tag, name, value):
+    normalized = URI_NOISE_RE.sub('', convert_entities(value)).replace('\ufffd', '').lower()
+    if not normalized.startswith('data:'):
+        return True
+    return tag == 'img' and name == 'src' and INLINE_IMAGE_SRC_RE.match(normalized) is not None
+
+
+def _allowed_attribute(tag, name, value):
+    if name == 'style':
+        return True
+    if name in ('href', 'src') and not _data_uri_allowed(tag, name, value):
+        return False
+    if tag == 'iframe' and name == 'src':
+        return urlsplit(value).scheme == 'https' and urlsplit(value).hostname in EMBED_HOSTS
+    return name in ATTRIBUTES.get(tag, ())
+
+
+class PostProcessFilter(Filter):
+    def __iter__(self):
+        for token in super().__iter__():
+            if token['type'] in ('StartTag', 'EmptyTag'):
+                attrs = token['data']
+                if attrs.get((None, 'style')) == '':
+                    del attrs[(None, 'style')]
+                if token['name'] in ('img', 'iframe'):
+                    attrs[(None, 'loading')] = 'lazy'
+                if token['name'] == 'img':
+                    attrs[(None, 'decoding')] = 'async'
+                if token['name'] == 'a' and attrs.get((None, 'target')) == '_blank':
+                    attrs[(None, 'rel')] = 'noopener noreferrer'
+            yield token
+
+
+cleaner = Cleaner(
+    tags=ALLOWED_TAGS,
+    attributes=_allowed_attribute,
+    protocols=ALLOWED_PROTOCOLS,
+    strip=True,
+    strip_comments=True,
+    filters=[PostProcessFilter],
+    css_sanitizer=StyleSanitizer(),
+)
+
+
+def render_html(value):
+    return cleaner.clean(HIDDEN_CONTENT_RE.sub('', value)) if value else ''
+
+
+# Бар жолдардың серік өрістерін pk бойынша топтап толтыру (бүкіл кесте жадқа жиналмайды)
+def fill_html(apps, schema_editor):
+    for model_name, field in RICHTEXT_FIELDS:
+        model = apps.get_model('core', model_name)
+        queryset = (
+            model.objects
+            .exclude(**{f'{field}__isnull': True})
+            .exclude(**{field: ''})
+            .only('pk', field)
+            .order_by('pk')
+        )
+
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not batch:
+                break
+            for instance in batch:
+                setattr(instance, f'{field}_html', render_html(getattr(instance, field)))
+            model.objects.bulk_update(batch, [f'{field}_html'])
+            last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0067_lesson_fanout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='description_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Анықтамасы (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='matchingcolumn',
+            name='label_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Атауы (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='matchingitem',
+            name='text_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Жауабы (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='option',
+            name='text_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Жауап (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='text_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Сұрақ (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='description_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Анықтамасы (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='tablecolumn',
+            name='label_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Баған атауы (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='tablerow',
+            name='label_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Қатар атауы (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='description_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Анықтамасы (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='textgap',
+            name='prompt_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Сөйлем (көп нүктемен) (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='written',
+            name='instruction_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Тапсырма (HTML)'),
+        ),
+        migrations.RunPython(fill_html, migrations.RunPython.noop),
+    ]
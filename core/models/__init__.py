@@ -3,3 +3,5 @@ from .subjects import *
 from .tasks import *
 from .user_subjects import *
 from .user_tasks import *
+from .reports import *
+from .jobs import *
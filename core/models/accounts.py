@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
 from django.utils.translation import gettext_lazy as _
 
 
@@ -27,3 +28,9 @@ class User(AbstractUser):
     class Meta:
         verbose_name = _('Қолданушы')
         verbose_name_plural = _('Қолданушылар')
+        # Аты-жөні бойынша іздеу (pg_trgm): ILIKE және trigram сұраныстарын қолдайды
+        indexes = [
+            GinIndex(fields=['first_name'], opclasses=['gin_trgm_ops'], name='core_user_first_name_trgm'),
+            GinIndex(fields=['last_name'], opclasses=['gin_trgm_ops'], name='core_user_last_name_trgm'),
+            GinIndex(fields=['username'], opclasses=['gin_trgm_ops'], name='core_user_username_trgm'),
+        ]
@@ -0,0 +1,33 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+# BackgroundJob model: фондық тапсырмалар кезегі (core.services.jobs, manage.py run_jobs)
+# ----------------------------------------------------------------------------------------------------------------------
+class BackgroundJob(models.Model):
+    STATUS = (
+        ('pending', _('Күтуде')),
+        ('running', _('Орындалуда')),
+        ('done', _('Орындалды')),
+        ('failed', _('Қате')),
+    )
+
+    name = models.CharField(_('Атауы'), max_length=64)
+    payload = models.JSONField(_('Параметрлер'), default=dict, blank=True)
+    status = models.CharField(_('Статус'), choices=STATUS, default='pending', max_length=16)
+    attempts = models.PositiveSmallIntegerField(_('Әрекеттер саны'), default=0)
+    error = models.TextField(_('Қате мәтіні'), blank=True, null=True)
+    run_after = models.DateTimeField(_('Орындау уақыты'), default=timezone.now)
+    created_at = models.DateTimeField(_('Жасалған уақыты'), auto_now_add=True)
+    finished_at = models.DateTimeField(_('Аяқталған уақыты'), blank=True, null=True)
+
+    class Meta:
+        verbose_name = _('Фондық тапсырма')
+        verbose_name_plural = _('Фондық тапсырмалар')
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='core_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
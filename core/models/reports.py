@@ -0,0 +1,111 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from core.models import User, Subject, UserSubject
+
+
+def _average(total, count, digits=None):
+    return round(total / count, digits) if count else 0
+
+
+# Қосындылардан орташа мәндер (model жолы немесе .values() нәтижесі үшін)
+def stats_averages(totals):
+    return {
+        'subject_avg_rating': _average(totals['subject_rating_total'], totals['student_count']),
+        'subject_avg_percentage': _average(totals['subject_percentage_total'], totals['student_count'], 2),
+        'chapter_avg_rating': _average(totals['chapter_rating_total'], totals['chapter_count']),
+        'chapter_avg_percentage': _average(totals['chapter_percentage_total'], totals['chapter_count'], 2),
+        'lesson_avg_rating': _average(totals['lesson_rating_total'], totals['lesson_count']),
+        'lesson_avg_percentage': _average(totals['lesson_percentage_total'], totals['lesson_count'], 2),
+    }
+
+
+# Есеп кестелерінің ортақ өрістері: орташа мәндер = қосынды / жол саны.
+# Қосындылар сақталғандықтан, бағалар өзгерсе тек айырмасы қосылады (core.services.reports)
+# ----------------------------------------------------------------------------------------------------------------------
+class ProgressStats(models.Model):
+    student_count = models.PositiveIntegerField(_('Білім алушылар саны'), default=0)
+    subject_rating_total = models.PositiveIntegerField(_('Пән бағаларының қосындысы'), default=0)
+    subject_percentage_total = models.DecimalField(_('Пән пайыздарының қосындысы'), default=0, max_digits=14, decimal_places=2)
+    chapter_count = models.PositiveIntegerField(_('Бөлімдер саны'), default=0)
+    chapter_rating_total = models.PositiveIntegerField(_('Бөлім бағаларының қосындысы'), default=0)
+    chapter_percentage_total = models.DecimalField(_('Бөлім пайыздарының қосындысы'), default=0, max_digits=14, decimal_places=2)
+    lesson_count = models.PositiveIntegerField(_('Сабақтар саны'), default=0)
+    lesson_rating_total = models.PositiveIntegerField(_('Сабақ бағаларының қосындысы'), default=0)
+    lesson_percentage_total = models.DecimalField(_('Сабақ пайыздарының қосындысы'), default=0, max_digits=14, decimal_places=2)
+    updated_at = models.DateTimeField(_('Жаңартылған уақыты'), auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    def averages(self):
+        return stats_averages(self.__dict__)
+
+
+# SubjectStats model
+# ----------------------------------------------------------------------------------------------------------------------
+class SubjectStats(ProgressStats):
+    subject = models.OneToOneField(
+        Subject, on_delete=models.CASCADE,
+        verbose_name=_('Пән'), related_name='stats'
+    )
+
+    class Meta:
+        verbose_name = _('Пән статистикасы')
+        verbose_name_plural = _('Пәндер статистикасы')
+
+    def __str__(self):
+        return f'{self.subject}'
+
+
+# StudentSubjectStats model
+# ----------------------------------------------------------------------------------------------------------------------
+class StudentSubjectStats(ProgressStats):
+    user_subject = models.OneToOneField(
+        UserSubject, on_delete=models.CASCADE,
+        verbose_name=_('Қолданушының пәні'), related_name='stats'
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        verbose_name=_('Қолданушы'), related_name='subject_stats'
+    )
+    subject = models.ForeignKey(
+        Subject, on_delete=models.CASCADE,
+        verbose_name=_('Пән'), related_name='student_stats'
+    )
+    # User.user_class көшірмесі: топтық рейтинг индекс арқылы оқылады (core.services.leaderboards)
+    user_class = models.CharField(_('Сыныбы'), max_length=32, choices=User.USER_CLASS, default='none')
+
+    class Meta:
+        verbose_name = _('Білім алушының пән статистикасы')
+        verbose_name_plural = _('Білім алушылардың пән статистикасы')
+        indexes = [
+            models.Index(
+                fields=['subject', '-subject_rating_total', '-subject_percentage_total'],
+                name='core_stats_subject_rank_idx'
+            ),
+            models.Index(
+                fields=['subject', 'user_class', '-subject_rating_total', '-subject_percentage_total'],
+                name='core_stats_class_rank_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} | {self.subject}'
+
+
+# ClassSubjectStats model
+# ----------------------------------------------------------------------------------------------------------------------
+class ClassSubjectStats(ProgressStats):
+    user_class = models.CharField(_('Сыныбы'), max_length=32, choices=User.USER_CLASS)
+    subject = models.ForeignKey(
+        Subject, on_delete=models.CASCADE,
+        verbose_name=_('Пән'), related_name='class_stats'
+    )
+
+    class Meta:
+        verbose_name = _('Топ статистикасы')
+        verbose_name_plural = _('Топтар статистикасы')
+        unique_together = ('user_class', 'subject')
+
+    def __str__(self):
+        return f'{self.get_user_class_display()} | {self.subject}'
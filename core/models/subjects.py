@@ -10,10 +10,12 @@ class Subject(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subjects', verbose_name=_('Қолданушы'))
     poster = models.ImageField(_('Постер'), blank=True, null=True, upload_to='core/models/subject/posters')
     description = models.TextField(_('Анықтамасы'), blank=True, null=True)
+    description_html = models.TextField(_('Анықтамасы (HTML)'), blank=True, default='', editable=False)
     created_at = models.DateTimeField(_('Уақыты'), auto_now_add=True)
     last_update = models.DateTimeField(_('Соңғы өзгеріс'), auto_now=True)
     view = models.PositiveIntegerField(_('Қаралым'), default=0)
     cert = models.FileField(_('Сертификат'), blank=True, null=True, upload_to='core/models/subject/certs')
+    content_version = models.PositiveIntegerField(_('Мазмұн нұсқасы'), default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -56,6 +58,7 @@ class Lesson(models.Model):
     )
     title = models.CharField(_('Тақырыбы'), max_length=255)
     description = models.TextField(_('Анықтамасы'), blank=True, null=True)
+    description_html = models.TextField(_('Анықтамасы (HTML)'), blank=True, default='', editable=False)
     date_created = models.DateTimeField(_('Жасалған уақыты'), auto_now_add=True)
     last_update = models.DateTimeField(_('Соңғы жаңарту'), auto_now=True)
     lab_link = models.CharField(_('Виртуалды лаборатория'), max_length=255, null=True, blank=True)
@@ -37,11 +37,23 @@ class Task(models.Model):
     rating = models.PositiveIntegerField(_('Жалпы бағасы'), default=0)
     duration = models.PositiveSmallIntegerField(_('Тапсырма уақыты (мин)'), default=0)
     description = models.TextField(_('Анықтамасы'), blank=True, null=True)
+    description_html = models.TextField(_('Анықтамасы (HTML)'), blank=True, default='', editable=False)
     order = models.PositiveIntegerField(_('Реттілік нөмері'), default=0)
+    answer_key_version = models.PositiveIntegerField(_('Жауап кілтінің нұсқасы'), default=0, editable=False)
 
     def __str__(self):
         return self.get_task_type_display()
 
+    # answer_key_version тек сигналдардағы F() арқылы артады: жадтағы ескі мәні толық save() кезінде
+    # базаға қайта жазылмауы үшін бар жолды жаңартқанда ол update_fields-ке кірмейді
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'answer_key_version'
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = _('Тапсырма')
         verbose_name_plural = _('Тапсырмалар')
@@ -75,6 +87,7 @@ class Written(models.Model):
         related_name='written', verbose_name=_('Тапсырма')
     )
     instruction = models.TextField(_('Тапсырма'), blank=True, null=True)
+    instruction_html = models.TextField(_('Тапсырма (HTML)'), blank=True, default='', editable=False)
 
     def __str__(self):
         return f'{self.pk} - жазбаша'
@@ -92,6 +105,7 @@ class TextGap(models.Model):
         related_name='text_gaps', verbose_name=_('Сабақ')
     )
     prompt = models.TextField(_('Сөйлем (көп нүктемен)'))
+    prompt_html = models.TextField(_('Сөйлем (көп нүктемен) (HTML)'), blank=True, default='', editable=False)
     correct_answer = models.CharField(_('Дұрыс жауап'), max_length=255)
 
     def __str__(self):
@@ -115,6 +129,7 @@ class Question(models.Model):
         related_name='questions', verbose_name=_('Тапсырма')
     )
     text = models.TextField(_('Сұрақ'))
+    text_html = models.TextField(_('Сұрақ (HTML)'), blank=True, default='', editable=False)
     question_type = models.CharField(_('Сұрақтың түрі'), choices=QUESTION_TYPE, default='simple', max_length=32)
     order = models.PositiveIntegerField(_('Реттілік нөмері'), default=0)
 
@@ -134,6 +149,7 @@ class Option(models.Model):
         related_name='options', verbose_name=_('Сұрақ')
     )
     text = models.TextField(_('Жауап'), blank=True, null=True)
+    text_html = models.TextField(_('Жауап (HTML)'), blank=True, default='', editable=False)
     is_correct = models.BooleanField(_('Дұрыс жауап'), default=False)
     score = models.PositiveIntegerField(_('Балл'), default=0)
 
@@ -154,6 +170,7 @@ class MatchingColumn(models.Model):
         on_delete=models.CASCADE, verbose_name=_('Тапсырма')
     )
     label = models.TextField(_('Атауы'))
+    label_html = models.TextField(_('Атауы (HTML)'), blank=True, default='', editable=False)
     order = models.PositiveIntegerField(_('Реттілігі'), default=0)
 
     def __str__(self):
@@ -171,6 +188,7 @@ class MatchingItem(models.Model):
         on_delete=models.CASCADE, verbose_name=_('Тапсырма')
     )
     text = models.TextField(_('Жауабы'), null=True, blank=True)
+    text_html = models.TextField(_('Жауабы (HTML)'), blank=True, default='', editable=False)
 
     def __str__(self):
         return self.text[:32]
@@ -189,6 +207,7 @@ class TableColumn(models.Model):
         related_name='table_columns', verbose_name=_('Тапсырма')
     )
     label = models.TextField(_('Баған атауы'))
+    label_html = models.TextField(_('Баған атауы (HTML)'), blank=True, default='', editable=False)
     order = models.PositiveIntegerField(_('Реттілік нөмері'), default=0)
 
     def __str__(self):
@@ -207,6 +226,7 @@ class TableRow(models.Model):
         related_name='table_rows', verbose_name=_('Тапсырма')
     )
     label = models.TextField(_('Қатар атауы'))
+    label_html = models.TextField(_('Қатар атауы (HTML)'), blank=True, default='', editable=False)
     order = models.PositiveIntegerField(_('Реттілік нөмері'), default=0)
 
     def __str__(self):
@@ -20,6 +20,12 @@ class UserSubject(models.Model):
     created_at = models.DateTimeField(_('Басталған уақыты'), auto_now_add=True)
     completed_at = models.DateTimeField(_('Орындалған уақыты'), blank=True, null=True)
 
+    # Прогресс есептегіштері (core.services.progress жаңартады)
+    chapter_count = models.PositiveIntegerField(_('Бөлім саны'), default=0)
+    lesson_count = models.PositiveIntegerField(_('Сабақ саны'), default=0)
+    completed_lesson_count = models.PositiveIntegerField(_('Аяқталған сабақ саны'), default=0)
+    rating_total = models.PositiveIntegerField(_('Бөлім бағаларының қосындысы'), default=0)
+
     class Meta:
         verbose_name = _('Қолданушының пәні')
         verbose_name_plural = _('Қолданушының пәндері')
@@ -47,12 +53,18 @@ class UserChapter(models.Model):
     percentage = models.DecimalField(_('Пайыздық мөлшері'), default=0, max_digits=5, decimal_places=2)
     is_completed = models.BooleanField(_('Орындалды'), default=False)
 
+    # Прогресс есептегіштері (core.services.progress жаңартады)
+    lesson_count = models.PositiveIntegerField(_('Сабақ саны'), default=0)
+    completed_lesson_count = models.PositiveIntegerField(_('Аяқталған сабақ саны'), default=0)
+    rating_total = models.PositiveIntegerField(_('Сабақ бағаларының қосындысы'), default=0)
+
     def __str__(self):
         return f'{self.user} | {self.chapter}'
 
     class Meta:
         verbose_name = _('Қолданушының пән бөлімі')
         verbose_name_plural = _('Қолданушының пән бөлімдері')
+        unique_together = ('user_subject', 'chapter')
 
 
 # UserLesson model
@@ -85,6 +97,7 @@ class UserLesson(models.Model):
     class Meta:
         verbose_name = _('Қолданушының сабағы')
         verbose_name_plural = _('Қолданушының сабақтары')
+        unique_together = ('user_subject', 'lesson')
 
     def __str__(self):
         return f'{self.user} | {self.lesson}'
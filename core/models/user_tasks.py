@@ -17,10 +17,12 @@ class UserTask(models.Model):
     submitted_at = models.DateTimeField(_('Жіберілген уақыты'), auto_now_add=True)
     rating = models.PositiveSmallIntegerField(_('Жалпы бағасы'), default=0)
     is_completed = models.BooleanField(_('Орындалды'), default=False)
+    table_answer = models.JSONField(_('Кесте жауаптары (бітмап)'), blank=True, null=True)
 
     class Meta:
         verbose_name = _('Қолданушының тапсырмасы')
         verbose_name_plural = _('Қолданушының тапсырмалары')
+        unique_together = ('user_lesson', 'task')
 
     def __str__(self):
         return f'{self.user_lesson.user} | {self.task}'
@@ -43,6 +45,7 @@ class UserVideo(models.Model):
     class Meta:
         verbose_name = _('Қолданушының видеосабағы')
         verbose_name_plural = _('Қолданушының видеосабақтары')
+        unique_together = ('user_task', 'video')
 
 
 # UserWritten model
@@ -63,6 +66,7 @@ class UserWritten(models.Model):
     class Meta:
         verbose_name = _('Қолданушының жазбаша жауабы')
         verbose_name_plural = _('Қолданушының жазбаша жауаптары')
+        unique_together = ('user_task', 'written')
 
 
 # UserTextGap model
@@ -82,6 +86,7 @@ class UserTextGap(models.Model):
     class Meta:
         verbose_name = _('Қолданушының сәйкестендіруі')
         verbose_name_plural = _('Қолданушының сәйкестендірулері')
+        unique_together = ('user_task', 'text_gap')
 
 
 # Test model
@@ -101,6 +106,7 @@ class UserAnswer(models.Model):
     class Meta:
         verbose_name = _('Таңдалған жауап')
         verbose_name_plural = _('Таңдалған жауаптар')
+        unique_together = ('user_task', 'question')
 
 
 # UserMatchingAnswer model
@@ -119,16 +125,20 @@ class UserMatchingAnswer(models.Model):
     )
     is_correct = models.BooleanField(_('Дұрыс жауап'), default=False)
 
-    def check_answer(self):
-        self.is_correct = self.item.correct_column_id == self.selected_column_id
-        self.save()
+    # Тек бағалайды; сақтауды шақырушы жасайды (bulk_update)
+    def check_answer(self, correct_column_id=None):
+        if correct_column_id is None:
+            correct_column_id = self.item.correct_column_id
+        self.is_correct = correct_column_id == self.selected_column_id
+        return self.is_correct
 
     class Meta:
         verbose_name = _('Қолданушының сәйкестендіруі')
         verbose_name_plural = _('Қолданушының сәйкестендірулері')
+        unique_together = ('user_task', 'item')
 
 
-# UserTableAnswer model
+# UserTableAnswer model (ескі сақтау түрі: жаңа жауаптар UserTask.table_answer бітмапына жазылады)
 # ----------------------------------------------------------------------------------------------------------------------
 class UserTableAnswer(models.Model):
     user_task = models.ForeignKey(
@@ -0,0 +1,93 @@
+from django.core.cache import cache
+from core.models import Question, Option, TextGap, MatchingItem, TableRow, TableColumn, TableCell
+
+
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+
+
+def answer_key_cache_key(task):
+    return f'answer-key:{task.pk}:{task.task_type}:{task.answer_key_version}'
+
+
+# Бітмап: ұяшықтың нөмірі = қатар индексі * бағандар саны + баған индексі
+def table_cell_bit(row_index, column_index, column_count):
+    return 1 << (row_index * column_count + column_index)
+
+
+# Қолданушының кесте жауабы UserTask.table_answer өрісінде сақталады:
+# {'rows': [...], 'columns': [...], 'cells': '<hex бітмап>'}; орналасу сақталғандықтан,
+# кейін қатар/баған қосылса да ескі жауаптар дұрыс оқылады
+def pack_table_cells(rows, columns, cells):
+    return {'rows': list(rows), 'columns': list(columns), 'cells': format(cells, 'x')}
+
+
+def unpack_table_cells(data):
+    if not data:
+        return set()
+
+    rows, columns, cells = data['rows'], data['columns'], int(data['cells'], 16)
+    checked = set()
+    while cells:
+        bit = cells & -cells
+        row_index, column_index = divmod(bit.bit_length() - 1, len(columns))
+        checked.add((rows[row_index], columns[column_index]))
+        cells ^= bit
+    return checked
+
+
+# Тапсырманың дұрыс жауаптарын ықшам құрылымға жинау
+# ----------------------------------------------------------------------------------------------------------------------
+def compile_answer_key(task):
+    key = {'task_type': task.task_type, 'version': task.answer_key_version}
+
+    if task.task_type == 'test':
+        # question_id -> (сұрақ түрі, барлық нұсқалар, дұрыс нұсқалар)
+        options, correct = {}, {}
+        for question_id, option_id, is_correct in Option.objects.filter(question__task=task).values_list(
+            'question_id', 'pk', 'is_correct'
+        ):
+            options.setdefault(question_id, set()).add(option_id)
+            if is_correct:
+                correct.setdefault(question_id, set()).add(option_id)
+
+        key['questions'] = {
+            question_id: (question_type, frozenset(options.get(question_id, ())), frozenset(correct.get(question_id, ())))
+            for question_id, question_type in Question.objects.filter(task=task).values_list('pk', 'question_type')
+        }
+
+    elif task.task_type == 'text_gap':
+        key['gaps'] = {
+            text_gap_id: correct_answer.strip().lower()
+            for text_gap_id, correct_answer in TextGap.objects.filter(task=task).values_list('pk', 'correct_answer')
+        }
+
+    elif task.task_type == 'matching':
+        key['matching'] = dict(
+            MatchingItem.objects.filter(correct_column__task=task).values_list('pk', 'correct_column_id')
+        )
+
+    elif task.task_type == 'table':
+        rows = list(TableRow.objects.filter(task=task).order_by('order', 'pk').values_list('pk', flat=True))
+        columns = list(TableColumn.objects.filter(task=task).order_by('order', 'pk').values_list('pk', flat=True))
+        row_index = {row_id: i for i, row_id in enumerate(rows)}
+        column_index = {column_id: i for i, column_id in enumerate(columns)}
+
+        cells = 0
+        for row_id, column_id in TableCell.objects.filter(
+            row__task=task, column__task=task, correct=True
+        ).values_list('row_id', 'column_id'):
+            cells |= table_cell_bit(row_index[row_id], column_index[column_id], len(columns))
+
+        key['table'] = {'rows': rows, 'columns': columns, 'cells': cells}
+
+    return key
+
+
+# Кэштен алу: тұрақты күйде бірде-бір сұраныс жасамайды
+def get_answer_key(task):
+    cache_key = answer_key_cache_key(task)
+    key = cache.get(cache_key)
+    if key is None:
+        key = compile_answer_key(task)
+        cache.set(cache_key, key, ANSWER_KEY_TIMEOUT)
+    return key
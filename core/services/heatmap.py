@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DurationField, ExpressionWrapper, F
+from core.models import UserLesson
+from core.services.syllabus import get_syllabus
+
+
+HEATMAP_TIMEOUT = 60 * 60 * 24
+STATUS_CODES = {'no-started': 0, 'in-progress': 1, 'finished': 2}
+
+
+def heatmap_cache_key(subject_id):
+    return f'heatmap:{subject_id}'
+
+
+# Пәннің "білім алушылар × сабақтар" кестесі. Бағандар оқу бағдарламасының кэшінен,
+# ұяшықтар UserLesson бойынша бір сұраныспен алынады; өткізілген уақыт базада есептеледі.
+# Ұяшық: [статус коды, баға, секунд] (сабақ аяқталмаса секунд = None), жазылмаған сабақ = None
+def build_heatmap(subject):
+    lessons = [
+        {'id': item['lesson']['id'], 'title': item['lesson']['title'], 'chapter': chapter['chapter']['name']}
+        for chapter in get_syllabus(subject)['chapters']
+        for item in chapter['lessons']
+    ]
+    columns = {lesson['id']: i for i, lesson in enumerate(lessons)}
+
+    rows = (
+        UserLesson.objects
+        .filter(user_subject__subject=subject)
+        .annotate(time_spent_db=ExpressionWrapper(F('completed_at') - F('started_at'), output_field=DurationField()))
+        .values_list(
+            'user_id', 'user__first_name', 'user__last_name', 'user__user_class',
+            'lesson_id', 'status', 'rating', 'time_spent_db',
+        )
+        .order_by('user__last_name', 'user__first_name', 'user_id')
+    )
+
+    students = {}
+    for user_id, first_name, last_name, user_class, lesson_id, status, rating, time_spent in rows:
+        student = students.get(user_id)
+        if student is None:
+            student = students[user_id] = {
+                'id': user_id,
+                'name': f'{first_name} {last_name}'.strip(),
+                'user_class': user_class,
+                'cells': [None] * len(lessons),
+            }
+
+        column = columns.get(lesson_id)
+        if column is not None:
+            student['cells'][column] = [
+                STATUS_CODES.get(status, 0), rating, int(time_spent.total_seconds()) if time_spent else None,
+            ]
+
+    return {
+        'version': subject.content_version,
+        'lessons': lessons,
+        'students': list(students.values()),
+    }
+
+
+def get_heatmap(subject):
+    key = heatmap_cache_key(subject.pk)
+    heatmap = cache.get(key)
+    if heatmap is None or heatmap['version'] != subject.content_version:
+        heatmap = build_heatmap(subject)
+        cache.set(key, heatmap, HEATMAP_TIMEOUT)
+    return heatmap
+
+
+# Сабақ басталғанда/аяқталғанда, прогресс қайта есептелгенде немесе құрам өзгергенде шақырылады
+def invalidate_heatmap(*subject_ids):
+    keys = [heatmap_cache_key(pk) for pk in subject_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
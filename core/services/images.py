@@ -0,0 +1,135 @@
+import io
+import os
+import re
+import shutil
+import tempfile
+
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from core.services.media import normalize_media_name
+
+
+DERIVATIVES_DIR = 'derivatives'
+
+# Түрі -> ені бойынша өлшемдер (px) және арақатынас. Суреттер осы пішінге кесіледі
+PRESETS = {
+    'avatar': {'widths': (64, 128, 256), 'ratio': (1, 1)},
+    'poster': {'widths': (480, 960, 1440), 'ratio': (16, 9)},
+}
+# upload_to префиксі -> түрі
+KINDS = (
+    ('core/account/users/', 'avatar'),
+    ('core/models/subject/posters/', 'poster'),
+)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DERIVATIVE_RE = re.compile(rf'^{DERIVATIVES_DIR}/(.+)/(\d+)\.({"|".join(FORMATS)})$')
+
+
+def image_kind(name):
+    for prefix, kind in KINDS:
+        if name.startswith(prefix):
+            return kind
+    return None
+
+
+# Түпнұсқаның дискідегі жолы: атауы қалыпты және файл шынымен avatar/poster бумасының ішінде
+# (symlink арқылы шығу да есепке алынады). Әйтпесе None
+def source_path(name):
+    name = normalize_media_name(name)
+    if name is None:
+        return None
+
+    for prefix, __ in KINDS:
+        if name.startswith(prefix):
+            root = os.path.realpath(default_storage.path(prefix))
+            path = os.path.realpath(default_storage.path(name))
+            return path if path.startswith(root + os.sep) else None
+    return None
+
+
+# derivatives/<түпнұсқа жолы>/<ені>.<формат>: түпнұсқа өшсе, бүкіл бума бірге өшіріледі
+def derivative_name(name, width, fmt):
+    return f'{DERIVATIVES_DIR}/{name}/{width}.{fmt}'
+
+
+# Тек белгілі түр мен өлшемдерге рұқсат: кез келген өлшемді сұрап дискіні толтыруға болмайды
+def parse_derivative_name(path):
+    match = DERIVATIVE_RE.match(path)
+    if not match:
+        return None
+
+    name, width, fmt = match.group(1), int(match.group(2)), match.group(3)
+    kind = image_kind(name)
+    if kind is None or normalize_media_name(name) != name or width not in PRESETS[kind]['widths']:
+        return None
+    return name, width, fmt
+
+
+def render_derivative(path, width, ratio, fmt):
+    pil_format, options = FORMATS[fmt]
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image)
+
+        # Кішкентай түпнұсқаны үлкейтпейміз
+        width = min(width, image.width, image.height * ratio[0] // ratio[1])
+        image = ImageOps.fit(image, (width, max(width * ratio[1] // ratio[0], 1)), Image.LANCZOS)
+
+        if pil_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            else:
+                image = image.convert('RGB')
+
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, **options)
+        return buffer.getvalue()
+
+
+# Дискідегі кэш: бар болса, қайта жасалмайды. Уақытша файл + os.replace, сондықтан бір мезгілде
+# келген сұраныстар жартылай жазылған файлды көрмейді
+def ensure_derivative(name, width, fmt):
+    source = source_path(name)
+    if source is None:
+        return False
+
+    target = default_storage.path(derivative_name(name, width, fmt))
+    if os.path.isfile(target):
+        return True
+    if not os.path.isfile(source):
+        return False
+
+    # Бүлінген/танылмаған файл (UnidentifiedImageError - OSError) немесе тым үлкен сурет: өлшем жасалмайды,
+    # сұраныс 500 емес, 404 алады
+    try:
+        data = render_derivative(source, width, PRESETS[image_kind(name)]['ratio'], fmt)
+    except (OSError, Image.DecompressionBombError):
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, target)
+    return True
+
+
+def generate_derivatives(name):
+    kind = image_kind(name)
+    if kind is None:
+        return 0
+    return sum(
+        ensure_derivative(name, width, fmt)
+        for width in PRESETS[kind]['widths']
+        for fmt in FORMATS
+    )
+
+
+def delete_derivatives(name):
+    if normalize_media_name(name) is None:
+        return
+    shutil.rmtree(default_storage.path(f'{DERIVATIVES_DIR}/{name}'), ignore_errors=True)
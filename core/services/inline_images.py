@@ -0,0 +1,120 @@
+import base64
+import binascii
+import hashlib
+import io
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image
+from core.models import Subject, Lesson, Task, Written, TextGap, Question, Option, MatchingColumn, MatchingItem, \
+    TableColumn, TableRow
+from core.services.richtext import RICHTEXT_FIELDS, html_field, render_instance_html
+
+
+# django-summernote/ ережесімен беріледі (core.services.media): тек кірген қолданушыларға
+INLINE_DIR = 'django-summernote/inline'
+BATCH_SIZE = 200
+
+# Summernote өңдейтін мәтін өрістері. Суреттер base64 күйінде қалса, жол жүздеген КБ болады
+# және опциялар/сұрақтар оқылатын әр сұранысқа (бағалауды қоса) ілесіп жүреді
+INLINE_IMAGE_FIELDS = {
+    Subject: ('description',),
+    Lesson: ('description',),
+    Task: ('description',),
+    Written: ('instruction',),
+    TextGap: ('prompt',),
+    Question: ('text',),
+    Option: ('text',),
+    MatchingColumn: ('label',),
+    MatchingItem: ('text',),
+    TableColumn: ('label',),
+    TableRow: ('label',),
+}
+
+INLINE_IMAGE_RE = re.compile(r'''(\ssrc\s*=\s*)(["'])data:image/[\w.+-]+;base64,([A-Za-z0-9+/=\s]+)\2''', re.IGNORECASE)
+# Pillow анықтаған формат -> кеңейтім. SVG әдейі жоқ: ол скрипт ұстай алады, сондықтан мәтінде қалады
+IMAGE_FORMATS = {'PNG': 'png', 'JPEG': 'jpg', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+# Файл аты мазмұнның хешінен: бірдей сурет қанша рет кездессе де бір рет сақталады
+def store_inline_image(data):
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format = image.format
+            image.verify()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return None
+
+    extension = IMAGE_FORMATS.get(image_format)
+    if extension is None:
+        return None
+
+    digest = hashlib.sha256(data).hexdigest()
+    name = f'{INLINE_DIR}/{digest[:2]}/{digest}.{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def _replace_inline_image(match):
+    try:
+        data = base64.b64decode(re.sub(r'\s', '', match.group(3)), validate=True)
+    except (binascii.Error, ValueError):
+        return match.group(0)
+
+    name = store_inline_image(data)
+    if name is None:
+        return match.group(0)
+
+    quote = match.group(2)
+    return f'{match.group(1)}{quote}{default_storage.url(name)}{quote}'
+
+
+# <img src="data:image/...;base64,..."> -> <img src="/media/django-summernote/inline/..."> .
+# Танылмаған немесе бүлінген суреттер өзгеріссіз қалады
+def extract_inline_images(html):
+    if not html or 'data:image' not in html:
+        return html
+    return INLINE_IMAGE_RE.sub(_replace_inline_image, html)
+
+
+# Объектінің өрістерін орнында түзетеді; өзгерген өрістердің тізімін қайтарады
+def extract_instance_images(instance, fields):
+    changed = []
+    for field in fields:
+        value = getattr(instance, field)
+        html = extract_inline_images(value)
+        if html != value:
+            setattr(instance, field, html)
+            changed.append(field)
+    return changed
+
+
+# Бар жолдарды pk бойынша топтап өңдейді (bulk_update, сигналсыз, сондықтан HTML серіктері де осында
+# қайта есептеледі). Өңделген жол саны қайтарылады
+def extract_model_images(model, batch_size=BATCH_SIZE):
+    fields = INLINE_IMAGE_FIELDS[model]
+    html_fields = [html_field(field) for field in RICHTEXT_FIELDS.get(model, ())]
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__contains': 'data:image'})
+    queryset = model.objects.filter(condition).only('pk', *fields, *html_fields).order_by('pk')
+
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return total
+
+        changed = [instance for instance in batch if extract_instance_images(instance, fields)]
+        if changed:
+            for instance in changed:
+                render_instance_html(instance, RICHTEXT_FIELDS.get(model, ()))
+            with transaction.atomic():
+                model.objects.bulk_update(changed, [*fields, *html_fields])
+        total += len(changed)
+        last_pk = batch[-1].pk
@@ -0,0 +1,187 @@
+import math
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from core.models import Question, Option, UserTask, UserAnswer
+
+
+ITEM_ANALYSIS_TIMEOUT = 60 * 60 * 24
+# Жаңа жауаптар келгенде есеп толығымен қайта құрылады, бірақ осы аралықта бір реттен жиі емес
+REBUILD_INTERVAL = 60
+# Дискриминация индексі үшін ең аз жауап берушілер саны (әр топта кемінде бір адам)
+MIN_RESPONDENTS = 4
+# Есеп пішімі өзгерсе арттырылады (ескі кэштелген есептер оқылмайды). 2: нұсқа мәтіні text_html-ден
+REPORT_VERSION = 2
+
+
+def item_analysis_cache_key(task):
+    return f'item-analysis:v{REPORT_VERSION}:{task.pk}:{task.answer_key_version}'
+
+
+def submissions_cache_key(task_id):
+    return f'item-analysis:submissions:{task_id}'
+
+
+def _submissions(task_id):
+    return cache.get(submissions_cache_key(task_id), 0)
+
+
+# Тест тапсырылғанда шақырылады: тек жауаптар санауышын арттырады, есептің өзі келесі оқылғанда қайта құрылады
+def register_submission(task_id):
+    def bump():
+        key = submissions_cache_key(task_id)
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+    transaction.on_commit(bump)
+
+
+def _count(queryset):
+    return Coalesce(
+        Subquery(queryset.order_by().values('useranswer_id').annotate(count=Count('pk')).values('count')),
+        Value(0), output_field=IntegerField(),
+    )
+
+
+# Төменгі және жоғарғы ширектердің шекаралары: UserTask.rating бойынша k-шы ең төменгі/ең жоғары баға.
+# Шекарадағы тең бағалар топқа толығымен кіреді
+def _quartile_bounds(user_tasks, respondents):
+    if respondents < MIN_RESPONDENTS:
+        return None, None
+
+    k = math.ceil(respondents / 4) - 1
+    lower = user_tasks.order_by('rating', 'pk').values_list('rating', flat=True)[k]
+    upper = user_tasks.order_by('-rating', 'pk').values_list('rating', flat=True)[k]
+    return lower, upper
+
+
+def _rate(part, whole):
+    return round(part / whole, 3) if whole else None
+
+
+# Тест сұрақтарының талдауы: дұрыс жауап үлесі, нұсқалардың таралуы және дискриминация индексі.
+# Барлығы топтастырылған сұраныстармен есептеледі (жауап саны қанша болса да 7 сұраныс)
+# ----------------------------------------------------------------------------------------------------------------------
+def build_item_analysis(task):
+    user_tasks = UserTask.objects.filter(task=task, is_completed=True)
+    respondents = user_tasks.count()
+    lower, upper = _quartile_bounds(user_tasks, respondents)
+
+    through = UserAnswer.options.through
+    selections = through.objects.filter(useranswer_id=OuterRef('pk'))
+
+    # Бір жауаптың толық дұрыстығы score_question ережесімен бірдей:
+    # қате таңдау жоқ, simple үшін бір дұрыс таңдау, multiple үшін барлық дұрыс нұсқа таңдалған
+    answers = (
+        UserAnswer.objects
+        .filter(question__task=task, user_task__is_completed=True)
+        .annotate(
+            right_selected=_count(selections.filter(option__is_correct=True)),
+            wrong_selected=_count(selections.filter(option__is_correct=False)),
+            right_total=Coalesce(
+                Subquery(
+                    Option.objects.filter(question_id=OuterRef('question_id'), is_correct=True)
+                    .order_by().values('question_id').annotate(count=Count('pk')).values('count')
+                ),
+                Value(0), output_field=IntegerField(),
+            ),
+        )
+    )
+    is_correct = Q(wrong_selected=0) & (
+        Q(question__question_type='simple', right_selected=1)
+        | Q(question__question_type='multiple', right_selected=F('right_total'), right_total__gt=0)
+    )
+    is_blank = Q(right_selected=0, wrong_selected=0)
+
+    aggregates = {
+        'answered': Count('pk'),
+        'correct': Count('pk', filter=is_correct),
+        'blank': Count('pk', filter=is_blank),
+    }
+    if lower is not None:
+        aggregates.update(
+            lower_count=Count('pk', filter=Q(user_task__rating__lte=lower)),
+            lower_correct=Count('pk', filter=Q(user_task__rating__lte=lower) & is_correct),
+            upper_count=Count('pk', filter=Q(user_task__rating__gte=upper)),
+            upper_correct=Count('pk', filter=Q(user_task__rating__gte=upper) & is_correct),
+        )
+    totals = {row['question_id']: row for row in answers.values('question_id').annotate(**aggregates).order_by()}
+
+    picks = dict(
+        through.objects
+        .filter(option__question__task=task, useranswer__user_task__is_completed=True)
+        .values('option_id')
+        .annotate(count=Count('pk'))
+        .order_by()
+        .values_list('option_id', 'count')
+    )
+
+    options = {}
+    option_rows = (
+        Option.objects
+        .filter(question__task=task)
+        .order_by('pk')
+        .values('pk', 'question_id', 'text_html', 'is_correct')
+    )
+    for option in option_rows:
+        options.setdefault(option['question_id'], []).append(option)
+
+    questions = []
+    for question in Question.objects.filter(task=task).order_by('order', 'pk').values('pk', 'text_html', 'question_type'):
+        row = totals.get(question['pk'], {})
+        answered = row.get('answered', 0)
+
+        discrimination = None
+        if row.get('lower_count') and row.get('upper_count'):
+            discrimination = round(
+                row['upper_correct'] / row['upper_count'] - row['lower_correct'] / row['lower_count'], 3
+            )
+
+        questions.append({
+            'id': question['pk'],
+            'text': question['text_html'],
+            'question_type': question['question_type'],
+            'answered': answered,
+            'blank': row.get('blank', 0),
+            'correct_rate': _rate(row.get('correct', 0), answered),
+            'discrimination': discrimination,
+            'options': [
+                {
+                    'id': option['pk'],
+                    'text': option['text_html'],
+                    'is_correct': option['is_correct'],
+                    'count': picks.get(option['pk'], 0),
+                    'rate': _rate(picks.get(option['pk'], 0), answered),
+                }
+                for option in options.get(question['pk'], [])
+            ],
+        })
+
+    return {
+        'task_id': task.pk,
+        'respondents': respondents,
+        'questions': questions,
+        'built_at': timezone.now(),
+    }
+
+
+# Кэш тапсырма бойынша (кілтте answer_key_version бар). Есеп инкременттік емес: әр жауап ширектерді
+# ығыстырады, сондықтан дискриминация индексін дельтамен жаңарту мүмкін емес. Жаңа жауаптар тіркелсе,
+# есеп REBUILD_INTERVAL өткен соң толығымен қайта құрылады; оған дейін соңғы құрылған нұсқасы беріледі
+def get_item_analysis(task):
+    key = item_analysis_cache_key(task)
+    submissions = _submissions(task.pk)
+    cached = cache.get(key)
+
+    if cached is not None and (
+        cached['submissions'] == submissions
+        or (timezone.now() - cached['report']['built_at']).total_seconds() < REBUILD_INTERVAL
+    ):
+        return cached['report']
+
+    report = build_item_analysis(task)
+    cache.set(key, {'submissions': submissions, 'report': report}, ITEM_ANALYSIS_TIMEOUT)
+    return report
@@ -0,0 +1,96 @@
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from core.models import BackgroundJob
+
+
+# Тапсырма атауы -> орындайтын функция (kwargs = BackgroundJob.payload)
+JOB_HANDLERS = {
+    'fan_out_lesson': 'core.services.materialize.fan_out_lesson',
+    'sync_lesson_content': 'core.services.materialize.sync_lesson_content',
+    'recompute_subject_progress': 'core.services.progress.recompute_subject_progress',
+}
+MAX_ATTEMPTS = 3
+RETRY_DELAY = timedelta(minutes=1)
+# Орындалып жатқан тапсырманың "жалдау" мерзімі: жұмысшы құласа, осыдан кейін қайта алынады
+LEASE = timedelta(minutes=10)
+
+
+def run_handler(name, payload):
+    return import_string(JOB_HANDLERS[name])(**payload)
+
+
+# Транзакцияда осы тапсырманың on_commit шақыруы тіркеліп қойған ба. connection.run_on_commit
+# savepoint/транзакция кері қайтарылғанда өзі тазаланады, сондықтан бөлек есеп жүргізілмейді
+def _pending_on_commit(key):
+    connection = transaction.get_connection()
+    return any(getattr(func, 'job_key', None) == key for __, func, __ in connection.run_on_commit)
+
+
+# BACKGROUND_JOBS қосулы болса, тапсырма кестеге жазылады (сол транзакцияда, сондықтан жұмысшы
+# оны тек commit-тен кейін көреді). Әйтпесе commit-тен кейін осы процесте орындалады: бір транзакцияда
+# бірдей (атау, параметрлер) тапсырма бір рет қана орындалады (мысалы, бір сабаққа көп сұрақ қосылса).
+# unique=True: кезекте дәл осындай күтудегі тапсырма болса, жаңасы қосылмайды
+def dispatch(name, unique=False, **payload):
+    if settings.BACKGROUND_JOBS:
+        if unique:
+            job = BackgroundJob.objects.filter(name=name, payload=payload, status='pending').first()
+            if job:
+                return job
+        return BackgroundJob.objects.create(name=name, payload=payload)
+
+    key = (name, sorted(payload.items()))
+    if _pending_on_commit(key):
+        return None
+
+    def run():
+        run_handler(name, payload)
+
+    run.job_key = key
+    transaction.on_commit(run)
+    return None
+
+
+# Кезектен бір тапсырманы алу: SKIP LOCKED арқылы бірнеше жұмысшы бір жолды алмайды
+def claim_job():
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            BackgroundJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=('pending', 'running'), run_after__lte=now)
+            .order_by('run_after', 'pk')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = 'running'
+        job.attempts += 1
+        job.run_after = now + LEASE
+        job.save(update_fields=['status', 'attempts', 'run_after'])
+    return job
+
+
+def run_job(job):
+    try:
+        run_handler(job.name, job.payload)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < MAX_ATTEMPTS:
+            job.status = 'pending'
+            job.run_after = timezone.now() + RETRY_DELAY * job.attempts
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+    else:
+        job.status = 'done'
+        job.error = None
+        job.finished_at = timezone.now()
+
+    job.save(update_fields=['status', 'error', 'run_after', 'finished_at'])
+    return job.status == 'done'
@@ -0,0 +1,125 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from core.models import User, StudentSubjectStats
+
+
+LEADERBOARD_SIZE = 10
+LEADERBOARD_TIMEOUT = 60 * 60
+ALL_CLASSES = 'all'
+
+# Рейтинг реті: пән бағасы, сосын пайызы (core_stats_*_rank_idx индекстерімен сәйкес)
+RANK_ORDERING = ('-subject_rating_total', '-subject_percentage_total', 'user__last_name', 'user__first_name', 'pk')
+
+
+def leaderboard_cache_key(subject_id, user_class=None):
+    return f'leaderboard:{subject_id}:{user_class or ALL_CLASSES}'
+
+
+def _cohort(subject_id, user_class=None):
+    queryset = StudentSubjectStats.objects.filter(subject_id=subject_id)
+    if user_class:
+        queryset = queryset.filter(user_class=user_class)
+    return queryset
+
+
+# Top-N: индекс бойынша LIMIT-пен оқылады, нәтиже кэште сақталады ({'size': N, 'entries': [...]})
+def _cached_top(cached, limit):
+    if cached is not None and cached['size'] >= limit:
+        return cached['entries'][:limit]
+    return None
+
+
+def _leaders(queryset):
+    return (
+        queryset
+        .select_related('user')
+        .only(
+            'user_id', 'subject_id', 'user_class', 'subject_rating_total', 'subject_percentage_total',
+            'user__first_name', 'user__last_name', 'user__email', 'user__avatar',
+        )
+        .annotate(rating=F('subject_rating_total'), percentage=F('subject_percentage_total'))
+    )
+
+
+# Тең нәтижелер бір орынды бөліседі (1, 2, 2, 4, ...)
+def _rank(entries):
+    for position, entry in enumerate(entries, start=1):
+        previous = entries[position - 2] if position > 1 else None
+        if previous and (previous.rating, previous.percentage) == (entry.rating, entry.percentage):
+            entry.rank = previous.rank
+        else:
+            entry.rank = position
+    return entries
+
+
+def top_students(subject_id, user_class=None, limit=LEADERBOARD_SIZE):
+    key = leaderboard_cache_key(subject_id, user_class)
+    entries = _cached_top(cache.get(key), limit)
+    if entries is not None:
+        return entries
+
+    size = max(limit, LEADERBOARD_SIZE)
+    entries = _rank(list(_leaders(_cohort(subject_id, user_class)).order_by(*RANK_ORDERING)[:size]))
+
+    cache.set(key, {'size': size, 'entries': entries}, LEADERBOARD_TIMEOUT)
+    return entries[:limit]
+
+
+# Бірнеше пәннің top-N тізімі: кэштен бір get_many, жоқтары бір window-сұраныспен есептеліп,
+# кэшке пән бойынша жазылады
+def top_students_many(subject_ids, user_class=None, limit=LEADERBOARD_SIZE):
+    keys = {leaderboard_cache_key(subject_id, user_class): subject_id for subject_id in subject_ids}
+    cached = cache.get_many(keys)
+
+    result = {}
+    for key, subject_id in keys.items():
+        entries = _cached_top(cached.get(key), limit)
+        if entries is not None:
+            result[subject_id] = entries
+
+    missing = [subject_id for subject_id in keys.values() if subject_id not in result]
+    if not missing:
+        return result
+
+    size = max(limit, LEADERBOARD_SIZE)
+    queryset = StudentSubjectStats.objects.filter(subject_id__in=missing)
+    if user_class:
+        queryset = queryset.filter(user_class=user_class)
+    rows = (
+        _leaders(queryset)
+        .annotate(position=Window(RowNumber(), partition_by=F('subject_id'), order_by=RANK_ORDERING))
+        .filter(position__lte=size)
+        .order_by('subject_id', 'position')
+    )
+
+    grouped = {subject_id: [] for subject_id in missing}
+    for entry in rows:
+        grouped[entry.subject_id].append(entry)
+
+    cache.set_many(
+        {
+            leaderboard_cache_key(subject_id, user_class): {'size': size, 'entries': _rank(entries)}
+            for subject_id, entries in grouped.items()
+        },
+        LEADERBOARD_TIMEOUT,
+    )
+    for subject_id, entries in grouped.items():
+        result[subject_id] = entries[:limit]
+    return result
+
+
+# Қолданушының орны: өзінен жоғары тұрғандарды индекс арқылы санау (бүкіл топты сұрыптамай)
+def student_position(stats, user_class=None):
+    ahead = _cohort(stats.subject_id, user_class).filter(
+        Q(subject_rating_total__gt=stats.subject_rating_total) |
+        Q(subject_rating_total=stats.subject_rating_total, subject_percentage_total__gt=stats.subject_percentage_total)
+    ).count()
+    return ahead + 1
+
+
+def invalidate_leaderboards(subject_ids, user_class=None):
+    classes = [user_class] if user_class else [code for code, __ in User.USER_CLASS]
+    keys = [leaderboard_cache_key(subject_id, code) for subject_id in subject_ids for code in [None, *classes]]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,113 @@
+from django.db import transaction
+from core.models import Lesson, Task, Video, Written, TextGap, Question, MatchingItem, UserSubject, UserChapter, \
+    UserLesson, UserTask, UserVideo, UserWritten, UserTextGap, UserAnswer, UserMatchingAnswer
+from core.services.progress import recompute_progress
+
+
+BATCH_SIZE = 1000
+
+# task_type -> (жауап моделі, мазмұн өрісі, тапсырма мазмұнының queryset-і)
+# Кесте тапсырмасына жеке жолдар құрылмайды: жауап UserTask.table_answer бітмапында сақталады
+CONTENT_ROWS = {
+    'video': (UserVideo, 'video', lambda lesson: Video.objects.filter(task__lesson=lesson).values_list('task_id', 'pk')),
+    'written': (UserWritten, 'written', lambda lesson: Written.objects.filter(task__lesson=lesson).values_list('task_id', 'pk')),
+    'text_gap': (UserTextGap, 'text_gap', lambda lesson: TextGap.objects.filter(task__lesson=lesson).values_list('task_id', 'pk')),
+    'test': (UserAnswer, 'question', lambda lesson: Question.objects.filter(task__lesson=lesson).values_list('task_id', 'pk')),
+    'matching': (
+        UserMatchingAnswer, 'item',
+        lambda lesson: MatchingItem.objects.filter(correct_column__task__lesson=lesson).values_list('correct_column__task_id', 'pk')
+    ),
+}
+
+
+# Бір сабақтың UserTask және жауап жолдарын берілген UserLesson-дар үшін жаппай құру.
+# Сабақ мазмұны бар жолдармен салыстырылып, тек жетіспейтіндері қосылады (бар жолдар қайта жазылмайды);
+# жарыс кезінде unique шектеулері қайталануға жол бермейді, сондықтан қайта шақыру қауіпсіз
+def materialize_lesson(lesson, user_lesson_ids):
+    user_lesson_ids = list(user_lesson_ids)
+    tasks = dict(Task.objects.filter(lesson=lesson).values_list('pk', 'task_type'))
+    if not tasks or not user_lesson_ids:
+        return 0
+
+    with transaction.atomic():
+        existing = set(
+            UserTask.objects.filter(user_lesson_id__in=user_lesson_ids, task_id__in=tasks).values_list('user_lesson_id', 'task_id')
+        )
+        missing = [
+            UserTask(user_lesson_id=ul_id, task_id=task_id)
+            for ul_id in user_lesson_ids for task_id in tasks
+            if (ul_id, task_id) not in existing
+        ]
+        created = len(UserTask.objects.bulk_create(missing, ignore_conflicts=True, batch_size=BATCH_SIZE))
+
+        user_tasks_by_task = {}
+        for user_task_id, task_id in UserTask.objects.filter(
+            user_lesson_id__in=user_lesson_ids, task_id__in=tasks
+        ).values_list('pk', 'task_id'):
+            user_tasks_by_task.setdefault(task_id, []).append(user_task_id)
+
+        task_types = set(tasks.values())
+
+        for task_type, (model, field, content) in CONTENT_ROWS.items():
+            if task_type not in task_types:
+                continue
+
+            user_task_ids = [
+                user_task_id
+                for task_id, ids in user_tasks_by_task.items() if tasks[task_id] == task_type
+                for user_task_id in ids
+            ]
+            existing = set(model.objects.filter(user_task_id__in=user_task_ids).values_list('user_task_id', f'{field}_id'))
+
+            rows = [
+                model(user_task_id=user_task_id, **{f'{field}_id': content_id})
+                for task_id, content_id in content(lesson)
+                if tasks.get(task_id) == task_type
+                for user_task_id in user_tasks_by_task.get(task_id, [])
+                if (user_task_id, content_id) not in existing
+            ]
+            created += len(model.objects.bulk_create(rows, ignore_conflicts=True, batch_size=BATCH_SIZE))
+
+    return created
+
+
+# Мазмұн өзгергеннен кейін басталған (немесе аяқталған) сабақтарды толықтыру.
+# Басталмаған сабақтар lesson_start кезінде толық құрылады, сондықтан оларға тиіспейміз
+def sync_lesson_content(lesson_id, chunk_size=BATCH_SIZE):
+    lesson = Lesson.objects.filter(pk=lesson_id).first()
+    if lesson is None:
+        return 0
+
+    user_lesson_ids = list(
+        UserLesson.objects.filter(lesson=lesson).exclude(status='no-started').order_by('pk').values_list('pk', flat=True)
+    )
+    created = 0
+    for start in range(0, len(user_lesson_ids), chunk_size):
+        created += materialize_lesson(lesson, user_lesson_ids[start:start + chunk_size])
+    return created
+
+
+# Жаңа сабақты пәнге жазылған барлық білім алушыларға тарату: UserChapter/UserLesson жолдары
+# жаппай қосылады (бар жолдар unique шектеулері арқылы өткізіледі), сосын есептегіштер қайта есептеледі
+def fan_out_lesson(lesson_id):
+    lesson = Lesson.objects.select_related('chapter').filter(pk=lesson_id).first()
+    if lesson is None:
+        return 0
+
+    user_subjects = UserSubject.objects.filter(subject_id=lesson.chapter.subject_id)
+    enrolled = list(user_subjects.values_list('pk', 'user_id'))
+    if not enrolled:
+        return 0
+
+    with transaction.atomic():
+        UserChapter.objects.bulk_create(
+            [UserChapter(user_subject_id=pk, user_id=user_id, chapter_id=lesson.chapter_id) for pk, user_id in enrolled],
+            ignore_conflicts=True, batch_size=BATCH_SIZE
+        )
+        UserLesson.objects.bulk_create(
+            [UserLesson(user_subject_id=pk, user_id=user_id, lesson_id=lesson.pk) for pk, user_id in enrolled],
+            ignore_conflicts=True, batch_size=BATCH_SIZE
+        )
+        recompute_progress(user_subjects)
+
+    return len(enrolled)
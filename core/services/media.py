@@ -0,0 +1,185 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from core.models import Subject, LessonDocs, UserSubject, UserWritten
+
+
+PUBLIC_CACHE = 'public, max-age=86400'
+PRIVATE_CACHE = 'private, max-age=3600'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+# Authorization
+# ----------------------------------------------------------------------------------------------------------------------
+# URL-дан келген жол қалыпты түрде болуы керек: "..", абсолют жол, "./" немесе "//" бар жолдар қабылданбайды.
+# Әйтпесе ".../posters/../certs/x.pdf" ашық ереже бойынша өтіп, басқа буманың файлын берер еді
+def normalize_media_name(path):
+    if not path or '\\' in path or '\x00' in path:
+        return None
+
+    name = posixpath.normpath(path)
+    if name != path or name.startswith('/') or '..' in name.split('/'):
+        return None
+    return name
+
+
+def _enrolled(user, subject_ids):
+    return UserSubject.objects.filter(user=user, subject_id__in=list(subject_ids)).exists()
+
+
+def _lesson_doc(user, name):
+    return _enrolled(user, LessonDocs.objects.filter(file=name).values_list('lesson__chapter__subject_id', flat=True))
+
+
+def _subject_cert(user, name):
+    return _enrolled(user, Subject.objects.filter(cert=name).values_list('pk', flat=True))
+
+
+def _written_file(user, name):
+    return UserWritten.objects.filter(file=name, user_task__user_lesson__user=user).exists()
+
+
+# upload_to префиксі -> (ашық па, білім алушыны тексеретін функция).
+# None: кез келген кірген қолданушыға рұқсат
+MEDIA_RULES = (
+    ('core/models/subject/posters/', True, None),
+    ('core/account/users/', False, None),
+    ('django-summernote/', False, None),
+    ('core/models/lesson/docs/', False, _lesson_doc),
+    ('core/models/subject/certs/', False, _subject_cert),
+    ('core/models/user_written/files/', False, _written_file),
+)
+
+
+# Қайтарады: None (рұқсат жоқ) немесе True/False (файл ашық па, яғни ортақ кэштеуге бола ма)
+def authorize_media(user, name):
+    if normalize_media_name(name) is None:
+        return None
+
+    for prefix, public, check in MEDIA_RULES:
+        if not name.startswith(prefix):
+            continue
+        if public:
+            return True
+        if not user.is_authenticated:
+            return None
+        if check is None or user.is_staff or user.user_type in ('teacher', 'admin') or check(user, name):
+            return False
+        return None
+
+    # Белгісіз жолдар тек қызметкерлерге
+    if user.is_authenticated and (user.is_staff or user.user_type in ('teacher', 'admin')):
+        return False
+    return None
+
+
+# Delivery
+# ----------------------------------------------------------------------------------------------------------------------
+# Файлдың берілген бөлігін ғана оқитын обёртка (FileResponse оны бөліктеп жібереді)
+class RangeFile:
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+# "bytes=a-b", "bytes=a-", "bytes=-n" -> (басы, ұзындығы); бірнеше аралық қолдау көрсетілмейді (толық файл беріледі).
+# Қанағаттандыру мүмкін емес аралық -> False
+def parse_range(header, size):
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        length = min(int(last), size)
+        return (size - length, length) if length else False
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end - start + 1
+
+
+def _range_applies(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    parsed = parse_http_date_safe(if_range)
+    return parsed is not None and int(mtime) <= parsed
+
+
+# MEDIA_DELIVERY: 'nginx' (X-Accel-Redirect), 'sendfile' (X-Sendfile) немесе 'django' (әзірлеу үшін,
+# Range және шартты сұраныстарды осы жерде өңдейді). Алғашқы екеуінде байттарды веб-сервер береді
+def media_response(request, name, public):
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(path):
+        return None
+
+    stat = os.stat(path)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    cache_control = PUBLIC_CACHE if public else PRIVATE_CACHE
+
+    if settings.MEDIA_DELIVERY in ('nginx', 'sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_DELIVERY == 'nginx':
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+        else:
+            response['X-Sendfile'] = path
+        response['Cache-Control'] = cache_control
+        return response
+
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        file = open(path, 'rb')
+        byte_range = None
+        if request.headers.get('Range') and _range_applies(request, etag, stat.st_mtime):
+            byte_range = parse_range(request.headers['Range'], stat.st_size)
+
+        if byte_range is False:
+            file.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range:
+            start, length = byte_range
+            response = FileResponse(RangeFile(file, start, length), content_type=content_type, status=206)
+            response.block_size = BLOCK_SIZE
+            response['Content-Length'] = length
+            response['Content-Range'] = f'bytes {start}-{start + length - 1}/{stat.st_size}'
+        else:
+            response = FileResponse(file, content_type=content_type)
+            response.block_size = BLOCK_SIZE
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = cache_control
+    return response
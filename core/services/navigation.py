@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from core.models import UserChapter, UserLesson
+
+
+NAVIGATION_TIMEOUT = 60 * 60 * 24
+
+
+def navigation_cache_key(user_subject_id):
+    return f'lesson-nav:{user_subject_id}'
+
+
+# Сабақ бетінің бүйір мәзірі: бөлімдер, сабақтар (ұзақтығымен) және алдыңғы/келесі сабақ кілттері.
+# Екі сұраныспен құрылады
+def build_lesson_navigation(user_subject):
+    user_chapters = [
+        {
+            'id': row['pk'],
+            'rating': row['rating'],
+            'percentage': row['percentage'],
+            'is_completed': row['is_completed'],
+            'chapter': {'id': row['chapter_id'], 'name': row['chapter__name'], 'order': row['chapter__order']},
+        }
+        for row in (
+            UserChapter.objects
+            .filter(user_subject=user_subject)
+            .order_by('chapter__order', 'chapter_id')
+            .values('pk', 'rating', 'percentage', 'is_completed', 'chapter_id', 'chapter__name', 'chapter__order')
+        )
+    ]
+    user_chapter_ids = {uc['chapter']['id']: uc['id'] for uc in user_chapters}
+
+    user_lessons = [
+        {
+            'id': row['pk'],
+            'status': row['status'],
+            'rating': row['rating'],
+            'total_duration': row['total_duration'] or 0,
+            'user_chapter_id': user_chapter_ids.get(row['lesson__chapter_id']),
+            'lesson': {'id': row['lesson_id'], 'title': row['lesson__title'], 'chapter_id': row['lesson__chapter_id']},
+        }
+        for row in (
+            UserLesson.objects
+            .filter(user_subject=user_subject)
+            .values('pk', 'status', 'rating', 'lesson_id', 'lesson__title', 'lesson__chapter_id')
+            .annotate(total_duration=Sum('lesson__tasks__duration'))
+            .order_by('lesson__chapter__order', 'lesson__order', 'lesson_id')
+        )
+    ]
+
+    user_lessons_by_chapter = {}
+    for ul in user_lessons:
+        user_lessons_by_chapter.setdefault(ul['lesson']['chapter_id'], []).append(ul)
+
+    # user_lesson_id -> (алдыңғы, келесі)
+    neighbours = {
+        ul['id']: (
+            user_lessons[i - 1] if i > 0 else None,
+            user_lessons[i + 1] if i < len(user_lessons) - 1 else None,
+        )
+        for i, ul in enumerate(user_lessons)
+    }
+
+    return {
+        'version': user_subject.subject.content_version,
+        'user_chapters': user_chapters,
+        'user_lessons': {ul['id']: ul for ul in user_lessons},
+        'user_lessons_by_chapter': user_lessons_by_chapter,
+        'neighbours': neighbours,
+    }
+
+
+# Кэш UserSubject бойынша сақталады; пән мазмұны өзгерсе (Subject.content_version) қайта құрылады
+def get_lesson_navigation(user_subject):
+    key = navigation_cache_key(user_subject.pk)
+    navigation = cache.get(key)
+    if navigation is None or navigation['version'] != user_subject.subject.content_version:
+        navigation = build_lesson_navigation(user_subject)
+        cache.set(key, navigation, NAVIGATION_TIMEOUT)
+    return navigation
+
+
+# Сабақ басталғанда/аяқталғанда немесе прогресс қайта есептелгенде шақырылады
+def invalidate_lesson_navigation(*user_subject_ids):
+    keys = [navigation_cache_key(pk) for pk in user_subject_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,180 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from core.models import UserSubject, UserChapter, UserLesson, UserTask
+from core.services.heatmap import invalidate_heatmap
+from core.services.navigation import invalidate_lesson_navigation
+from core.services.reports import apply_stats_delta, rebuild_reports
+
+
+CHAPTER_PROGRESS_FIELDS = ('lesson_count', 'completed_lesson_count', 'rating_total', 'rating', 'percentage', 'is_completed')
+SUBJECT_PROGRESS_FIELDS = (
+    'chapter_count', 'lesson_count', 'completed_lesson_count', 'rating_total',
+    'rating', 'percentage', 'is_completed', 'completed_at',
+)
+
+
+# helpers
+# ----------------------------------------------------------------------------------------------------------------------
+def _percentage(completed, total):
+    # Decimal: DecimalField-тің ескі мәнімен айырманы есептеуге болады
+    return Decimal((completed / total) * 100).quantize(Decimal('0.01')) if total else Decimal(0)
+
+
+def _refresh_chapter(user_chapter):
+    user_chapter.rating = int(round(user_chapter.rating_total / user_chapter.lesson_count)) if user_chapter.lesson_count else 0
+    user_chapter.percentage = _percentage(user_chapter.completed_lesson_count, user_chapter.lesson_count)
+    user_chapter.is_completed = 0 < user_chapter.lesson_count == user_chapter.completed_lesson_count
+
+
+def _refresh_subject(user_subject):
+    was_completed = user_subject.is_completed
+    user_subject.rating = int(round(user_subject.rating_total / user_subject.chapter_count)) if user_subject.chapter_count else 0
+    user_subject.percentage = _percentage(user_subject.completed_lesson_count, user_subject.lesson_count)
+    user_subject.is_completed = 0 < user_subject.lesson_count == user_subject.completed_lesson_count
+
+    if user_subject.is_completed and not was_completed:
+        user_subject.completed_at = timezone.now()
+    elif not user_subject.is_completed:
+        user_subject.completed_at = None
+
+
+# Incremental rollup
+# ----------------------------------------------------------------------------------------------------------------------
+# Бір UserLesson өзгерісін бөлім мен пәнге қолдану (әр деңгейде бір құлыпталған оқу/жазу),
+# сосын сол айырмаларды есеп кестелеріне қосу
+def apply_lesson_delta(user_lesson, rating_delta=0, completed_delta=0, percentage_delta=0):
+    with transaction.atomic():
+        user_chapter = (
+            UserChapter.objects
+            .select_for_update()
+            .filter(user_subject_id=user_lesson.user_subject_id, chapter_id=user_lesson.lesson.chapter_id)
+            .first()
+        )
+        chapter_rating_delta = chapter_percentage_delta = 0
+
+        if user_chapter:
+            old_chapter_rating, old_chapter_percentage = user_chapter.rating, user_chapter.percentage
+            user_chapter.rating_total += rating_delta
+            user_chapter.completed_lesson_count += completed_delta
+            _refresh_chapter(user_chapter)
+            user_chapter.save(update_fields=CHAPTER_PROGRESS_FIELDS)
+            chapter_rating_delta = user_chapter.rating - old_chapter_rating
+            chapter_percentage_delta = user_chapter.percentage - old_chapter_percentage
+
+        user_subject = (
+            UserSubject.objects
+            .select_for_update(of=('self',))
+            .select_related('user')
+            .get(pk=user_lesson.user_subject_id)
+        )
+        old_subject_rating, old_subject_percentage = user_subject.rating, user_subject.percentage
+        user_subject.rating_total += chapter_rating_delta
+        user_subject.completed_lesson_count += completed_delta
+        _refresh_subject(user_subject)
+        user_subject.save(update_fields=SUBJECT_PROGRESS_FIELDS)
+
+        apply_stats_delta(
+            user_subject, user_subject.user.user_class,
+            subject_rating_total=user_subject.rating - old_subject_rating,
+            subject_percentage_total=user_subject.percentage - old_subject_percentage,
+            chapter_rating_total=chapter_rating_delta,
+            chapter_percentage_total=chapter_percentage_delta,
+            lesson_rating_total=rating_delta,
+            lesson_percentage_total=percentage_delta,
+        )
+        invalidate_heatmap(user_subject.subject_id)
+
+    return user_chapter, user_subject
+
+
+# Сабақты аяқтау: бағаны есептеп, өзгерісті жоғары деңгейлерге таратады
+def finish_user_lesson(user_lesson):
+    with transaction.atomic():
+        user_lesson = UserLesson.objects.select_for_update().select_related('lesson').get(pk=user_lesson.pk)
+        if user_lesson.is_completed:
+            return user_lesson, False
+
+        old_rating, old_percentage = user_lesson.rating, user_lesson.percentage
+        total_rating = UserTask.objects.filter(user_lesson=user_lesson).aggregate(total=Sum('rating'))['total'] or 0
+
+        user_lesson.rating = total_rating
+        user_lesson.percentage = int(round(user_lesson.rating))
+        user_lesson.is_completed = True
+        user_lesson.completed_at = timezone.now()
+        user_lesson.status = 'finished'
+        user_lesson.save()
+
+        apply_lesson_delta(
+            user_lesson,
+            rating_delta=total_rating - old_rating,
+            completed_delta=1,
+            percentage_delta=user_lesson.percentage - old_percentage,
+        )
+        invalidate_lesson_navigation(user_lesson.user_subject_id)
+
+    return user_lesson, True
+
+
+# Recompute from scratch (repair)
+# ----------------------------------------------------------------------------------------------------------------------
+# UserLesson жолдарынан барлық есептегіштерді қайта құрастыру
+def recompute_progress(user_subjects):
+    with transaction.atomic():
+        user_subjects = list(user_subjects.select_for_update())
+        user_subject_ids = [us.pk for us in user_subjects]
+        if not user_subject_ids:
+            return 0
+
+        lesson_stats = {
+            (row['user_subject_id'], row['lesson__chapter_id']): row
+            for row in (
+                UserLesson.objects
+                .filter(user_subject_id__in=user_subject_ids)
+                .values('user_subject_id', 'lesson__chapter_id')
+                .annotate(
+                    total=Count('pk'),
+                    completed=Count('pk', filter=Q(is_completed=True)),
+                    rating_total=Sum('rating'),
+                )
+                .order_by()
+            )
+        }
+
+        stats_by_subject = {}
+        for (user_subject_id, __), stats in lesson_stats.items():
+            stats_by_subject.setdefault(user_subject_id, []).append(stats)
+
+        user_chapters = list(UserChapter.objects.select_for_update().filter(user_subject_id__in=user_subject_ids))
+        chapters_by_subject = {}
+        for user_chapter in user_chapters:
+            stats = lesson_stats.get((user_chapter.user_subject_id, user_chapter.chapter_id), {})
+            user_chapter.lesson_count = stats.get('total', 0)
+            user_chapter.completed_lesson_count = stats.get('completed', 0)
+            user_chapter.rating_total = stats.get('rating_total') or 0
+            _refresh_chapter(user_chapter)
+            chapters_by_subject.setdefault(user_chapter.user_subject_id, []).append(user_chapter)
+
+        UserChapter.objects.bulk_update(user_chapters, CHAPTER_PROGRESS_FIELDS, batch_size=500)
+
+        for user_subject in user_subjects:
+            subject_chapters = chapters_by_subject.get(user_subject.pk, [])
+            subject_stats = stats_by_subject.get(user_subject.pk, [])
+            user_subject.chapter_count = len(subject_chapters)
+            user_subject.lesson_count = sum(stats['total'] for stats in subject_stats)
+            user_subject.completed_lesson_count = sum(stats['completed'] for stats in subject_stats)
+            user_subject.rating_total = sum(uc.rating for uc in subject_chapters)
+            _refresh_subject(user_subject)
+
+        UserSubject.objects.bulk_update(user_subjects, SUBJECT_PROGRESS_FIELDS, batch_size=500)
+        rebuild_reports(user_subject_ids)
+        invalidate_lesson_navigation(*user_subject_ids)
+        invalidate_heatmap(*{us.subject_id for us in user_subjects})
+
+    return len(user_subjects)
+
+
+# Пәннің барлық білім алушылары үшін (бөлім/сабақ өшірілгенде, фондық тапсырма ретінде де шақырылады)
+def recompute_subject_progress(subject_id):
+    return recompute_progress(UserSubject.objects.filter(subject_id=subject_id))
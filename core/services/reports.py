@@ -0,0 +1,193 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from core.models import UserSubject, UserChapter, UserLesson, SubjectStats, StudentSubjectStats, ClassSubjectStats
+from core.services.leaderboards import invalidate_leaderboards
+
+
+STATS_FIELDS = (
+    'student_count', 'subject_rating_total', 'subject_percentage_total',
+    'chapter_count', 'chapter_rating_total', 'chapter_percentage_total',
+    'lesson_count', 'lesson_rating_total', 'lesson_percentage_total',
+)
+BATCH_SIZE = 500
+
+
+# Incremental updates
+# ----------------------------------------------------------------------------------------------------------------------
+# Бағалардың өзгерісін үш есеп жолына F() арқылы қосу (оқу жоқ, тек UPDATE).
+# Білім алушының жолы әлі құрылмаған болса, оны толық қайта есептейміз
+def apply_stats_delta(user_subject, user_class, **deltas):
+    deltas = {field: F(field) + value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        if not StudentSubjectStats.objects.filter(user_subject_id=user_subject.pk).update(**deltas):
+            rebuild_reports([user_subject.pk])
+            return
+
+        SubjectStats.objects.filter(subject_id=user_subject.subject_id).update(**deltas)
+        ClassSubjectStats.objects.filter(subject_id=user_subject.subject_id, user_class=user_class).update(**deltas)
+
+        # Рейтинг тек пән бағасы/пайызы өзгерсе ғана ескіреді
+        if 'subject_rating_total' in deltas or 'subject_percentage_total' in deltas:
+            invalidate_leaderboards([user_subject.subject_id], user_class)
+
+
+# Student rows
+# ----------------------------------------------------------------------------------------------------------------------
+def _grouped_totals(queryset):
+    return {
+        row['user_subject_id']: row
+        for row in (
+            queryset
+            .values('user_subject_id')
+            .annotate(count=Count('pk'), rating_total=Sum('rating'), percentage_total=Sum('percentage'))
+            .order_by()
+        )
+    }
+
+
+def _add_delta(deltas, key, new, old):
+    totals = deltas.setdefault(key, dict.fromkeys(STATS_FIELDS, 0))
+    for field in STATS_FIELDS:
+        totals[field] += new[field] - old[field]
+
+
+# Пән және топ жолдарына айырмаларды F() арқылы қосу. Жоқ жолдар алдымен бос күйінде қосылады
+def _apply_group_deltas(subject_deltas, class_deltas):
+    SubjectStats.objects.bulk_create(
+        [SubjectStats(subject_id=subject_id) for subject_id in subject_deltas], ignore_conflicts=True,
+    )
+    ClassSubjectStats.objects.bulk_create(
+        [ClassSubjectStats(subject_id=subject_id, user_class=user_class) for subject_id, user_class in class_deltas],
+        ignore_conflicts=True,
+    )
+
+    for subject_id, deltas in subject_deltas.items():
+        increments = {field: F(field) + value for field, value in deltas.items() if value}
+        if increments:
+            SubjectStats.objects.filter(subject_id=subject_id).update(**increments)
+    for (subject_id, user_class), deltas in class_deltas.items():
+        increments = {field: F(field) + value for field, value in deltas.items() if value}
+        if increments:
+            ClassSubjectStats.objects.filter(subject_id=subject_id, user_class=user_class).update(**increments)
+
+
+# Берілген UserSubject-тердің жолдарын қайта есептеп, пән/топ жиынтықтарына тек олардың айырмасын қосу.
+# Құны пәндегі білім алушылар санына тәуелді емес (жазылу кезінде бір жол). Білім алушының топ
+# ауысқаны да осы жерде ескеріледі: ескі топтан алынып, жаңасына қосылады
+def rebuild_reports(user_subject_ids, update_groups=True):
+    user_subject_ids = list(user_subject_ids)
+
+    with transaction.atomic():
+        chapter_totals = _grouped_totals(UserChapter.objects.filter(user_subject_id__in=user_subject_ids))
+        lesson_totals = _grouped_totals(UserLesson.objects.filter(user_subject_id__in=user_subject_ids))
+
+        values = {}
+        for user_subject in UserSubject.objects.filter(pk__in=user_subject_ids).values(
+            'pk', 'user_id', 'user__user_class', 'subject_id', 'rating', 'percentage'
+        ):
+            chapters = chapter_totals.get(user_subject['pk'], {})
+            lessons = lesson_totals.get(user_subject['pk'], {})
+            values[user_subject['pk']] = {
+                'user_id': user_subject['user_id'],
+                'user_class': user_subject['user__user_class'],
+                'subject_id': user_subject['subject_id'],
+                'student_count': 1,
+                'subject_rating_total': user_subject['rating'],
+                'subject_percentage_total': user_subject['percentage'],
+                'chapter_count': chapters.get('count', 0),
+                'chapter_rating_total': chapters.get('rating_total') or 0,
+                'chapter_percentage_total': chapters.get('percentage_total') or 0,
+                'lesson_count': lessons.get('count', 0),
+                'lesson_rating_total': lessons.get('rating_total') or 0,
+                'lesson_percentage_total': lessons.get('percentage_total') or 0,
+            }
+
+        # Жаңа жолдар бос (student_count=0) қосылады, сосын барлығы құлыпталады:
+        # бір жолды қатар есептейтін сұраныстар айырманы кезекпен қосады
+        StudentSubjectStats.objects.bulk_create(
+            [
+                StudentSubjectStats(
+                    user_subject_id=pk, user_id=row['user_id'], user_class=row['user_class'], subject_id=row['subject_id'],
+                )
+                for pk, row in values.items()
+            ],
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        rows = list(StudentSubjectStats.objects.select_for_update().filter(user_subject_id__in=values))
+
+        subject_deltas, class_deltas = {}, {}
+        empty = dict.fromkeys(STATS_FIELDS, 0)
+        now = timezone.now()
+        for row in rows:
+            new = values[row.user_subject_id]
+            old = {field: getattr(row, field) for field in STATS_FIELDS}
+            _add_delta(subject_deltas, row.subject_id, new, old)
+            if row.user_class == new['user_class']:
+                _add_delta(class_deltas, (row.subject_id, row.user_class), new, old)
+            else:
+                _add_delta(class_deltas, (row.subject_id, row.user_class), empty, old)
+                _add_delta(class_deltas, (row.subject_id, new['user_class']), new, empty)
+
+            for field in STATS_FIELDS:
+                setattr(row, field, new[field])
+            row.user_class = new['user_class']
+            row.updated_at = now
+
+        StudentSubjectStats.objects.bulk_update(rows, STATS_FIELDS + ('user_class', 'updated_at'), batch_size=BATCH_SIZE)
+
+        if update_groups:
+            _apply_group_deltas(subject_deltas, class_deltas)
+            invalidate_leaderboards(list(subject_deltas))
+
+    return len(rows)
+
+
+# UserSubject өшірілер алдында (pre_delete) шақырылады: білім алушының үлесі пән/топ жиынтықтарынан алынады.
+# Білім алушы жолының өзі CASCADE арқылы өшеді
+def remove_reports(user_subject_ids):
+    with transaction.atomic():
+        rows = list(StudentSubjectStats.objects.select_for_update().filter(user_subject_id__in=list(user_subject_ids)))
+
+        subject_deltas, class_deltas = {}, {}
+        empty = dict.fromkeys(STATS_FIELDS, 0)
+        for row in rows:
+            old = {field: getattr(row, field) for field in STATS_FIELDS}
+            _add_delta(subject_deltas, row.subject_id, empty, old)
+            _add_delta(class_deltas, (row.subject_id, row.user_class), empty, old)
+
+        _apply_group_deltas(subject_deltas, class_deltas)
+        invalidate_leaderboards(list(subject_deltas))
+
+
+# Repair
+# ----------------------------------------------------------------------------------------------------------------------
+# Пән және топ жолдарын білім алушы жолдарынан толық қайта жинау (тек жөндеу үшін: manage.py rebuild_reports).
+# Жолдар өшірілмейді: құлыпталып, нөлге түсіріліп, upsert арқылы жазылады, сондықтан қатар келген
+# F() айырмасы өшірілген жолға түсіп жоғалмайды
+def rebuild_group_reports(subject_ids):
+    subject_ids = list(subject_ids)
+    sums = {field: Sum(field) for field in STATS_FIELDS}
+    empty = dict.fromkeys(STATS_FIELDS, 0)
+
+    with transaction.atomic():
+        # UPDATE жолдарды commit-ке дейін құлыптайды: қатар келген F() айырмасы осы транзакциядан кейін қосылады
+        SubjectStats.objects.filter(subject_id__in=subject_ids).update(**empty)
+        ClassSubjectStats.objects.filter(subject_id__in=subject_ids).update(**empty)
+
+        student_stats = StudentSubjectStats.objects.filter(subject_id__in=subject_ids)
+        SubjectStats.objects.bulk_create(
+            [SubjectStats(**row) for row in student_stats.values('subject_id').annotate(**sums).order_by()],
+            batch_size=BATCH_SIZE,
+            update_conflicts=True, unique_fields=['subject'], update_fields=STATS_FIELDS + ('updated_at',),
+        )
+        ClassSubjectStats.objects.bulk_create(
+            [ClassSubjectStats(**row) for row in student_stats.values('subject_id', 'user_class').annotate(**sums).order_by()],
+            batch_size=BATCH_SIZE,
+            update_conflicts=True, unique_fields=['user_class', 'subject'], update_fields=STATS_FIELDS + ('updated_at',),
+        )
+
+    invalidate_leaderboards(subject_ids)
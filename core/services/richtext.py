@@ -0,0 +1,169 @@
+import re
+from urllib.parse import urlsplit
+
+from bleach.html5lib_shim import Filter, convert_entities
+from bleach.sanitizer import Cleaner
+from core.models import Subject, Lesson, Task, Written, TextGap, Question, Option, MatchingColumn, MatchingItem, \
+    TableColumn, TableRow
+
+
+BATCH_SIZE = 500
+
+# Summernote өрісі -> "<өріс>_html" серігі. Серік сақтау кезінде бір рет тазаланып есептеледі,
+# шаблондар тек соны шығарады (бетті әр ашқанда bleach қайта жүрмейді)
+RICHTEXT_FIELDS = {
+    Subject: ('description',),
+    Lesson: ('description',),
+    Task: ('description',),
+    Written: ('instruction',),
+    TextGap: ('prompt',),
+    Question: ('text',),
+    Option: ('text',),
+    MatchingColumn: ('label',),
+    MatchingItem: ('text',),
+    TableColumn: ('label',),
+    TableRow: ('label',),
+}
+
+
+def html_field(field):
+    return f'{field}_html'
+
+
+# Sanitization policy
+# ----------------------------------------------------------------------------------------------------------------------
+# Саясат өзгерсе: manage.py rebuild_richtext
+ALLOWED_TAGS = {
+    'p', 'br', 'div', 'span', 'hr', 'pre', 'blockquote', 'code',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'b', 'strong', 'i', 'em', 'u', 's', 'strike', 'sub', 'sup', 'font',
+    'ul', 'ol', 'li', 'a', 'img', 'iframe',
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'colgroup', 'col',
+}
+ALLOWED_PROTOCOLS = {'http', 'https', 'mailto', 'data'}
+# data: тек растрлық base64 сурет үшін (<img src>): extract_inline_images оларды файлға шығарғанша
+# сурет беттен жоғалмайды. SVG және басқа data: мәндері (сілтемелерде де) алынып тасталады
+INLINE_IMAGE_SRC_RE = re.compile(r'^data:image/(png|jpe?g|gif|webp);base64,[a-z0-9+/=]+$')
+# bleach протоколды тексерер алдында URI-ден алып тастайтын таңбалар (sanitize_uri_value)
+URI_NOISE_RE = re.compile(r'[`\000-\040\177-\240\s]+')
+# Тек осы хосттардан ендірілген видео (Summernote-тың "Видео" батырмасы)
+EMBED_HOSTS = {'www.youtube.com', 'youtube.com', 'www.youtube-nocookie.com', 'player.vimeo.com'}
+
+# Сақталатын CSS қасиеттері (Summernote туралау, түс, сурет өлшемі үшін қолданады)
+STYLE_PROPERTIES = {
+    'text-align', 'vertical-align', 'color', 'background-color', 'font-weight', 'font-style', 'font-size',
+    'text-decoration', 'line-height', 'width', 'height', 'max-width', 'float', 'margin', 'margin-left',
+    'margin-right', 'padding', 'border', 'border-collapse',
+}
+STYLE_VALUE_RE = re.compile(r'^[#\w\s.,%()-]+$')
+STYLE_FORBIDDEN_RE = re.compile(r'url\s*\(|expression\s*\(|\\|/\*', re.IGNORECASE)
+# strip=True тегті алады, бірақ ішіндегі мәтінді қалдырады: скрипт пен стиль мазмұны бетте көрінбеуі үшін
+# алдын ала өшіріледі (қауіпсіздікке bleach жауап береді, бұл тек көрініс үшін)
+HIDDEN_CONTENT_RE = re.compile(r'<(script|style)\b.*?(</\1\s*>|$)', re.IGNORECASE | re.DOTALL)
+
+ATTRIBUTES = {
+    'a': {'href', 'title', 'target'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'iframe': {'src', 'width', 'height', 'frameborder', 'allowfullscreen'},
+    'font': {'color'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+    'col': {'span'},
+}
+
+
+# bleach-тің css_sanitizer интерфейсі (tinycss2 орнына): рұқсат етілген қасиеттердің қауіпсіз мәндері ғана қалады
+class StyleSanitizer:
+    def sanitize_css(self, style):
+        declarations = []
+        for declaration in style.split(';'):
+            name, _, value = declaration.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name in STYLE_PROPERTIES and STYLE_VALUE_RE.match(value) and not STYLE_FORBIDDEN_RE.search(value):
+                declarations.append(f'{name}: {value}')
+        return '; '.join(declarations)
+
+
+def _data_uri_allowed(tag, name, value):
+    normalized = URI_NOISE_RE.sub('', convert_entities(value)).replace('\ufffd', '').lower()
+    if not normalized.startswith('data:'):
+        return True
+    return tag == 'img' and name == 'src' and INLINE_IMAGE_SRC_RE.match(normalized) is not None
+
+
+def _allowed_attribute(tag, name, value):
+    if name == 'style':
+        return True
+    if name in ('href', 'src') and not _data_uri_allowed(tag, name, value):
+        return False
+    if tag == 'iframe' and name == 'src':
+        return urlsplit(value).scheme == 'https' and urlsplit(value).hostname in EMBED_HOSTS
+    return name in ATTRIBUTES.get(tag, ())
+
+
+# Тазаланған ағынды өңдеу: суреттер мен видеолар жалқау жүктеледі, жаңа бетте ашылатын сілтемелер
+# бастапқы бетке қол жеткізе алмайды. Бірде-бір CSS ережесі қалмаса, бос style="" алынып тасталады
+class PostProcessFilter(Filter):
+    def __iter__(self):
+        for token in super().__iter__():
+            if token['type'] in ('StartTag', 'EmptyTag'):
+                attrs = token['data']
+                if attrs.get((None, 'style')) == '':
+                    del attrs[(None, 'style')]
+                if token['name'] in ('img', 'iframe'):
+                    attrs[(None, 'loading')] = 'lazy'
+                if token['name'] == 'img':
+                    attrs[(None, 'decoding')] = 'async'
+                if token['name'] == 'a' and attrs.get((None, 'target')) == '_blank':
+                    attrs[(None, 'rel')] = 'noopener noreferrer'
+            yield token
+
+
+cleaner = Cleaner(
+    tags=ALLOWED_TAGS,
+    attributes=_allowed_attribute,
+    protocols=ALLOWED_PROTOCOLS,
+    strip=True,
+    strip_comments=True,
+    filters=[PostProcessFilter],
+    css_sanitizer=StyleSanitizer(),
+)
+
+
+def render_html(value):
+    if not value:
+        return ''
+    return cleaner.clean(HIDDEN_CONTENT_RE.sub('', value))
+
+
+# Rendering
+# ----------------------------------------------------------------------------------------------------------------------
+# Серік өрістерді орнында есептейді; өзгергендерінің атауларын қайтарады
+def render_instance_html(instance, fields):
+    changed = []
+    for field in fields:
+        html = render_html(getattr(instance, field))
+        if html != getattr(instance, html_field(field)):
+            setattr(instance, html_field(field), html)
+            changed.append(html_field(field))
+    return changed
+
+
+# Бар жолдарды pk бойынша топтап қайта есептейді (bulk_update, сигналсыз). Өзгерген жол саны қайтарылады
+def rebuild_model_html(model, batch_size=BATCH_SIZE):
+    fields = RICHTEXT_FIELDS[model]
+    html_fields = [html_field(field) for field in fields]
+    queryset = model.objects.only('pk', *fields, *html_fields).order_by('pk')
+
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return total
+
+        changed = [instance for instance in batch if render_instance_html(instance, fields)]
+        if changed:
+            model.objects.bulk_update(changed, html_fields)
+        total += len(changed)
+        last_pk = batch[-1].pk
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.db.models import Sum
+from core.models import Chapter, Lesson
+
+
+SYLLABUS_TIMEOUT = 60 * 60 * 24
+
+
+# Кілтте Subject.content_version бар: мазмұн өзгерсе (core.signals.subjects), ескі ағаш өздігінен ескіреді
+def syllabus_cache_key(subject):
+    return f'syllabus:{subject.pk}:{subject.content_version}'
+
+
+# Пәннің оқу бағдарламасы: бөлімдер, сабақтар, ұзақтықтар және сандар (екі сұраныс)
+def build_syllabus(subject):
+    chapters = [
+        {'chapter': {'id': row['pk'], 'name': row['name'], 'order': row['order']}, 'lessons': [], 'duration': 0}
+        for row in Chapter.objects.filter(subject=subject).order_by('order', 'pk').values('pk', 'name', 'order')
+    ]
+    chapters_by_id = {item['chapter']['id']: item for item in chapters}
+
+    lessons = (
+        Lesson.objects
+        .filter(chapter__subject=subject)
+        .values('pk', 'title', 'order', 'chapter_id')
+        .annotate(duration=Sum('tasks__duration'))
+        .order_by('order', 'pk')
+    )
+    for row in lessons:
+        duration = row['duration'] or 0
+        item = chapters_by_id[row['chapter_id']]
+        item['lessons'].append({'lesson': {'id': row['pk'], 'title': row['title'], 'order': row['order']}, 'duration': duration})
+        item['duration'] += duration
+
+    return {
+        'chapters': chapters,
+        'chapter_count': len(chapters),
+        'lesson_count': sum(len(item['lessons']) for item in chapters),
+        'duration': sum(item['duration'] for item in chapters),
+    }
+
+
+def get_syllabus(subject):
+    key = syllabus_cache_key(subject)
+    syllabus = cache.get(key)
+    if syllabus is None:
+        syllabus = build_syllabus(subject)
+        cache.set(key, syllabus, SYLLABUS_TIMEOUT)
+    return syllabus
@@ -0,0 +1,181 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from core.models import UserVideo
+
+
+FLUSH_INTERVAL = 60
+BUFFER_TIMEOUT = 60 * 60 * 24
+OWNER_TIMEOUT = 60 * 60
+BATCH_SIZE = 500
+
+# Буферге тіркелу уақыт бойынша бөлінеді: әр минуттың өз санағышы мен ұяшықтары бар. Flush жабылған
+# минуттарды оқиды, курсор да минут нөмірі, сондықтан бір кілт кэштен ығыстырылса, тек сол минут зардап шегеді
+BUCKET_SECONDS = FLUSH_INTERVAL
+MAX_BUCKETS = BUFFER_TIMEOUT // BUCKET_SECONDS
+
+FLUSHED_KEY = 'video-progress:flushed-bucket'
+FLUSH_LOCK_KEY = 'video-progress:flush-lock'
+FLUSH_INTERVAL_KEY = 'video-progress:flush-interval'
+
+# Процесс ішіндегі кэштер: бір gunicorn жұмысшысындағы буфер басқа жұмысшыларға және
+# flush_video_progress командасына көрінбейді, сондықтан олармен heartbeat бірден базаға жазылады
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def buffering_enabled():
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def _bucket():
+    return int(time.time() // BUCKET_SECONDS)
+
+
+def _value_key(user_video_id):
+    return f'video-progress:{user_video_id}'
+
+
+def _count_key(bucket):
+    return f'video-progress:bucket:{bucket}'
+
+
+def _slot_key(bucket, slot):
+    return f'video-progress:bucket:{bucket}:{slot}'
+
+
+def _owner_key(user_video_id):
+    return f'video-owner:{user_video_id}'
+
+
+# Ownership
+# ----------------------------------------------------------------------------------------------------------------------
+# Қолданушыға тиесілі UserVideo id-лері: кэште жоқтары ғана бір сұраныспен тексеріледі
+def owned_user_video_ids(user, user_video_ids):
+    owners = cache.get_many([_owner_key(pk) for pk in user_video_ids])
+    owned = {pk for pk in user_video_ids if owners.get(_owner_key(pk)) == user.pk}
+
+    unknown = [pk for pk in user_video_ids if _owner_key(pk) not in owners]
+    if unknown:
+        found = set(
+            UserVideo.objects
+            .filter(pk__in=unknown, user_task__user_lesson__user=user)
+            .values_list('pk', flat=True)
+        )
+        cache.set_many({_owner_key(pk): user.pk for pk in found}, OWNER_TIMEOUT)
+        owned |= found
+
+    return owned
+
+
+# Buffer
+# ----------------------------------------------------------------------------------------------------------------------
+# Id ағымдағы минуттың келесі ұяшығына тіркеледі
+def _register(user_video_id):
+    bucket = _bucket()
+    count_key = _count_key(bucket)
+    cache.add(count_key, 0, BUFFER_TIMEOUT)
+    try:
+        slot = cache.incr(count_key)
+    except ValueError:
+        # add пен incr арасында ығыстырылды
+        cache.set(count_key, 1, BUFFER_TIMEOUT)
+        slot = 1
+    cache.set(_slot_key(bucket, slot), user_video_id, BUFFER_TIMEOUT)
+
+
+# Heartbeat мәнін кэшке жазу (тек үлкен мән сақталады).
+# Id буферге түскенде (алғаш немесе flush-тан кейін) ғана тіркеледі
+def buffer_watched_seconds(progress):
+    for user_video_id, seconds in progress.items():
+        key = _value_key(user_video_id)
+        if cache.add(key, seconds, BUFFER_TIMEOUT):
+            _register(user_video_id)
+            continue
+
+        current = cache.get(key)
+        cache.set(key, max(current or 0, seconds), BUFFER_TIMEOUT)
+        if current is None:
+            # Мән осы арада flush-қа түсіп кетті: қайта тіркелмесе, келесі flush оны көрмейді
+            _register(user_video_id)
+
+
+def pop_buffered_seconds(user_video_ids):
+    keys = {_value_key(pk): pk for pk in user_video_ids}
+    values = cache.get_many(keys)
+    cache.delete_many(values)
+    return {keys[key]: seconds for key, seconds in values.items()}
+
+
+def flush_due():
+    # FLUSH_INTERVAL ішінде тек бірінші шақыру True қайтарады
+    return cache.add(FLUSH_INTERVAL_KEY, 1, FLUSH_INTERVAL)
+
+
+# Flush
+# ----------------------------------------------------------------------------------------------------------------------
+def write_watched_seconds(progress, completed_ids=()):
+    completed_ids = set(completed_ids)
+    user_videos = list(
+        UserVideo.objects
+        .filter(pk__in=set(progress) | completed_ids)
+        .only('pk', 'watched_seconds', 'is_completed')
+    )
+
+    changed = []
+    for user_video in user_videos:
+        seconds = max(user_video.watched_seconds, progress.get(user_video.pk, 0))
+        is_completed = user_video.is_completed or user_video.pk in completed_ids
+        if seconds != user_video.watched_seconds or is_completed != user_video.is_completed:
+            user_video.watched_seconds, user_video.is_completed = seconds, is_completed
+            changed.append(user_video)
+
+    UserVideo.objects.bulk_update(changed, ['watched_seconds', 'is_completed'], batch_size=BATCH_SIZE)
+    return len(changed)
+
+
+# Heartbeat: ортақ кэш болса буферге, әйтпесе бірден базаға. Аяқталған видео бірден жазылады
+def record_heartbeat(progress, completed_ids=()):
+    if not buffering_enabled():
+        if progress or completed_ids:
+            write_watched_seconds(progress, completed_ids)
+        return
+
+    buffer_watched_seconds(progress)
+    if completed_ids:
+        write_watched_seconds(pop_buffered_seconds(completed_ids), completed_ids=completed_ids)
+
+    if flush_due():
+        flush_video_progress()
+
+
+# Жабылған минуттарда жиналған барлық мәндерді бір бума жазумен базаға түсіру.
+# Курсор жоқ болса (ығыстырылған), буфердің бүкіл сақталу мерзімі қаралады
+def flush_video_progress():
+    if not buffering_enabled() or not cache.add(FLUSH_LOCK_KEY, 1, FLUSH_INTERVAL):
+        return 0
+
+    try:
+        current = _bucket()
+        buckets = range(max(cache.get(FLUSHED_KEY, 0) + 1, current - MAX_BUCKETS), current)
+        if not buckets:
+            return 0
+
+        counts = cache.get_many([_count_key(bucket) for bucket in buckets])
+        slot_keys = [
+            _slot_key(bucket, slot)
+            for bucket in buckets
+            for slot in range(1, counts.get(_count_key(bucket), 0) + 1)
+        ]
+        user_video_ids = set(cache.get_many(slot_keys).values()) if slot_keys else set()
+        progress = pop_buffered_seconds(user_video_ids)
+
+        written = write_watched_seconds(progress) if progress else 0
+        cache.delete_many([*counts, *slot_keys])
+        cache.set(FLUSHED_KEY, current - 1, None)
+        return written
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
@@ -0,0 +1,38 @@
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from core.services.inline_images import INLINE_IMAGE_FIELDS, extract_instance_images
+from core.services.richtext import RICHTEXT_FIELDS, render_instance_html
+
+
+def _saved_fields(fields, update_fields):
+    if update_fields is None:
+        return fields
+    return [field for field in fields if field in update_fields]
+
+
+# Inline images
+# ----------------------------------------------------------------------------------------------------------------------
+# Summernote base64 күйінде енгізген суреттер сақталмай тұрып медиа файлдарға шығарылады.
+# update_fields берілсе, тек сол өрістер қаралады
+def extract_inline_images_on_save(sender, instance, update_fields=None, **kwargs):
+    extract_instance_images(instance, _saved_fields(INLINE_IMAGE_FIELDS[sender], update_fields))
+
+
+for model in INLINE_IMAGE_FIELDS:
+    receiver(pre_save, sender=model, dispatch_uid=f'inline_images_save_{model.__name__}')(extract_inline_images_on_save)
+
+
+# Rich text
+# ----------------------------------------------------------------------------------------------------------------------
+# Тазаланған HTML серігі суреттер шығарылғаннан кейін есептеледі (receiver-лер тіркелу ретімен шақырылады).
+# update_fields ішінде серік жоқ болса, ол бөлек UPDATE-пен жазылады
+def render_richtext_on_save(sender, instance, update_fields=None, **kwargs):
+    changed = render_instance_html(instance, _saved_fields(RICHTEXT_FIELDS[sender], update_fields))
+    if update_fields is not None and instance.pk:
+        missing = {field: getattr(instance, field) for field in changed if field not in update_fields}
+        if missing:
+            sender.objects.filter(pk=instance.pk).update(**missing)
+
+
+for model in RICHTEXT_FIELDS:
+    receiver(pre_save, sender=model, dispatch_uid=f'richtext_save_{model.__name__}')(render_richtext_on_save)
@@ -1,28 +1,89 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, pre_delete, post_save, post_delete
 from django.dispatch import receiver
-from core.models import Lesson, UserSubject, UserChapter, UserLesson
+from core.models import User, Subject, Chapter, Lesson, Task, UserSubject
+from core.services.heatmap import invalidate_heatmap
+from core.services.jobs import dispatch
+from core.services.reports import rebuild_reports, remove_reports
+from core.utils.tracking import NOT_LOADED, track_fields, loaded_value
 
 
+# Тарату commit-тен кейін орындалады (немесе BACKGROUND_JOBS арқылы фондық жұмысшыға беріледі),
+# сондықтан админкада сабақ сақтау жазылған білім алушылар санына тәуелді емес
 @receiver(post_save, sender=Lesson)
 def create_user_lessons_on_new_lesson(sender, instance, created, **kwargs):
-    if not created:
+    if created:
+        dispatch('fan_out_lesson', lesson_id=instance.pk)
+
+
+# Lesson.subject міндетті емес, сондықтан пән бөлім арқылы анықталады. Бөлім каскадпен өшсе де,
+# сабақтар одан бұрын өшетіндіктен бөлім жолы бұл сәтте әлі бар. Бір транзакцияда көп сабақ өшсе,
+# қайта есептеу пәнге бір рет орындалады (dispatch)
+@receiver(post_delete, sender=Lesson)
+def recompute_progress_on_lesson_delete(sender, instance, **kwargs):
+    subject_id = Chapter.objects.filter(pk=instance.chapter_id).values_list('subject_id', flat=True).first()
+    if subject_id is not None:
+        dispatch('recompute_subject_progress', unique=True, subject_id=subject_id)
+
+
+# Сабағы жоқ бөлім өшсе де, chapter_count пен бөлімге байланған баға өзгереді
+@receiver(post_delete, sender=Chapter)
+def recompute_progress_on_chapter_delete(sender, instance, **kwargs):
+    dispatch('recompute_subject_progress', unique=True, subject_id=instance.subject_id)
+
+
+# Content versions
+# ----------------------------------------------------------------------------------------------------------------------
+# Бөлім/сабақ/тапсырма өзгерсе, пәннің мазмұн нұсқасы артады: сабақ мәзірінің кэші ескіреді
+CONTENT_VERSION_LOOKUPS = {
+    Chapter: lambda instance: {'pk': instance.subject_id},
+    Lesson: lambda instance: {'chapters__pk': instance.chapter_id},
+    Task: lambda instance: {'chapters__lessons__pk': instance.lesson_id},
+}
+
+
+def bump_content_version(sender, instance, **kwargs):
+    lookup = CONTENT_VERSION_LOOKUPS[sender](instance)
+    Subject.objects.filter(**lookup).update(content_version=F('content_version') + 1)
+
+
+for model in CONTENT_VERSION_LOOKUPS:
+    receiver(post_save, sender=model, dispatch_uid=f'content_version_save_{model.__name__}')(bump_content_version)
+    receiver(post_delete, sender=model, dispatch_uid=f'content_version_delete_{model.__name__}')(bump_content_version)
+
+
+# Reports
+# ----------------------------------------------------------------------------------------------------------------------
+# Білім алушының үлесі пән/топ жиынтықтарынан алынады (жолы әлі бар кезде), жолдың өзі CASCADE арқылы өшеді
+@receiver(pre_delete, sender=UserSubject)
+def remove_reports_on_user_subject_delete(sender, instance, **kwargs):
+    remove_reports([instance.pk])
+    invalidate_heatmap(instance.subject_id)
+
+
+# Топ ауысса, есеп жолдарындағы user_class көшірмесі мен топ жиынтықтары жаңарады.
+# Ескі мән жүктелген кезде жадта сақталады (core.utils.tracking), сондықтан сақтау қосымша сұраныссыз
+track_fields(User, 'user_class')
+
+
+@receiver(pre_save, sender=User)
+def sync_user_class_in_reports(sender, instance, update_fields=None, **kwargs):
+    if not instance.pk or (update_fields is not None and 'user_class' not in update_fields):
         return
 
-    lesson = instance
-    subject = lesson.subject
-    chapter = lesson.chapter
+    old_class = loaded_value(instance, 'user_class')
+    if old_class is NOT_LOADED:
+        old_class = User.objects.filter(pk=instance.pk).values_list('user_class', flat=True).first()
+    if old_class is None or old_class == instance.user_class:
+        return
 
-    user_subjects = UserSubject.objects.filter(subject=subject)
+    user_id = instance.pk
 
-    for user_subject in user_subjects:
-        user_chapter, _ = UserChapter.objects.get_or_create(
-            user=user_subject.user,
-            user_subject=user_subject,
-            chapter=chapter
-        )
+    # Білім алушының жолдары қайта есептеледі: үлесі ескі топтан жаңасына ауысады
+    def sync():
+        user_subjects = list(UserSubject.objects.filter(user_id=user_id).values_list('pk', 'subject_id'))
+        rebuild_reports([pk for pk, __ in user_subjects])
+        invalidate_heatmap(*{subject_id for __, subject_id in user_subjects})
 
-        UserLesson.objects.get_or_create(
-            user=user_subject.user,
-            user_subject=user_subject,
-            lesson=lesson
-        )
+    transaction.on_commit(sync)
@@ -0,0 +1,57 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.models import Lesson, Task, Video, Written, Question, Option, TextGap, MatchingColumn, MatchingItem, TableRow, \
+    TableColumn, TableCell
+from core.services.jobs import dispatch
+
+
+# Answer key versions
+# ----------------------------------------------------------------------------------------------------------------------
+# Дұрыс жауаптарға әсер ететін кез келген өзгеріс тапсырманың жауап кілтін ескіртеді
+ANSWER_KEY_LOOKUPS = {
+    Question: lambda instance: {'pk': instance.task_id},
+    Option: lambda instance: {'questions__pk': instance.question_id},
+    TextGap: lambda instance: {'pk': instance.task_id},
+    MatchingColumn: lambda instance: {'pk': instance.task_id},
+    MatchingItem: lambda instance: {'columns__pk': instance.correct_column_id},
+    TableRow: lambda instance: {'pk': instance.task_id},
+    TableColumn: lambda instance: {'pk': instance.task_id},
+    TableCell: lambda instance: {'table_rows__pk': instance.row_id},
+}
+
+
+def bump_answer_key_version(sender, instance, **kwargs):
+    lookup = ANSWER_KEY_LOOKUPS[sender](instance)
+    Task.objects.filter(**lookup).update(answer_key_version=F('answer_key_version') + 1)
+
+
+for model in ANSWER_KEY_LOOKUPS:
+    receiver(post_save, sender=model, dispatch_uid=f'answer_key_save_{model.__name__}')(bump_answer_key_version)
+    receiver(post_delete, sender=model, dispatch_uid=f'answer_key_delete_{model.__name__}')(bump_answer_key_version)
+
+
+# Content backfill
+# ----------------------------------------------------------------------------------------------------------------------
+# Басталған сабаққа жаңа тапсырма/сұрақ/элемент қосылса, жетіспейтін жауап жолдары commit-тен кейін
+# (немесе фондық жұмысшыда) толықтырылады. Кесте жаңа жол қажет етпейді: жауап бітмапта сақталады
+CONTENT_SYNC_LOOKUPS = {
+    Task: lambda instance: {'pk': instance.lesson_id},
+    Video: lambda instance: {'tasks__pk': instance.task_id},
+    Written: lambda instance: {'tasks__pk': instance.task_id},
+    TextGap: lambda instance: {'tasks__pk': instance.task_id},
+    Question: lambda instance: {'tasks__pk': instance.task_id},
+    MatchingItem: lambda instance: {'tasks__columns__pk': instance.correct_column_id},
+}
+
+
+def sync_lesson_content_on_save(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    for lesson_id in Lesson.objects.filter(**CONTENT_SYNC_LOOKUPS[sender](instance)).values_list('pk', flat=True):
+        dispatch('sync_lesson_content', unique=True, lesson_id=lesson_id)
+
+
+for model in CONTENT_SYNC_LOOKUPS:
+    receiver(post_save, sender=model, dispatch_uid=f'content_sync_save_{model.__name__}')(sync_lesson_content_on_save)
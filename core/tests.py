@@ -0,0 +1,916 @@
+import base64
+import hashlib
+import importlib
+import io
+import os
+import shutil
+import tempfile
+from itertools import product
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from apps.dashboard.student.services.subject import handle_table
+from core.models import User, Subject, Chapter, Lesson, Question, UserSubject, UserChapter, UserLesson, BackgroundJob, \
+    SubjectStats, ClassSubjectStats, Task, TableRow, TableColumn, TableCell, UserTask, UserTableAnswer, Option, \
+    TextGap, MatchingColumn, MatchingItem, Video, Written, UserVideo, UserWritten, UserTextGap, UserAnswer, \
+    UserMatchingAnswer
+from core.services.answer_keys import get_answer_key, unpack_table_cells
+from core.services.inline_images import INLINE_DIR, extract_inline_images
+from core.services import video_progress
+from core.services.navigation import get_lesson_navigation
+from core.services.syllabus import get_syllabus
+from core.services.video_progress import BUCKET_SECONDS, buffer_watched_seconds, flush_video_progress, record_heartbeat
+from core.services.jobs import claim_job, dispatch, run_job
+from core.services.materialize import fan_out_lesson, materialize_lesson
+from core.services.progress import finish_user_lesson, recompute_progress
+from core.services.reports import rebuild_group_reports, rebuild_reports
+from core.services.richtext import rebuild_model_html, render_html
+
+
+# Lesson fan-out: жаңа сабақ commit-тен кейін барлық жазылған білім алушыларға таратылады
+# ----------------------------------------------------------------------------------------------------------------------
+class LessonFanOutTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.subject = Subject.objects.create(name='Химия', owner=self.teacher)
+        self.chapter = Chapter.objects.create(subject=self.subject, name='Бөлім', order=0)
+        self.students = [User.objects.create_user(f'student{i}', password='x') for i in range(3)]
+        for student in self.students:
+            UserSubject.objects.create(user=student, subject=self.subject)
+
+    def create_lesson(self, chapter=None, **kwargs):
+        # Lesson.subject бос: пән бөлім арқылы анықталады
+        return Lesson.objects.create(chapter=chapter or self.chapter, title='Сабақ', **kwargs)
+
+    def test_new_lesson_is_fanned_out_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            lesson = self.create_lesson()
+        self.assertFalse(UserLesson.objects.exists())
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(UserLesson.objects.filter(lesson=lesson).count(), 3)
+        self.assertEqual(UserChapter.objects.filter(chapter=self.chapter).count(), 3)
+        self.assertEqual(set(UserSubject.objects.values_list('lesson_count', 'chapter_count')), {(1, 1)})
+
+    def test_fan_out_is_idempotent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = self.create_lesson()
+            self.create_lesson(order=1)
+
+        self.assertEqual(fan_out_lesson(lesson.pk), 3)
+        self.assertEqual(UserLesson.objects.filter(lesson=lesson).count(), 3)
+        self.assertEqual(UserChapter.objects.count(), 3)
+        self.assertEqual(set(UserSubject.objects.values_list('lesson_count', flat=True)), {2})
+
+    def test_deleted_lesson_is_skipped(self):
+        self.assertEqual(fan_out_lesson(0), 0)
+
+    @override_settings(BACKGROUND_JOBS=True)
+    def test_background_job_is_queued_and_run(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = self.create_lesson()
+        self.assertFalse(UserLesson.objects.exists())
+
+        job = claim_job()
+        self.assertEqual((job.name, job.payload, job.status), ('fan_out_lesson', {'lesson_id': lesson.pk}, 'running'))
+        self.assertIsNone(claim_job())
+
+        self.assertTrue(run_job(job))
+        self.assertEqual(BackgroundJob.objects.get().status, 'done')
+        self.assertEqual(UserLesson.objects.filter(lesson=lesson).count(), 3)
+
+    @override_settings(BACKGROUND_JOBS=True)
+    def test_failed_job_is_retried_then_marked_failed(self):
+        job = BackgroundJob.objects.create(name='fan_out_lesson', payload={'lesson_id': 'x'})
+        for __ in range(3):
+            BackgroundJob.objects.filter(pk=job.pk).update(run_after=job.created_at)
+            job = claim_job()
+            self.assertFalse(run_job(job))
+
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIn('Traceback', job.error)
+
+
+# dispatch: процесс ішінде бір транзакцияда бірдей тапсырма бір рет орындалады
+# ----------------------------------------------------------------------------------------------------------------------
+class DispatchTests(TestCase):
+    def test_same_job_runs_once_per_transaction(self):
+        with mock.patch('core.services.jobs.run_handler') as run_handler:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                dispatch('sync_lesson_content', unique=True, lesson_id=1)
+                dispatch('sync_lesson_content', unique=True, lesson_id=1)
+                dispatch('sync_lesson_content', unique=True, lesson_id=2)
+                dispatch('fan_out_lesson', lesson_id=1)
+
+        self.assertEqual(len(callbacks), 3)
+        self.assertEqual(run_handler.call_count, 3)
+
+    def test_rolled_back_savepoint_does_not_block_dispatch(self):
+        with mock.patch('core.services.jobs.run_handler') as run_handler:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        dispatch('fan_out_lesson', lesson_id=1)
+                        raise ValueError
+                except ValueError:
+                    pass
+                dispatch('fan_out_lesson', lesson_id=1)
+
+        run_handler.assert_called_once_with('fan_out_lesson', {'lesson_id': 1})
+
+    @override_settings(BACKGROUND_JOBS=True)
+    def test_unique_job_is_queued_once(self):
+        dispatch('sync_lesson_content', unique=True, lesson_id=1)
+        dispatch('sync_lesson_content', unique=True, lesson_id=1)
+        dispatch('fan_out_lesson', lesson_id=1)
+        dispatch('fan_out_lesson', lesson_id=1)
+
+        self.assertEqual(BackgroundJob.objects.filter(name='sync_lesson_content').count(), 1)
+        self.assertEqual(BackgroundJob.objects.filter(name='fan_out_lesson').count(), 2)
+
+
+# Rich text: Summernote HTML тазаланып, "<өріс>_html" серігіне сақталады
+# ----------------------------------------------------------------------------------------------------------------------
+class RichTextTests(TestCase):
+    def test_scripts_and_event_handlers_are_removed(self):
+        self.assertEqual(render_html('<p onclick="alert(1)">a<script>alert(1)</script></p>'), '<p>a</p>')
+        self.assertEqual(render_html('<style>p {}</style><img src="x.png" onerror="alert(1)">'),
+                         '<img src="x.png" loading="lazy" decoding="async">')
+
+    def test_javascript_href_is_dropped(self):
+        self.assertEqual(render_html('<a href="javascript:alert(1)">a</a>'), '<a>a</a>')
+        self.assertEqual(render_html('<a href="https://example.com">a</a>'), '<a href="https://example.com">a</a>')
+
+    def test_raster_data_images_are_kept_until_extraction(self):
+        png = 'data:image/png;base64,iVBORw0KGgo='
+        self.assertEqual(render_html(f'<img src="{png}">'), f'<img src="{png}" loading="lazy" decoding="async">')
+        for html in (
+            '<img src="data:image/svg+xml;base64,PHN2Zz4=">', '<img src="data:text/html,<script>">',
+            f'<a href="{png}">a</a>', '<a href="da&#x09;ta:text/html;base64,PHNjcmlwdD4=">a</a>',
+        ):
+            with self.subTest(html=html):
+                self.assertNotIn('data:', render_html(html))
+
+    def test_iframe_host_allowlist(self):
+        self.assertEqual(
+            render_html('<iframe src="https://www.youtube.com/embed/x"></iframe>'),
+            '<iframe src="https://www.youtube.com/embed/x" loading="lazy"></iframe>',
+        )
+        for src in ('https://evil.example/embed/x', 'http://www.youtube.com/embed/x', 'javascript:alert(1)'):
+            with self.subTest(src=src):
+                self.assertNotIn('src', render_html(f'<iframe src="{src}"></iframe>'))
+
+    def test_blank_target_gets_noopener(self):
+        self.assertEqual(
+            render_html('<a href="https://example.com" target="_blank">a</a>'),
+            '<a href="https://example.com" target="_blank" rel="noopener noreferrer">a</a>',
+        )
+
+    def test_style_declarations_are_filtered(self):
+        self.assertEqual(
+            render_html('<p style="text-align: center; position: fixed">a</p>'), '<p style="text-align: center">a</p>',
+        )
+        self.assertEqual(render_html('<p style="background-color: url(x)">a</p>'), '<p>a</p>')
+        self.assertEqual(render_html('<p style="">a</p>'), '<p>a</p>')
+
+    def test_companion_is_rendered_on_save(self):
+        question = Question.objects.create(text='<p onclick="x">Сұрақ</p>')
+        self.assertEqual(question.text_html, '<p>Сұрақ</p>')
+
+        question.text = '<b>Жаңа</b><script>x</script>'
+        question.save(update_fields=['text'])
+        question.refresh_from_db()
+        self.assertEqual(question.text_html, '<b>Жаңа</b>')
+
+    def test_rebuild_fixes_stale_companions(self):
+        question = Question.objects.create(text='<p>a</p>')
+        Question.objects.filter(pk=question.pk).update(text='<p>b</p>')
+
+        self.assertEqual(rebuild_model_html(Question), 1)
+        self.assertEqual(rebuild_model_html(Question), 0)
+        question.refresh_from_db()
+        self.assertEqual(question.text_html, '<p>b</p>')
+
+
+# Reports: пән/топ жиынтықтары білім алушы жолдарының айырмаларымен жаңарады
+# ----------------------------------------------------------------------------------------------------------------------
+class ReportsTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.subject = Subject.objects.create(name='Химия', owner=self.teacher)
+        chapter = Chapter.objects.create(subject=self.subject, name='Бөлім', order=0)
+        self.lessons = [Lesson.objects.create(chapter=chapter, title=f'Сабақ {i}', order=i) for i in range(2)]
+
+    def enroll(self, username, user_class='8b'):
+        user = User.objects.create_user(username, password='x', user_class=user_class)
+        user_subject = UserSubject.objects.create(user=user, subject=self.subject)
+        chapter = self.lessons[0].chapter
+        UserChapter.objects.create(user=user, user_subject=user_subject, chapter=chapter)
+        for lesson in self.lessons:
+            UserLesson.objects.create(user=user, user_subject=user_subject, lesson=lesson)
+        recompute_progress(UserSubject.objects.filter(pk=user_subject.pk))
+        return user_subject
+
+    def finish_lesson(self, user_subject, rating):
+        user_lesson = UserLesson.objects.filter(user_subject=user_subject, is_completed=False).first()
+        UserLesson.objects.filter(pk=user_lesson.pk).update(is_completed=True, rating=rating)
+        recompute_progress(UserSubject.objects.filter(pk=user_subject.pk))
+
+    def group_totals(self):
+        fields = ('student_count', 'subject_rating_total', 'subject_percentage_total', 'lesson_count', 'lesson_rating_total')
+        subject = SubjectStats.objects.filter(subject=self.subject).values(*fields).first()
+        classes = {
+            row['user_class']: row
+            for row in ClassSubjectStats.objects.filter(subject=self.subject, student_count__gt=0).values('user_class', *fields)
+        }
+        return subject, classes
+
+    def assert_matches_rebuild(self):
+        incremental = self.group_totals()
+        rebuild_group_reports([self.subject.pk])
+        self.assertEqual(incremental, self.group_totals())
+
+    def test_enrollment_and_progress_update_groups(self):
+        first = self.enroll('a')
+        self.enroll('b', '8v')
+        self.finish_lesson(first, 8)
+
+        subject, classes = self.group_totals()
+        self.assertEqual((subject['student_count'], subject['lesson_count'], subject['lesson_rating_total']), (2, 4, 8))
+        self.assertEqual(classes['8b']['lesson_rating_total'], 8)
+        self.assertEqual(classes['8v']['lesson_rating_total'], 0)
+        self.assert_matches_rebuild()
+
+    def test_enrollment_cost_does_not_grow_with_students(self):
+        self.enroll('a')
+        user_subject = self.enroll('b')
+        with CaptureQueriesContext(connection) as queries:
+            rebuild_reports([user_subject.pk])
+
+        for i in range(6):
+            self.enroll(f'other{i}', '8b' if i % 2 else '8v')
+        with self.assertNumQueries(len(queries)):
+            rebuild_reports([user_subject.pk])
+        # Пән/топ жолдары өшіріліп қайта жазылмайды (қатар келген F() айырмасы жоғалмауы үшін)
+        self.assertFalse([query for query in queries if query['sql'].startswith('DELETE')])
+
+    def test_class_change_moves_totals(self):
+        user_subject = self.enroll('a')
+        self.enroll('b')
+        self.finish_lesson(user_subject, 6)
+
+        user = user_subject.user
+        user.user_class = '8v'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        __, classes = self.group_totals()
+        self.assertEqual((classes['8b']['student_count'], classes['8b']['lesson_rating_total']), (1, 0))
+        self.assertEqual((classes['8v']['student_count'], classes['8v']['lesson_rating_total']), (1, 6))
+        self.assert_matches_rebuild()
+
+    def test_unenrollment_subtracts_totals(self):
+        user_subject = self.enroll('a')
+        self.enroll('b', '8v')
+        self.finish_lesson(user_subject, 10)
+
+        user_subject.delete()
+
+        subject, classes = self.group_totals()
+        self.assertEqual((subject['student_count'], subject['lesson_rating_total']), (1, 0))
+        self.assertEqual(set(classes), {'8v'})
+        self.assert_matches_rebuild()
+
+    def test_repair_restores_corrupted_groups(self):
+        self.enroll('a')
+        self.enroll('b', '8v')
+        expected = self.group_totals()
+
+        SubjectStats.objects.update(student_count=99)
+        ClassSubjectStats.objects.filter(user_class='8b').delete()
+        rebuild_group_reports([self.subject.pk])
+        self.assertEqual(self.group_totals(), expected)
+
+
+# Кесте жауаптары: ескі UserTableAnswer жолдары бітмапқа көшеді, бағалау ескі ұяшықтық нәтижемен сәйкес
+# ----------------------------------------------------------------------------------------------------------------------
+class TableAnswerTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        subject = Subject.objects.create(name='Химия', owner=self.teacher)
+        chapter = Chapter.objects.create(subject=subject, name='Бөлім', order=0)
+        lesson = Lesson.objects.create(chapter=chapter, title='Сабақ')
+        self.task = Task.objects.create(lesson=lesson, task_type='table', rating=10)
+        self.rows = [TableRow.objects.create(task=self.task, label=f'Қатар {i}', order=i) for i in range(3)]
+        self.columns = [TableColumn.objects.create(task=self.task, label=f'Баған {j}', order=j) for j in range(3)]
+        self.correct = {(self.rows[i].pk, self.columns[j].pk) for i, j in ((0, 0), (1, 2), (2, 1))}
+        for row, column in product(self.rows, self.columns):
+            TableCell.objects.create(row=row, column=column, correct=(row.pk, column.pk) in self.correct)
+
+        student = User.objects.create_user('student', password='x')
+        user_subject = UserSubject.objects.create(user=student, subject=subject)
+        user_lesson = UserLesson.objects.create(user=student, user_subject=user_subject, lesson=lesson)
+        self.user_task = UserTask.objects.create(user_lesson=user_lesson, task=self.task)
+
+    def cells(self):
+        return [(row.pk, column.pk) for row, column in product(self.rows, self.columns)]
+
+    # Бітмапқа дейінгі бағалау: әр ұяшық жеке салыстырылады
+    def old_score(self, checked):
+        correct = sum((cell in checked) == (cell in self.correct) for cell in self.cells())
+        total = len(self.cells())
+        if correct == total:
+            return self.task.rating
+        elif correct >= total * 0.5:
+            return int(self.task.rating / 2)
+        return 0
+
+    def submit(self, checked):
+        request = RequestFactory().post('/', {f'cell_{row_id}_{column_id}': 'on' for row_id, column_id in checked})
+        with mock.patch('apps.dashboard.student.services.subject.messages'):
+            handle_table(request, self.user_task)
+        self.user_task.refresh_from_db()
+
+    def test_grading_matches_per_cell_results(self):
+        cells = self.cells()
+        for mask in range(1 << len(cells)):
+            checked = {cell for i, cell in enumerate(cells) if mask >> i & 1}
+            self.submit(checked)
+            self.assertEqual(self.user_task.rating, self.old_score(checked), checked)
+            self.assertEqual(unpack_table_cells(self.user_task.table_answer), checked)
+
+    def test_packing_migration_keeps_checked_cells(self):
+        pack_table_answers = importlib.import_module('core.migrations.0061_usertask_table_answer').pack_table_answers
+        checked = {(self.rows[0].pk, self.columns[0].pk), (self.rows[2].pk, self.columns[2].pk)}
+        UserTableAnswer.objects.bulk_create(
+            UserTableAnswer(user_task=self.user_task, row_id=cell[0], column_id=cell[1], checked=cell in checked)
+            for cell in self.cells()
+        )
+
+        pack_table_answers(apps, None)
+        self.user_task.refresh_from_db()
+        self.assertEqual(unpack_table_cells(self.user_task.table_answer), checked)
+
+    def test_admin_shows_packed_answer(self):
+        self.submit({(self.rows[0].pk, self.columns[0].pk), (self.rows[0].pk, self.columns[1].pk)})
+        User.objects.filter(pk=self.teacher.pk).update(is_staff=True, is_superuser=True)
+        self.client.force_login(self.teacher)
+
+        response = self.client.get(reverse('admin:core_usertask_change', args=[self.user_task.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '✓', count=2)
+        self.assertContains(response, 'Қатар 2')
+        self.assertNotContains(response, 'user_table_answers')
+
+
+# Progress: сабақ аяқталғанда есептегіштер айырмамен жаңарады, нәтиже толық қайта есептеумен сәйкес
+# ----------------------------------------------------------------------------------------------------------------------
+class ProgressTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.subject = Subject.objects.create(name='Химия', owner=self.teacher)
+        self.chapters = [Chapter.objects.create(subject=self.subject, name=f'Бөлім {i}', order=i) for i in range(2)]
+        self.lessons = [
+            Lesson.objects.create(chapter=chapter, title=f'Сабақ {i}', order=i)
+            for chapter in self.chapters for i in range(2)
+        ]
+        self.tasks = {lesson.pk: Task.objects.create(lesson=lesson, task_type='written') for lesson in self.lessons}
+        self.user_subject = self.enroll('student')
+
+    def enroll(self, username):
+        user = User.objects.create_user(username, password='x')
+        user_subject = UserSubject.objects.create(user=user, subject=self.subject)
+        for chapter in self.chapters:
+            UserChapter.objects.create(user=user, user_subject=user_subject, chapter=chapter)
+        for lesson in self.lessons:
+            user_lesson = UserLesson.objects.create(user=user, user_subject=user_subject, lesson=lesson)
+            UserTask.objects.create(user_lesson=user_lesson, task=self.tasks[lesson.pk])
+        recompute_progress(UserSubject.objects.filter(pk=user_subject.pk))
+        return user_subject
+
+    def finish(self, lesson, rating, user_subject=None):
+        user_lesson = UserLesson.objects.get(user_subject=user_subject or self.user_subject, lesson=lesson)
+        UserTask.objects.filter(user_lesson=user_lesson).update(rating=rating, is_completed=True)
+        return finish_user_lesson(user_lesson)
+
+    def counters(self):
+        fields = ('lesson_count', 'completed_lesson_count', 'rating_total', 'rating', 'percentage', 'is_completed')
+        user_chapters = UserChapter.objects.filter(user_subject=self.user_subject).order_by('chapter_id')
+        return (
+            UserSubject.objects.filter(pk=self.user_subject.pk).values('chapter_count', *fields).get(),
+            list(user_chapters.values('chapter_id', *fields)),
+        )
+
+    def recompute_jobs(self, callbacks):
+        return sum(getattr(callback, 'job_key', (None, ))[0] == 'recompute_subject_progress' for callback in callbacks)
+
+    def assert_matches_recompute(self):
+        incremental = self.counters()
+        recompute_progress(UserSubject.objects.filter(pk=self.user_subject.pk))
+        self.assertEqual(incremental, self.counters())
+
+    def test_finishing_lessons_matches_recompute(self):
+        for lesson, rating in zip(self.lessons, (8, 5, 10)):
+            user_lesson, finished = self.finish(lesson, rating)
+            self.assertTrue(finished)
+            self.assertEqual((user_lesson.rating, user_lesson.status), (rating, 'finished'))
+            self.assert_matches_recompute()
+
+        subject, chapters = self.counters()
+        self.assertEqual((subject['completed_lesson_count'], subject['is_completed']), (3, False))
+        self.assertEqual([chapter['is_completed'] for chapter in chapters], [True, False])
+
+        self.finish(self.lessons[3], 6)
+        subject, __ = self.counters()
+        self.assertEqual((subject['completed_lesson_count'], subject['is_completed']), (4, True))
+        self.assertEqual(subject['percentage'], 100)
+        self.assertIsNotNone(UserSubject.objects.get(pk=self.user_subject.pk).completed_at)
+        self.assert_matches_recompute()
+
+    def test_finishing_same_lesson_twice_is_ignored(self):
+        self.finish(self.lessons[0], 7)
+        before = self.counters()
+
+        user_lesson, finished = self.finish(self.lessons[0], 3)
+        self.assertFalse(finished)
+        self.assertEqual(user_lesson.rating, 7)
+        self.assertEqual(self.counters(), before)
+
+    def test_finish_queries_do_not_grow_with_students_and_lessons(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.finish(self.lessons[0], 5)
+
+        for i in range(4):
+            self.enroll(f'other{i}')
+        chapter = Chapter.objects.create(subject=self.subject, name='Қосымша', order=2)
+        for i in range(3):
+            Lesson.objects.create(chapter=chapter, title=f'Қосымша {i}', order=i)
+
+        with self.assertNumQueries(len(queries)):
+            self.finish(self.lessons[1], 5)
+
+    def test_deleting_empty_chapter_updates_chapter_count(self):
+        chapter = Chapter.objects.create(subject=self.subject, name='Бос', order=2)
+        UserChapter.objects.create(user=self.user_subject.user, user_subject=self.user_subject, chapter=chapter)
+        recompute_progress(UserSubject.objects.filter(pk=self.user_subject.pk))
+        self.finish(self.lessons[0], 9)
+        self.assertEqual(self.counters()[0]['chapter_count'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            chapter.delete()
+        self.assertEqual(self.recompute_jobs(callbacks), 1)
+
+        subject, __ = self.counters()
+        self.assertEqual(subject['chapter_count'], 2)
+        self.assert_matches_recompute()
+
+    def test_deleting_chapter_with_lessons_recomputes_once(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.chapters[1].delete()
+        self.assertEqual(self.recompute_jobs(callbacks), 1)
+        subject, __ = self.counters()
+        self.assertEqual((subject['chapter_count'], subject['lesson_count']), (1, 2))
+
+
+# Answer keys: кэштен сұраныссыз оқылады, дұрыс жауапқа әсер ететін әр өзгеріс нұсқаны арттырады
+# ----------------------------------------------------------------------------------------------------------------------
+class AnswerKeyTests(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        subject = Subject.objects.create(name='Химия', owner=teacher)
+        chapter = Chapter.objects.create(subject=subject, name='Бөлім', order=0)
+        self.lesson = Lesson.objects.create(chapter=chapter, title='Сабақ')
+
+    def create_task(self, task_type):
+        return Task.objects.create(lesson=self.lesson, task_type=task_type, rating=10)
+
+    def version(self, task):
+        return Task.objects.values_list('answer_key_version', flat=True).get(pk=task.pk)
+
+    def assert_bumps(self, task, change):
+        before = self.version(task)
+        result = change()
+        self.assertEqual(self.version(task), before + 1)
+        return result
+
+    def test_cached_lookup_makes_no_queries(self):
+        task = self.create_task('test')
+        question = Question.objects.create(task=task, text='Сұрақ')
+        Option.objects.create(question=question, text='Иә', is_correct=True)
+        task.refresh_from_db()
+
+        key = get_answer_key(task)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_answer_key(task), key)
+
+    def test_every_answer_change_bumps_version(self):
+        task = self.create_task('test')
+        question = self.assert_bumps(task, lambda: Question.objects.create(task=task, text='Сұрақ'))
+        option = self.assert_bumps(task, lambda: Option.objects.create(question=question, text='Иә'))
+        option.is_correct = True
+        self.assert_bumps(task, option.save)
+        self.assert_bumps(task, option.delete)
+
+        task = self.create_task('text_gap')
+        text_gap = self.assert_bumps(task, lambda: TextGap.objects.create(task=task, prompt='...', correct_answer='су'))
+        self.assert_bumps(task, text_gap.delete)
+
+        task = self.create_task('matching')
+        column = self.assert_bumps(task, lambda: MatchingColumn.objects.create(task=task, label='Баған'))
+        item = self.assert_bumps(task, lambda: MatchingItem.objects.create(correct_column=column, text='Элемент'))
+        self.assert_bumps(task, item.delete)
+
+        task = self.create_task('table')
+        row = self.assert_bumps(task, lambda: TableRow.objects.create(task=task, label='Қатар'))
+        column = self.assert_bumps(task, lambda: TableColumn.objects.create(task=task, label='Баған'))
+        cell = self.assert_bumps(task, lambda: TableCell.objects.create(row=row, column=column, correct=True))
+        self.assert_bumps(task, cell.delete)
+
+    def test_new_version_recompiles_key(self):
+        task = self.create_task('text_gap')
+        text_gap = TextGap.objects.create(task=task, prompt='...', correct_answer='су')
+        task.refresh_from_db()
+        self.assertEqual(get_answer_key(task)['gaps'], {text_gap.pk: 'су'})
+
+        text_gap.correct_answer = 'Тұз'
+        text_gap.save()
+        task.refresh_from_db()
+        self.assertEqual(get_answer_key(task)['gaps'], {text_gap.pk: 'тұз'})
+
+    def test_full_task_save_keeps_bumped_version(self):
+        task = self.create_task('test')
+        stale = Task.objects.get(pk=task.pk)
+        Question.objects.create(task=task, text='Сұрақ')
+
+        stale.rating = 20
+        stale.save()
+        self.assertEqual(self.version(task), 1)
+        self.assertEqual(Task.objects.get(pk=task.pk).rating, 20)
+
+
+# Materialize: сабақтың жауап жолдары жаппай құрылады, қайта шақыру мен қайталанған id-лер жол көбейтпейді
+# ----------------------------------------------------------------------------------------------------------------------
+class MaterializeTests(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        subject = Subject.objects.create(name='Химия', owner=teacher)
+        chapter = Chapter.objects.create(subject=subject, name='Бөлім', order=0)
+        self.lesson = Lesson.objects.create(chapter=chapter, title='Сабақ')
+
+        video = Task.objects.create(lesson=self.lesson, task_type='video')
+        Video.objects.create(task=video, url='https://youtu.be/x')
+        written = Task.objects.create(lesson=self.lesson, task_type='written')
+        Written.objects.create(task=written, instruction='Жаз')
+        text_gap = Task.objects.create(lesson=self.lesson, task_type='text_gap')
+        TextGap.objects.bulk_create(TextGap(task=text_gap, prompt='...', correct_answer='су') for __ in range(2))
+        test = Task.objects.create(lesson=self.lesson, task_type='test')
+        Question.objects.bulk_create(Question(task=test, text='Сұрақ') for __ in range(3))
+        matching = Task.objects.create(lesson=self.lesson, task_type='matching')
+        column = MatchingColumn.objects.create(task=matching, label='Баған')
+        MatchingItem.objects.bulk_create(MatchingItem(correct_column=column, text='Элемент') for __ in range(2))
+        Task.objects.create(lesson=self.lesson, task_type='table')
+
+        self.user_lessons = []
+        for i in range(2):
+            user = User.objects.create_user(f'student{i}', password='x')
+            user_subject = UserSubject.objects.create(user=user, subject=subject)
+            user_lesson = UserLesson.objects.create(user=user, user_subject=user_subject, lesson=self.lesson)
+            self.user_lessons.append(user_lesson)
+        self.user_lesson_ids = [user_lesson.pk for user_lesson in self.user_lessons]
+
+    def row_counts(self):
+        models = (UserTask, UserVideo, UserWritten, UserTextGap, UserAnswer, UserMatchingAnswer)
+        return [model.objects.count() for model in models]
+
+    def test_rows_are_created_once(self):
+        created = materialize_lesson(self.lesson, self.user_lesson_ids)
+        expected = [12, 2, 2, 4, 6, 4]
+        self.assertEqual(self.row_counts(), expected)
+        self.assertEqual(created, sum(expected))
+        self.assertFalse(UserTableAnswer.objects.exists())
+
+        self.assertEqual(materialize_lesson(self.lesson, self.user_lesson_ids), 0)
+        self.assertEqual(self.row_counts(), expected)
+
+    def test_duplicate_ids_are_ignored_by_unique_constraints(self):
+        materialize_lesson(self.lesson, self.user_lesson_ids[:1] * 3)
+        self.assertEqual(self.row_counts(), [6, 1, 1, 2, 3, 2])
+
+    def test_missing_rows_are_filled_without_touching_existing(self):
+        materialize_lesson(self.lesson, self.user_lesson_ids)
+        user_answer = UserAnswer.objects.first()
+        option = Option.objects.create(question=user_answer.question, text='Иә')
+        user_answer.options.add(option)
+        UserTextGap.objects.filter(pk=UserTextGap.objects.first().pk).delete()
+
+        self.assertEqual(materialize_lesson(self.lesson, self.user_lesson_ids), 1)
+        self.assertEqual(self.row_counts(), [12, 2, 2, 4, 6, 4])
+        self.assertEqual(list(user_answer.options.all()), [option])
+
+    def test_unique_constraints_reject_duplicates(self):
+        materialize_lesson(self.lesson, self.user_lesson_ids)
+        user_answer = UserAnswer.objects.first()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserAnswer.objects.create(user_task=user_answer.user_task, question=user_answer.question)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserTask.objects.create(user_lesson=self.user_lessons[0], task=user_answer.user_task.task)
+
+
+# Inline images: base64 суреттер хеш атымен бір рет сақталады, басқа HTML өзгермейді
+# ----------------------------------------------------------------------------------------------------------------------
+class InlineImageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.inline_root = os.path.join(media_root, INLINE_DIR)
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4), 'red').save(buffer, 'PNG')
+        self.png = buffer.getvalue()
+        self.data_uri = 'data:image/png;base64,' + base64.b64encode(self.png).decode()
+
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        subject = Subject.objects.create(name='Химия', owner=teacher)
+        chapter = Chapter.objects.create(subject=subject, name='Бөлім', order=0)
+        task = Task.objects.create(lesson=Lesson.objects.create(chapter=chapter, title='Сабақ'), task_type='test')
+        self.question = Question.objects.create(task=task, text='Сұрақ')
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.inline_root)
+            for root, __, names in os.walk(self.inline_root) for name in names
+        )
+
+    # Сигналсыз жазу: миграцияға дейінгі ескі жолдар сияқты
+    def create_legacy_option(self, text):
+        option = Option.objects.create(question=self.question, text='')
+        Option.objects.filter(pk=option.pk).update(text=text, text_html='')
+        return option
+
+    def test_same_image_is_stored_once_by_hash(self):
+        html = f'<p><img src="{self.data_uri}"> <img src=\'{self.data_uri}\'></p>'
+        result = extract_inline_images(html)
+
+        digest = hashlib.sha256(self.png).hexdigest()
+        url = default_storage.url(f'{INLINE_DIR}/{digest[:2]}/{digest}.png')
+        self.assertEqual(result, f'<p><img src="{url}"> <img src=\'{url}\'></p>')
+        self.assertEqual(self.stored_files(), [f'{digest[:2]}/{digest}.png'])
+
+        Option.objects.create(question=self.question, text=html)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_html_without_data_uris_is_unchanged(self):
+        for html in (
+            '', None, '<p>H<sub>2</sub>O</p>', '<img src="/media/a.png">',
+            '<img src="data:image/png;base64,@@@">', '<img src="data:image/svg+xml;base64,PHN2Zy8+">',
+        ):
+            with self.subTest(html=html):
+                self.assertEqual(extract_inline_images(html), html)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_command_is_idempotent(self):
+        plain = self.create_legacy_option('<p>Жауап</p>')
+        inline = self.create_legacy_option(f'<p><img src="{self.data_uri}"></p>')
+
+        out = io.StringIO()
+        call_command('extract_inline_images', stdout=out)
+        self.assertIn('Option: 1', out.getvalue())
+        inline.refresh_from_db()
+        self.assertNotIn('data:image', inline.text)
+        self.assertIn(INLINE_DIR, inline.text_html)
+        self.assertEqual(Option.objects.get(pk=plain.pk).text_html, '')
+
+        files = self.stored_files()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('extract_inline_images', stdout=io.StringIO())
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+        self.assertEqual(self.stored_files(), files)
+        self.assertEqual(Option.objects.get(pk=inline.pk).text, inline.text)
+
+
+# Video progress: LocMem-де heartbeat бірден жазылады, ортақ кэште буферленеді және flush кезінде
+# жоғалмай әрі екі рет жазылмай түседі
+# ----------------------------------------------------------------------------------------------------------------------
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'video-progress'}}
+
+
+class VideoProgressTestCase(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        subject = Subject.objects.create(name='Химия', owner=teacher)
+        chapter = Chapter.objects.create(subject=subject, name='Бөлім', order=0)
+        lesson = Lesson.objects.create(chapter=chapter, title='Сабақ')
+        task = Task.objects.create(lesson=lesson, task_type='video')
+
+        student = User.objects.create_user('student', password='x')
+        user_subject = UserSubject.objects.create(user=student, subject=subject)
+        user_lesson = UserLesson.objects.create(user=student, user_subject=user_subject, lesson=lesson)
+        user_task = UserTask.objects.create(user_lesson=user_lesson, task=task)
+        videos = [Video.objects.create(task=task, url=f'https://youtu.be/{i}') for i in range(2)]
+        self.ids = [UserVideo.objects.create(user_task=user_task, video=video).pk for video in videos]
+
+    def watched(self):
+        return dict(UserVideo.objects.filter(pk__in=self.ids).values_list('pk', 'watched_seconds'))
+
+    def flush_command(self):
+        out = io.StringIO()
+        call_command('flush_video_progress', stdout=out)
+        return out.getvalue()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LocMemVideoProgressTests(VideoProgressTestCase):
+    def test_heartbeat_is_written_directly(self):
+        first, second = self.ids
+        record_heartbeat({first: 30, second: 10})
+        record_heartbeat({first: 20}, completed_ids={second})
+
+        self.assertEqual(self.watched(), {first: 30, second: 10})
+        self.assertTrue(UserVideo.objects.get(pk=second).is_completed)
+        self.assertIsNone(video_progress.cache.get(f'video-progress:{first}'))
+
+    def test_command_reports_no_buffer(self):
+        self.assertIn('LocMem', self.flush_command())
+
+
+class BufferedVideoProgressTests(VideoProgressTestCase):
+    def setUp(self):
+        super().setUp()
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        settings_override = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # Минуттық бөліктер жасанды сағатпен ауыстырылады
+        self.now = 1_000_000 * BUCKET_SECONDS
+        clock = mock.patch.object(video_progress, 'time', SimpleNamespace(time=lambda: self.now))
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def next_minute(self):
+        self.now += BUCKET_SECONDS
+
+    def test_heartbeats_are_buffered_until_the_minute_closes(self):
+        first, second = self.ids
+        record_heartbeat({first: 30})
+        record_heartbeat({first: 45, second: 5})
+        record_heartbeat({first: 40})
+        self.assertEqual(self.watched(), {first: 0, second: 0})
+
+        # Ағымдағы минут жабылмаған
+        self.assertEqual(flush_video_progress(), 0)
+
+        self.next_minute()
+        self.assertEqual(flush_video_progress(), 2)
+        self.assertEqual(self.watched(), {first: 45, second: 5})
+
+        # Қайта flush ештеңе жазбайды
+        self.next_minute()
+        self.assertEqual(flush_video_progress(), 0)
+
+    def test_heartbeat_during_flush_is_not_lost(self):
+        first, __ = self.ids
+        buffer_watched_seconds({first: 30})
+        self.next_minute()
+
+        pop = video_progress.pop_buffered_seconds
+
+        # Мәндер кэштен алынғаннан кейін, бірақ базаға жазылмай тұрып жаңа heartbeat келеді
+        def pop_then_heartbeat(user_video_ids):
+            values = pop(user_video_ids)
+            buffer_watched_seconds({first: 50})
+            return values
+
+        with mock.patch.object(video_progress, 'pop_buffered_seconds', pop_then_heartbeat):
+            self.assertEqual(flush_video_progress(), 1)
+        self.assertEqual(self.watched()[first], 30)
+
+        self.next_minute()
+        self.assertEqual(flush_video_progress(), 1)
+        self.assertEqual(self.watched()[first], 50)
+
+        self.next_minute()
+        self.assertEqual(flush_video_progress(), 0)
+
+    def test_completed_video_is_written_immediately_with_buffered_value(self):
+        first, __ = self.ids
+        record_heartbeat({first: 70})
+        record_heartbeat({}, completed_ids={first})
+        user_video = UserVideo.objects.get(pk=first)
+        self.assertEqual((user_video.watched_seconds, user_video.is_completed), (70, True))
+
+        self.next_minute()
+        self.assertEqual(flush_video_progress(), 0)
+
+    def test_flush_command(self):
+        first, second = self.ids
+        buffer_watched_seconds({first: 12, second: 34})
+        self.next_minute()
+
+        self.assertIn('2 видео', self.flush_command())
+        self.assertEqual(self.watched(), {first: 12, second: 34})
+        self.assertIn('0 видео', self.flush_command())
+
+
+# Navigation/syllabus: кэш Subject.content_version бойынша ескіреді, алдыңғы/келесі сабақ бөлім шекарасынан өтеді
+# ----------------------------------------------------------------------------------------------------------------------
+class ContentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.subject = Subject.objects.create(name='Химия', owner=teacher)
+        self.chapters = [Chapter.objects.create(subject=self.subject, name=f'Бөлім {i}', order=i) for i in range(2)]
+        self.lessons = [
+            Lesson.objects.create(chapter=chapter, title=f'Сабақ {chapter.order}.{i}', order=i)
+            for chapter in self.chapters for i in range(2)
+        ]
+        self.task = Task.objects.create(lesson=self.lessons[0], task_type='written', duration=10)
+
+        user = User.objects.create_user('student', password='x')
+        user_subject = UserSubject.objects.create(user=user, subject=self.subject)
+        self.user_chapters = [
+            UserChapter.objects.create(user=user, user_subject=user_subject, chapter=chapter)
+            for chapter in self.chapters
+        ]
+        self.user_lessons = [
+            UserLesson.objects.create(user=user, user_subject=user_subject, lesson=lesson) for lesson in self.lessons
+        ]
+
+    def user_subject(self):
+        return UserSubject.objects.select_related('subject').get()
+
+    def fresh_subject(self):
+        return Subject.objects.get(pk=self.subject.pk)
+
+    def test_neighbours_cross_chapter_boundaries(self):
+        neighbours = get_lesson_navigation(self.user_subject())['neighbours']
+        first, last_of_first_chapter, first_of_second_chapter, last = self.user_lessons
+
+        previous, following = neighbours[last_of_first_chapter.pk]
+        self.assertEqual((previous['id'], following['id']), (first.pk, first_of_second_chapter.pk))
+        self.assertEqual(following['user_chapter_id'], self.user_chapters[1].pk)
+
+        previous, __ = neighbours[first_of_second_chapter.pk]
+        self.assertEqual(previous['id'], last_of_first_chapter.pk)
+        self.assertEqual(previous['user_chapter_id'], self.user_chapters[0].pk)
+        self.assertEqual((neighbours[first.pk][0], neighbours[last.pk][1]), (None, None))
+
+    def test_navigation_is_cached_until_content_changes(self):
+        get_lesson_navigation(self.user_subject())
+        user_subject = self.user_subject()
+        with self.assertNumQueries(0):
+            get_lesson_navigation(user_subject)
+
+        first_lesson, second_lesson = self.user_lessons[0].pk, self.user_lessons[1].pk
+        edits = (
+            (self.lessons[1], 'title', 'Жаңа сабақ', lambda n: n['user_lessons'][second_lesson]['lesson']['title']),
+            (self.chapters[0], 'name', 'Жаңа бөлім', lambda n: n['user_chapters'][0]['chapter']['name']),
+            (self.task, 'duration', 25, lambda n: n['user_lessons'][first_lesson]['total_duration']),
+        )
+        for instance, field, value, read in edits:
+            with self.subTest(model=type(instance).__name__):
+                setattr(instance, field, value)
+                instance.save()
+                navigation = get_lesson_navigation(self.user_subject())
+
+                self.assertEqual(navigation['version'], self.fresh_subject().content_version)
+                self.assertEqual(read(navigation), value)
+
+    def test_syllabus_is_cached_until_content_changes(self):
+        get_syllabus(self.fresh_subject())
+        subject = self.fresh_subject()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_syllabus(subject)['duration'], 10)
+
+        self.lessons[2].title = 'Жаңа сабақ'
+        self.lessons[2].save()
+        self.chapters[1].name = 'Жаңа бөлім'
+        self.chapters[1].save()
+        self.task.duration = 40
+        self.task.save()
+
+        syllabus = get_syllabus(self.fresh_subject())
+        self.assertEqual(syllabus['chapters'][1]['chapter']['name'], 'Жаңа бөлім')
+        self.assertEqual(syllabus['chapters'][1]['lessons'][0]['lesson']['title'], 'Жаңа сабақ')
+        self.assertEqual((syllabus['duration'], syllabus['lesson_count']), (40, 4))
+
+        Lesson.objects.create(chapter=self.chapters[1], title='Қосымша', order=2)
+        self.assertEqual(get_syllabus(self.fresh_subject())['lesson_count'], 5)
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_init, post_save
+
+
+# Модель өрістерінің жүктелген мәндерін жадта сақтау: pre_save ішінде ескі мәнді
+# базадан қайта оқымай-ақ салыстыруға болады
+NOT_LOADED = object()
+_tracked = {}
+
+
+def _raw_value(value):
+    # FieldFile -> файл атауы
+    return getattr(value, 'name', value) or None
+
+
+def _snapshot(sender, instance, **kwargs):
+    instance._loaded_values = {
+        field: _raw_value(instance.__dict__[field]) for field in _tracked[sender] if field in instance.__dict__
+    }
+
+
+def track_fields(model, *fields):
+    if model not in _tracked:
+        _tracked[model] = set()
+        post_init.connect(_snapshot, sender=model, weak=False, dispatch_uid=f'track_fields_init_{model.__name__}')
+        post_save.connect(_snapshot, sender=model, weak=False, dispatch_uid=f'track_fields_save_{model.__name__}')
+    _tracked[model].update(fields)
+
+
+# Өріс жүктелмеген болса (only()/defer() немесе жаңа объект) NOT_LOADED қайтарады
+def loaded_value(instance, field):
+    return getattr(instance, '_loaded_values', {}).get(field, NOT_LOADED)
+
+
+def current_value(instance, field):
+    return _raw_value(instance.__dict__.get(field))
@@ -0,0 +1,113 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from ui.storage import ENCODINGS
+
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+# Хэшсіз атаулар (мысалы, сыртқы сілтемелер) қысқа уақыт кэштеледі
+DEFAULT_CACHE = 'public, max-age=3600'
+
+
+# "br;q=1.0, gzip;q=0.5, *;q=0" -> {'br': 1.0, 'gzip': 0.5, '*': 0.0}. q мәні бүлінген немесе 0..1
+# аралығынан тыс кодтау ескерілмейді
+def parse_accept_encoding(header):
+    accepted = {}
+    for token in header.split(','):
+        coding, __, params = token.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        q = 1.0
+        for param in params.split(';'):
+            key, __, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = None
+        if q is not None and 0 <= q <= 1:
+            accepted[coding] = q
+    return accepted
+
+
+# Production статикасы: STATIC_ROOT-тан URL маршруттарына, сессияға және т.б. жетпей беріледі.
+# Accept-Encoding бойынша алдын ала сығылған .br/.gz нұсқасы таңдалады; хэшті атаулар
+# "immutable" болып кэштеледі, сондықтан қайта ашылған бет статика үшін Python-ға сұраныс жібермейді
+class StaticFilesMiddleware:
+    def __init__(self, get_response):
+        if not settings.STATIC_MANIFEST:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = str(settings.STATIC_ROOT)
+        self.files = {}
+        self.immutable = None
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    # Файл туралы мәлімет процесс ішінде бір рет жиналады (deploy кезінде процестер қайта іске қосылады)
+    def find(self, name):
+        if name not in self.files:
+            try:
+                path = safe_join(self.root, name)
+            except SuspiciousFileOperation:
+                path = None
+
+            if path is None or not os.path.isfile(path):
+                self.files[name] = None
+            else:
+                stat = os.stat(path)
+                self.files[name] = {
+                    'path': path,
+                    'mtime': stat.st_mtime,
+                    'content_type': mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                    'variants': [(encoding, path + suffix) for encoding, suffix, __ in ENCODINGS if os.path.isfile(path + suffix)],
+                }
+        return self.files[name]
+
+    def is_immutable(self, name):
+        if self.immutable is None:
+            self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        return name in self.immutable
+
+    def serve(self, request, name):
+        found = self.find(name)
+        if found is None:
+            return None
+
+        immutable = self.is_immutable(name)
+        if not immutable and not was_modified_since(request.headers.get('If-Modified-Since'), found['mtime']):
+            return HttpResponseNotModified()
+
+        # q мәні ең үлкен нұсқа; тең болса ENCODINGS реті (br, сосын gzip). q=0 - қабылданбайды
+        accepted = parse_accept_encoding(request.headers.get('Accept-Encoding', ''))
+        path, encoding, best = found['path'], None, 0
+        for variant_encoding, variant_path in found['variants']:
+            q = accepted.get(variant_encoding, accepted.get('*', 0))
+            if q > best:
+                path, encoding, best = variant_path, variant_encoding, q
+
+        response = FileResponse(open(path, 'rb'), content_type=found['content_type'])
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if found['variants']:
+            response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(found['mtime'])
+        response['Cache-Control'] = IMMUTABLE_CACHE if immutable else DEFAULT_CACHE
+        return response
@@ -0,0 +1,43 @@
+import gzip
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+# Алдын ала сығылатын файлдар (суреттер мен woff2 қазірдің өзінде сығылған)
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.xml', '.html', '.ico', '.ttf', '.otf', '.eot')
+MIN_SIZE = 512
+# Сығылған нұсқа кемінде 5%-ға кіші болмаса, сақталмайды
+MIN_RATIO = 0.95
+
+ENCODINGS = (
+    ('br', '.br', lambda data: brotli.compress(data, quality=11)),
+    ('gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)),
+)
+
+
+# collectstatic: файл атауларына хэш қосылады (ұзақ кэштеу үшін), сосын мәтіндік файлдардың
+# .br және .gz нұсқалары жанына жазылады (ui.middleware.StaticFilesMiddleware береді)
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < MIN_SIZE:
+            return
+
+        for __, suffix, compress in ENCODINGS:
+            compressed = compress(data)
+            if len(compressed) < len(data) * MIN_RATIO:
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
@@ -0,0 +1,35 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+from core.services.images import PRESETS, derivative_name, image_kind
+
+
+register = template.Library()
+
+
+def _srcset(name, widths, fmt):
+    return ', '.join(f'{default_storage.url(derivative_name(name, width, fmt))} {width}w' for width in widths)
+
+
+# {% picture user.avatar sizes='112px' class='w-28 h-28 rounded-full' alt='user photo' %}
+# WebP және JPEG өлшемдерінің srcset-і; файлдар алғаш сұралғанда жасалады (core.services.images)
+@register.simple_tag
+def picture(image, sizes='100vw', **attrs):
+    if not image:
+        return ''
+
+    kind = image_kind(image.name)
+    if kind is None:
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+
+    widths = PRESETS[kind]['widths']
+    return format_html(
+        '<picture style="display: contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" loading="lazy" decoding="async"{}>'
+        '</picture>',
+        _srcset(image.name, widths, 'webp'), sizes,
+        default_storage.url(derivative_name(image.name, widths[1], 'jpg')), _srcset(image.name, widths, 'jpg'), sizes,
+        flatatt(attrs),
+    )
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from ui.middleware import IMMUTABLE_CACHE, DEFAULT_CACHE, StaticFilesMiddleware, parse_accept_encoding
+
+
+HASHED = 'app.3f2a9c.css'
+PLAIN = 'robots.txt'
+
+
+# Static files: Accept-Encoding q мәндерімен оқылады, immutable тек хэшті атауларға
+# ----------------------------------------------------------------------------------------------------------------------
+class StaticFilesMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        for name, content in ((HASHED, b'body{}'), (HASHED + '.br', b'br'), (HASHED + '.gz', b'gz'), (PLAIN, b'plain')):
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(content)
+
+        settings_override = override_settings(STATIC_MANIFEST=True, STATIC_ROOT=self.root, STATIC_URL='/static/')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        storage = mock.patch('ui.middleware.staticfiles_storage', SimpleNamespace(hashed_files={'app.css': HASHED}))
+        storage.start()
+        self.addCleanup(storage.stop)
+
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse('app'))
+
+    def get(self, name, accept_encoding=None):
+        headers = {'HTTP_ACCEPT_ENCODING': accept_encoding} if accept_encoding is not None else {}
+        response = self.middleware(RequestFactory().get(f'/static/{name}', **headers))
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, content
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(parse_accept_encoding('gzip, br;q=0.5, *;q=0'), {'gzip': 1.0, 'br': 0.5, '*': 0.0})
+        self.assertEqual(parse_accept_encoding('GZIP ; Q=0.3,,identity'), {'gzip': 0.3, 'identity': 1.0})
+        self.assertEqual(parse_accept_encoding('br;q=abc, gzip;q=2, deflate;q=nan'), {})
+
+    def test_encoding_is_chosen_by_q_value(self):
+        for accept_encoding, expected in (
+            ('gzip, deflate, br', (b'br', 'br')),
+            ('br;q=0.5, gzip', (b'gz', 'gzip')),
+            ('gzip;q=0.8, br;q=0.8', (b'br', 'br')),
+            ('br;q=0, gzip;q=0', (b'body{}', None)),
+            ('*;q=0.1', (b'br', 'br')),
+            ('*, br;q=0', (b'gz', 'gzip')),
+            ('identity', (b'body{}', None)),
+            ('xbr, gzipx', (b'body{}', None)),
+            ('', (b'body{}', None)),
+            (None, (b'body{}', None)),
+        ):
+            with self.subTest(accept_encoding=accept_encoding):
+                response, content = self.get(HASHED, accept_encoding)
+                self.assertEqual((content, response.get('Content-Encoding')), expected)
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_immutable_cache_only_for_hashed_names(self):
+        response, __ = self.get(HASHED, 'br')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE)
+
+        response, content = self.get(PLAIN, 'br')
+        self.assertEqual((content, response['Cache-Control']), (b'plain', DEFAULT_CACHE))
+        self.assertFalse(response.has_header('Vary'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_unknown_files_fall_through(self):
+        __, content = self.get('missing.css')
+        self.assertEqual(content, b'app')